@@ -2,12 +2,24 @@
 """The main entry point.
 
 Invoke as `dzo` or `python3 -m dzo`.
+
+Subcommand modules are imported only when they run, so that `dzo --help` and
+each subcommand start without importing the others' dependencies.
 """
-from argparse import ArgumentParser
+import importlib
+from argparse import ArgumentParser, Namespace
+from typing import Callable
 
 from . import ExitStatus
-from .preprocess import preprocess
-from .search import search
+
+
+def _lazy(name: str) -> Callable[[Namespace], ExitStatus]:
+    """Returns a handler which imports the subcommand module on call.
+    """
+    def handler(args: Namespace) -> ExitStatus:
+        module = importlib.import_module(f'{__package__}.{name}')
+        return getattr(module, name)(args)
+    return handler
 
 
 # Create the top-level parser
@@ -34,7 +46,24 @@ parser_preprocess.add_argument('--dicdir',
 parser_preprocess.add_argument('--ignore',
                                nargs='+',
                                help='file extensions to be ignored')
-parser_preprocess.set_defaults(handler=preprocess)
+parser_preprocess.add_argument('--memory-budget',
+                               type=int,
+                               help='memory budget in MiB; partial indices are '
+                                    'spilled to temporary files beyond it')
+parser_preprocess.add_argument('--workers',
+                               type=int,
+                               help='number of tokenization processes (default: 1)',
+                               default=1)
+parser_preprocess_mode = parser_preprocess.add_mutually_exclusive_group()
+parser_preprocess_mode.add_argument('--incremental',
+                                    action='store_true',
+                                    help='re-index only files added or changed since the '
+                                         'last run, and overwrite the index')
+parser_preprocess_mode.add_argument('--shards',
+                                    type=int,
+                                    help='split the index into this number of shards, which '
+                                         'are saved in the directory <result_path>')
+parser_preprocess.set_defaults(handler=_lazy('preprocess'))
 
 # Create the parser for the "search" command
 parser_search = subparsers.add_parser('search', help='search [options] <query>')
@@ -47,7 +76,53 @@ parser_search.add_argument('--index-path',
 parser_search.add_argument('--dicdir',
                            type=str,
                            help='MeCab dictionary directory')
-parser_search.set_defaults(handler=search)
+parser_search.add_argument('--top-k',
+                           type=int,
+                           help='rank documents by BM25, and show only the top k of them')
+parser_search.add_argument('--boolean',
+                           action='store_true',
+                           help='evaluate the query as a boolean query with AND, OR, NOT, NEAR/k '
+                                'and parentheses')
+parser_search.add_argument('--regex',
+                           action='store_true',
+                           help='search documents which contain a match of the query as a '
+                                'regular expression')
+parser_search.set_defaults(handler=_lazy('search'))
+
+# Create the parser for the "serve" command
+parser_serve = subparsers.add_parser('serve', help='serve [options]')
+parser_serve.add_argument('--index-path',
+                          '-i',
+                          type=str,
+                          help='a path to inverted index',
+                          required=True)
+parser_serve.add_argument('--dicdir',
+                          type=str,
+                          help='MeCab dictionary directory')
+parser_serve.add_argument('--host',
+                          type=str,
+                          help='host name to listen to (default: 127.0.0.1)',
+                          default='127.0.0.1')
+parser_serve.add_argument('--port',
+                          type=int,
+                          help='port to listen to (default: 8000)',
+                          default=8000)
+parser_serve.add_argument('--unix-socket',
+                          type=str,
+                          help='a path to a Unix domain socket to listen to instead of a port')
+parser_serve.set_defaults(handler=_lazy('serve'))
+
+# Create the parser for the "info" command
+parser_info = subparsers.add_parser('info', help='info [options]')
+parser_info.add_argument('--index-path',
+                         '-i',
+                         type=str,
+                         help='a path to inverted index',
+                         required=True)
+parser_info.add_argument('--verify',
+                         action='store_true',
+                         help='verify the checksums of the index, which reads the whole index')
+parser_info.set_defaults(handler=_lazy('info'))
 
 
 def main() -> None:
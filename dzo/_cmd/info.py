@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Info command script.
+"""
+import json
+from argparse import Namespace
+from os import path
+from typing import List
+
+from . import ExitStatus
+from ..segment import is_segmented, read_segments
+from ..shard import is_sharded, read_shards
+from ..storage import IndexReader, read_header
+
+
+def _index_files(index_path: str) -> List[str]:
+    """Returns the index files of an index file, a segmented index or a sharded index.
+    """
+    if is_sharded(index_path):
+        return [path.join(index_path, name) for name in read_shards(index_path).shards]
+    if is_segmented(index_path):
+        return [path.join(index_path, seg.name) for seg in read_segments(index_path).segments]
+    return [index_path]
+
+
+def info(args: Namespace) -> ExitStatus:
+    """info
+    """
+    index_path: str = args.index_path
+    verify: bool = getattr(args, 'verify', False)
+
+    if not path.exists(index_path):
+        print(f'Not found: {index_path}')
+        return ExitStatus.ERROR_INVALID_USAGE
+
+    status = ExitStatus.SUCCESS
+    for p in _index_files(index_path):
+        header = read_header(p)
+        print(f'Index Path: {p}')
+        print(f'Format Version: {header.format_version}')
+        print(f'Tokenizer: {header.tokenizer_name} {header.tokenizer_version} '
+              f'{json.dumps(header.tokenizer_params)}')
+        print(f'Documents: {header.num_docs}')
+        print(f'Terms: {header.num_terms}')
+        if verify:
+            with IndexReader(p) as reader:
+                try:
+                    reader.verify()
+                    print('Checksums: OK')
+                except ValueError as err:
+                    print(f'Checksums: {err}')
+                    status = ExitStatus.ERROR
+
+    return status
@@ -1,14 +1,13 @@
 # -*- coding: utf-8 -*-
 """Preprocess command script.
 """
+import functools
 from argparse import Namespace
 from os import path
-
-import MeCab
+from typing import Optional
 
 from . import ExitStatus
 from ..annot import Tokenizer
-from ..indexer import InvIndex
 from ..loader import DirectoryLoader
 from ..preprocess import Preprocessor
 from ..tokenizer.mecab import MeCabTokenizer
@@ -34,23 +33,32 @@ def preprocess(args: Namespace) -> ExitStatus:
                 d = args.dicdir
                 if not path.isdir(d):
                     raise FileNotFoundError
-                tagger = MeCab.Tagger(d)
-                tokenizer = MeCabTokenizer(tagger)
+                tokenizer = MeCabTokenizer.from_args(d)
             # Invalid tokenizer handler
             else:
                 msg = 'value for --tokenizer option has to be one either `mecab` or `ngram`'
                 raise ValueError(msg)
 
-        preprocessor = Preprocessor(directory_loader, tokenizer)
+        # parse --memory-budget option (in MiB)
+        memory_budget: Optional[int] = None
+        if getattr(args, 'memory_budget', None) is not None:
+            memory_budget = args.memory_budget * 1024 ** 2
+
+        preprocessor = Preprocessor(directory_loader,
+                                    tokenizer,
+                                    memory_budget=memory_budget,
+                                    workers=getattr(args, 'workers', 1))
+
+        # parse --incremental and --shards options
+        run = preprocessor.update if getattr(args, 'incremental', False) else preprocessor.build
+        if getattr(args, 'shards', None) is not None:
+            run = functools.partial(preprocessor.build_shards, num_shards=args.shards)
 
         # parse --ignore option
-        inv_index: InvIndex
         if hasattr(args, 'ignored_exts'):
-            inv_index = preprocessor.preprocess(ignored_exts=set(args.ignored_exts))
+            run(args.result_path, ignored_exts=set(args.ignored_exts))
         else:
-            inv_index = preprocessor.preprocess()
-
-        preprocessor.save(inv_index, args.result_path)
+            run(args.result_path)
     except FileNotFoundError as err:
         print(err)
         return ExitStatus.ERROR_NOT_EXECUTABLE
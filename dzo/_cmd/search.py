@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 """Search command script.
 """
+import re
 from argparse import Namespace
 from typing import Optional
 
 from . import ExitStatus
-from ..engine import Engine
+from ..shard import open_engine
+from ..query import QuerySyntaxError
 
 
 def search(args: Namespace) -> ExitStatus:
@@ -14,17 +16,34 @@ def search(args: Namespace) -> ExitStatus:
     query: str = args.query
     index_path: str = args.index_path
     dicdir: Optional[str] = args.dicdir if hasattr(args, 'dicdir') else None
+    top_k: Optional[int] = getattr(args, 'top_k', None)
+    boolean: bool = getattr(args, 'boolean', False)
+    regex: bool = getattr(args, 'regex', False)
 
     print(f'Query: {query}')
     print(f'Index Path: {index_path}')
     if dicdir is not None:
         print(f'MeCab Dictionary: {dicdir}')
 
-    engine = Engine(index_path, dicdir=dicdir)
+    engine = open_engine(index_path, dicdir=dicdir)
 
     print('Engine is ready...')
 
-    results = engine.search(query)
+    results: list
+    if regex:
+        try:
+            results = engine.regexp(query)
+        except re.error as err:
+            print(f'Invalid regular expression: {err}')
+            return ExitStatus.ERROR_INVALID_USAGE
+    elif boolean:
+        try:
+            results = engine.query(query)
+        except QuerySyntaxError as err:
+            print(f'Invalid query: {err}')
+            return ExitStatus.ERROR_INVALID_USAGE
+    else:
+        results = engine.search(query, top_k=top_k)
 
     print(results)
 
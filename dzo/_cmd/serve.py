@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Serve command script.
+"""
+from argparse import Namespace
+from typing import Optional
+
+from . import ExitStatus
+from ..shard import open_engine
+from ..server import make_server
+
+
+def serve(args: Namespace) -> ExitStatus:
+    """serve
+    """
+    index_path: str = args.index_path
+    dicdir: Optional[str] = getattr(args, 'dicdir', None)
+    unix_socket: Optional[str] = getattr(args, 'unix_socket', None)
+
+    engine = open_engine(index_path, dicdir=dicdir)
+
+    try:
+        server = make_server(engine, host=args.host, port=args.port, unix_socket=unix_socket)
+    except OSError as err:
+        print(f'Failed to listen: {err}')
+        engine.close()
+        return ExitStatus.ERROR
+    if unix_socket is not None:
+        print(f'Serving {index_path} on {unix_socket}')
+    else:
+        print(f'Serving {index_path} on http://{args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        engine.close()
+
+    return ExitStatus.SUCCESS
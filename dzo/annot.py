@@ -4,8 +4,11 @@
 
 All of the types defined in this module are specific to this package.
 """
-from typing import List, NamedTuple
-from typing_extensions import Protocol
+from typing import Any, Dict, Iterator, List, NamedTuple, Tuple
+try:
+    from typing import Protocol
+except ImportError:  # Python 3.7
+    from typing_extensions import Protocol  # type: ignore
 
 
 class Document(NamedTuple):
@@ -20,6 +23,9 @@ class Loader(Protocol):
     def load(self) -> List[Document]:
         ...
 
+    def iter_documents(self) -> Iterator[Document]:
+        ...
+
 
 class Token(Protocol):
 
@@ -33,5 +39,12 @@ class Tokenizer(Protocol):
     name: str
     version: str
 
+    @property
+    def params(self) -> Dict[str, Any]:
+        ...
+
     def tokenize(self, sentence: str) -> List[Token]:
         ...
+
+    def index(self, sentence: str) -> Tuple[Dict[str, List[int]], int]:
+        ...
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""Async engine module
+
+AsyncEngine answers queries from asyncio code without blocking the event loop.
+Tokenization and postings traversal are CPU-bound, so they run on a bounded
+pool of worker threads, while coroutines wait for the results.
+
+The number of queries in flight is limited, and each query can be given a
+timeout. A query which is cancelled or timed out before a worker picks it up
+is dropped; a query which is already running cannot be interrupted, so it
+keeps its slot until it finishes, and its results are discarded.
+"""
+import asyncio
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Set, TypeVar
+
+from .engine import Engine
+from .ranking import ScoredDoc
+
+
+T = TypeVar('T')
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, fn: Callable[[], Any]) -> None:
+    """Schedule a callback from any thread, unless the loop has been closed.
+    """
+    try:
+        loop.call_soon_threadsafe(fn)
+    except RuntimeError:
+        pass
+
+
+class AsyncEngine:
+    """A search engine for asyncio.
+
+    Example:
+        >>> async def main():
+        ...     async with AsyncEngine(Engine('/path/to/index'), timeout=1.0) as engine:
+        ...         return await engine.rank('おにぎり', k=10)
+        >>> asyncio.run(main())
+        [ScoredDoc(name='/path/to/doc', score=1.23), ...]
+    """
+
+    def __init__(
+            self,
+            engine: Engine,
+            max_workers: int = 4,
+            max_concurrency: Optional[int] = None,
+            timeout: Optional[float] = None
+        ) -> None:
+        """Initialize the engine.
+
+        Args:
+            engine: a search engine, which is closed together.
+            max_workers: the number of worker threads, which share the engine.
+            max_concurrency: the maximum number of queries which are running or
+                waiting for a worker; further queries wait for a slot.
+                max_workers * 4 if None.
+            timeout: the default timeout of a query in seconds, including the
+                time waiting for a slot; no timeout if None.
+        """
+        if max_workers < 1:
+            raise ValueError('max workers has to be positive')
+        if max_concurrency is None:
+            max_concurrency = max_workers * 4
+        if max_concurrency < 1:
+            raise ValueError('max concurrency has to be positive')
+        self.engine = engine
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='dzo')
+        self._max_concurrency = max_concurrency
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending: Set[Future] = set()  # submitted and not finished yet
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        """Returns the semaphore of slots, created in the running event loop.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._max_concurrency)
+        return self._slots
+
+    async def _submit(self, fn: Callable[[], T]) -> T:
+        """Run a function on a worker once a slot is available.
+
+        The slot is released when the function has finished, or has been
+        cancelled before it started.
+        """
+        loop = asyncio.get_running_loop()
+        slots = self._semaphore()
+        await slots.acquire()
+        try:
+            future: Future = self._executor.submit(fn)
+        except BaseException:
+            slots.release()
+            raise
+        self._pending.add(future)
+
+        def done(_: Future) -> None:
+            self._pending.discard(future)
+            _call_soon(loop, slots.release)
+
+        future.add_done_callback(done)
+        return await asyncio.wrap_future(future)
+
+    async def _run(self, timeout: Optional[float], fn: Callable[..., T], *args: Any) -> T:
+        """Run a method of the engine with a timeout.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        return await asyncio.wait_for(self._submit(functools.partial(fn, *args)), timeout)
+
+    async def search(
+            self,
+            query: str,
+            top_k: Optional[int] = None,
+            timeout: Optional[float] = None
+        ) -> list:
+        """Returns search results (see `Engine.search`).
+
+        Raises:
+            asyncio.TimeoutError: when the query does not finish within the timeout.
+        """
+        return await self._run(timeout, self.engine.search, query, top_k)
+
+    async def rank(
+            self,
+            query: str,
+            k: int = 10,
+            timeout: Optional[float] = None
+        ) -> List[ScoredDoc]:
+        """Returns the top k documents ranked by BM25 (see `Engine.rank`).
+
+        Raises:
+            asyncio.TimeoutError: when the query does not finish within the timeout.
+        """
+        return await self._run(timeout, self.engine.rank, query, k)
+
+    async def query(self, query: str, timeout: Optional[float] = None) -> List[str]:
+        """Returns documents which match a boolean query (see `Engine.query`).
+
+        Raises:
+            asyncio.TimeoutError: when the query does not finish within the timeout.
+        """
+        return await self._run(timeout, self.engine.query, query)
+
+    async def regexp(self, pattern: str, timeout: Optional[float] = None) -> List[str]:
+        """Returns documents which contain a match of a regular expression
+        (see `Engine.regexp`).
+
+        Raises:
+            asyncio.TimeoutError: when the query does not finish within the timeout.
+        """
+        return await self._run(timeout, self.engine.regexp, pattern)
+
+    async def close(self) -> None:
+        """Drop waiting queries, wait for running ones, and release the engine.
+        """
+        # Executor.shutdown(cancel_futures=True) is not available before Python 3.9
+        for future in list(self._pending):
+            future.cancel()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+        self.engine.close()
+
+    async def __aenter__(self) -> 'AsyncEngine':
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        await self.close()
@@ -2,9 +2,10 @@
 """Base module
 """
 from abc import ABCMeta, abstractmethod
-from typing import List
+from typing import Any, Dict, Iterator, List, Tuple
 
 from .annot import Document, Token
+from .indexer import Index, Indexer
 
 
 class AbstractLoader(metaclass=ABCMeta):
@@ -20,6 +21,13 @@ class AbstractLoader(metaclass=ABCMeta):
         """
         raise NotImplementedError
 
+    def iter_documents(self) -> Iterator[Document]:
+        """This method yields documents one at a time.
+
+        Loaders which can read documents lazily should override this method.
+        """
+        return iter(self.load())
+
 
 class AbstractTokenizer(metaclass=ABCMeta):
     """Ab abstract base class for tokenizers.
@@ -31,8 +39,29 @@ class AbstractTokenizer(metaclass=ABCMeta):
     name: str
     version: str
 
+    @property
+    def params(self) -> Dict[str, Any]:
+        """Parameters of the tokenizer, which are saved in index files.
+
+        Tokenizers which take parameters should override this property, so that
+        the same tokenizer can be made from an index file.
+        """
+        return {}
+
     @abstractmethod
     def tokenize(self, sentence: str) -> List[Token]:
         """Tokenize a given sentence.
         """
         raise NotImplementedError
+
+    def index(self, sentence: str) -> Tuple[Index, int]:
+        """Tokenize a given sentence, and group positions of the tokens by token.
+
+        Tokenizers which can group tokens without making them one by one should
+        override this method, which is used for indexing.
+
+        Returns:
+            an index of the sentence, and the number of tokens in it.
+        """
+        tokens = [t.normalized for t in self.tokenize(sentence)]
+        return Indexer.make_index(tokens), len(tokens)
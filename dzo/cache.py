@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""Cache module
+
+Engine caches search results, and decoded postings of hot terms below them, so
+that different queries which share popular terms also benefit.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, Iterator, NamedTuple, Optional, TypeVar, Union
+
+from .codec import PostingList
+from .indexer import DocID, DocInfo
+from .segment import SegmentedReader
+from .storage import IndexReader, TermStats
+
+
+V = TypeVar('V')
+
+
+class CacheStats(NamedTuple):
+    """Counters of a cache.
+    """
+    hits: int
+    misses: int
+    size: int      # total size of cached entries
+    max_size: int
+
+
+class LRUCache(Generic[V]):
+    """A thread-safe cache which evicts the least recently used entries.
+
+    Example:
+        >>> cache: LRUCache[list] = LRUCache(max_size=2)
+        >>> cache.put('a', [1])
+        >>> cache.get('a')
+        [1]
+        >>> cache.get('b') is None
+        True
+        >>> cache.stats()
+        CacheStats(hits=1, misses=1, size=1, max_size=2)
+    """
+
+    def __init__(self, max_size: int, size_of: Optional[Callable[[V], int]] = None) -> None:
+        """Initialize a cache.
+
+        Args:
+            max_size: the maximum total size of entries; 0 disables the cache.
+            size_of: a function which returns the size of a value, such as its
+                memory consumption. Each entry counts as 1 if None.
+        """
+        if max_size < 0:
+            raise ValueError('max size has to be non-negative')
+        self._max_size = max_size
+        self._size_of = size_of
+        self._entries: 'OrderedDict[Hashable, V]' = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Returns the cached value of the key, or None.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: Hashable, value: V) -> None:
+        """Cache a value, evicting the least recently used ones beyond the max size.
+
+        A value larger than the max size is not cached.
+        """
+        size = 1 if self._size_of is None else self._size_of(value)
+        if size > self._max_size:
+            return
+        with self._lock:
+            self._size += size - self._sizes.get(key, 0)
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._entries.move_to_end(key)
+            while self._size > self._max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                self._size -= self._sizes.pop(evicted)
+
+    def clear(self) -> None:
+        """Remove all of the entries, keeping the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._size = 0
+
+    def stats(self) -> CacheStats:
+        """Returns the counters of the cache.
+        """
+        return CacheStats(self._hits, self._misses, self._size, self._max_size)
+
+    def after_fork(self) -> None:
+        """Discard the entries and the counters in a forked child process.
+
+        Entries inherited from the parent would be copied on their first access,
+        and the lock may have been held by another thread of the parent.
+        """
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+
+class CachedReader:
+    """An index reader which caches decoded postings lists.
+
+    Postings lists are cached with their positions, which are decoded at most
+    once while cached. The cache is bounded by a memory budget.
+
+    Example:
+        >>> reader = CachedReader(IndexReader('/path/to/index'), budget=64 * 1024 ** 2)
+        >>> reader.get('もも') is reader.get('もも')
+        True
+    """
+
+    def __init__(self, reader: Union[IndexReader, SegmentedReader], budget: int) -> None:
+        """Initialize a reader.
+
+        Args:
+            reader: an index reader.
+            budget: memory budget of the cache in bytes; 0 disables the cache.
+        """
+        self._reader = reader
+        self._postings: LRUCache[PostingList] = LRUCache(budget, size_of=PostingList.nbytes)
+
+    def changed(self) -> bool:
+        """Returns whether a segmented index has been changed since it was loaded.
+        """
+        return isinstance(self._reader, SegmentedReader) and self._reader.changed()
+
+    def refresh(self) -> bool:
+        """Reload a segmented index if it has been changed, discarding the cache.
+
+        Returns:
+            whether the index has been changed.
+        """
+        if isinstance(self._reader, SegmentedReader) and self._reader.refresh():
+            self._postings.clear()
+            return True
+        return False
+
+    def cache_stats(self) -> CacheStats:
+        """Returns hit and miss counters of the postings cache.
+        """
+        return self._postings.stats()
+
+    def after_fork(self) -> None:
+        """Discard the cache in a forked child process (see `LRUCache.after_fork`).
+        """
+        self._postings.after_fork()
+
+    def get(self, term: str) -> Optional[PostingList]:
+        """Returns the postings of the term from the cache, or None if unknown.
+        """
+        plist = self._postings.get(term)
+        if plist is None:
+            plist = self._reader.get(term)
+            if plist is not None:
+                self._postings.put(term, plist)
+        return plist
+
+    @property
+    def num_docs(self) -> int:  # pylint: disable=missing-docstring
+        return self._reader.num_docs
+
+    @property
+    def total_length(self) -> int:  # pylint: disable=missing-docstring
+        return self._reader.total_length
+
+    def doc(self, doc_id: DocID) -> DocInfo:  # pylint: disable=missing-docstring
+        return self._reader.doc(doc_id)
+
+    def doc_length(self, doc_id: DocID) -> int:  # pylint: disable=missing-docstring
+        return self._reader.doc_length(doc_id)
+
+    def doc_ids(self) -> Iterator[DocID]:  # pylint: disable=missing-docstring
+        return self._reader.doc_ids()
+
+    def df(self, term: str) -> int:  # pylint: disable=missing-docstring
+        return self._reader.df(term)
+
+    def term_stats(self, term: str) -> Optional[TermStats]:  # pylint: disable=missing-docstring
+        return self._reader.term_stats(term)
+
+    def close(self) -> None:
+        """Release the cache and the reader.
+        """
+        self._postings.clear()
+        self._reader.close()
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""Codec module
+
+Postings lists are stored as delta-encoded variable-byte integers (LEB128).
+An encoded postings list of a term has the following layout;
+
+    number of documents
+    document IDs        (delta from the previous document ID)
+    term frequencies
+    positions lengths   (size of the positions of each document in bytes)
+    positions           (for each document, delta from the previous position)
+
+Document IDs and term frequencies come first, so that a query which does not
+need positions never decodes them. Positions are decoded document by document;
+the lengths locate the positions of a document without decoding the others.
+"""
+from array import array
+from itertools import accumulate
+from typing import (Callable, Container, Dict, Iterator, List, Mapping, Optional, Sequence,
+                    Tuple)
+
+from .indexer import DocID
+
+
+def encode_varint(value: int, buf: bytearray) -> None:
+    """Append an unsigned integer to the buffer as a variable-byte integer.
+
+    Example:
+        >>> buf = bytearray()
+        >>> encode_varint(300, buf)
+        >>> bytes(buf)
+        b'\\xac\\x02'
+
+    Args:
+        value: a non-negative integer.
+        buf: a buffer to which the encoded value is appended.
+    """
+    while value >= 0x80:
+        buf.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def decode_varints(buf: bytes, offset: int, count: int) -> Tuple[List[int], int]:
+    """Decode variable-byte integers.
+
+    Args:
+        buf: an encoded buffer.
+        offset: where to start decoding.
+        count: the number of integers to be decoded.
+
+    Returns:
+        decoded integers and the offset next to the last one.
+    """
+    values: List[int] = []
+    append = values.append
+    for _ in range(count):
+        value = shift = 0
+        while True:
+            b = buf[offset]
+            offset += 1
+            value |= (b & 0x7f) << shift
+            if b < 0x80:
+                break
+            shift += 7
+        append(value)
+    return values, offset
+
+
+def _encode_deltas(values: Sequence[int], buf: bytearray) -> None:
+    """Append sorted integers to the buffer as deltas.
+    """
+    prev = 0
+    for value in values:
+        encode_varint(value - prev, buf)
+        prev = value
+
+
+def encode_postings(postings: Mapping[DocID, Sequence[int]]) -> bytes:
+    """Encode a postings list of a term.
+
+    Args:
+        postings: a mapping from document IDs to sorted positions.
+
+    Returns:
+        encoded postings, sorted by document ID.
+    """
+    doc_ids = sorted(postings.keys())
+    buf = bytearray()
+    encode_varint(len(doc_ids), buf)
+    _encode_deltas(doc_ids, buf)
+    for doc_id in doc_ids:
+        encode_varint(len(postings[doc_id]), buf)
+    positions = bytearray()
+    for doc_id in doc_ids:
+        start = len(positions)
+        _encode_deltas(postings[doc_id], positions)
+        encode_varint(len(positions) - start, buf)
+    buf.extend(positions)
+    return bytes(buf)
+
+
+def _skip_varints(buf: bytes, offset: int, count: int) -> int:
+    """Returns the offset next to the given number of variable-byte integers.
+    """
+    while count:
+        if buf[offset] < 0x80:
+            count -= 1
+        offset += 1
+    return offset
+
+
+def concat_postings(bufs: Sequence[bytes]) -> bytes:
+    """Concatenate encoded postings lists without decoding their positions.
+
+    Document IDs of each postings list have to be greater than those of the
+    previous ones, e.g. postings of a term in runs of consecutive documents.
+    Only the document IDs are decoded, and the other sections are copied.
+
+    Args:
+        bufs: postings lists encoded by `encode_postings`.
+
+    Returns:
+        the encoded postings list of all of the documents.
+    """
+    num_docs = 0
+    last: Optional[int] = None
+    doc_ids = bytearray()
+    sections: List[List[memoryview]] = [[], [], []]  # tfs, positions lengths, positions
+    for buf in bufs:
+        (count,), offset = decode_varints(buf, 0, 1)
+        if count == 0:
+            continue
+        deltas, tfs_offset = decode_varints(buf, offset, count)
+        view = memoryview(buf)
+        first = deltas[0]  # the first delta is the document ID itself
+        if last is not None and first <= last:
+            raise ValueError('document IDs of postings lists have to be increasing')
+        encode_varint(first if last is None else first - last, doc_ids)
+        doc_ids.extend(view[_skip_varints(buf, offset, 1):tfs_offset])
+        last = sum(deltas)
+        lengths_offset = _skip_varints(buf, tfs_offset, count)
+        positions_offset = _skip_varints(buf, lengths_offset, count)
+        sections[0].append(view[tfs_offset:lengths_offset])
+        sections[1].append(view[lengths_offset:positions_offset])
+        sections[2].append(view[positions_offset:])
+        num_docs += count
+
+    out = bytearray()
+    encode_varint(num_docs, out)
+    out.extend(doc_ids)
+    for section in sections:
+        for part in section:
+            out.extend(part)
+    return bytes(out)
+
+
+class _PositionsDecoder:
+    """Decode positions of a document in an encoded postings list.
+
+    Offsets of the positions of all documents are decoded from their lengths
+    on first call, which costs as much as decoding the term frequencies.
+    """
+
+    __slots__ = ('_buf', '_offset', '_tfs', '_offsets')
+
+    def __init__(self, buf: bytes, offset: int, tfs: Sequence[int]) -> None:
+        self._buf = buf
+        self._offset = offset  # where the positions lengths start
+        self._tfs = tfs
+        self._offsets: Optional['array[int]'] = None
+
+    def __call__(self, i: int) -> 'array[int]':
+        offsets = self._offsets
+        if offsets is None:
+            lengths, offset = decode_varints(self._buf, self._offset, len(self._tfs))
+            offsets = array('Q', accumulate([offset] + lengths))
+            self._offsets = offsets
+        deltas, _ = decode_varints(self._buf, offsets[i], self._tfs[i])
+        return array('I', accumulate(deltas))
+
+
+_ARRAY_SIZE: int = 80  # size of an empty array object in bytes
+
+PostingsPart = Tuple['PostingList', int, Container[DocID]]  # (<PostingList>, <Base>, <Deleted>)
+
+
+class PostingList:
+    """A decoded postings list of a term.
+
+    Document IDs and term frequencies are decoded eagerly into compact arrays,
+    while positions of a document are decoded on first access to them.
+
+    Example:
+        >>> plist = PostingList.decode(encode_postings({0: [2, 4], 1: [0]}))
+        >>> list(plist.doc_ids), list(plist.tfs)
+        ([0, 1], [2, 1])
+        >>> list(plist.positions(0))
+        [2, 4]
+    """
+
+    __slots__ = ('doc_ids', 'tfs', '_positions', '_loader')
+
+    def __init__(
+            self,
+            doc_ids: 'array[int]',
+            tfs: 'array[int]',
+            positions: Optional[List['array[int]']] = None,
+            loader: Optional[Callable[[int], 'array[int]']] = None
+        ) -> None:
+        """Initialize a postings list.
+
+        Args:
+            doc_ids: sorted document IDs.
+            tfs: term frequencies in each document.
+            positions: positions in each document.
+            loader: a function which returns positions in the i-th document,
+                called on first access to them when positions are not given.
+        """
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self._positions: Optional[List[Optional['array[int]']]] = \
+            list(positions) if positions is not None else None
+        self._loader = loader
+
+    @classmethod
+    def decode(cls, buf: bytes) -> 'PostingList':
+        """Decode a postings list encoded by `encode_postings`.
+        """
+        (num_docs,), offset = decode_varints(buf, 0, 1)
+        deltas, offset = decode_varints(buf, offset, num_docs)
+        values, offset = decode_varints(buf, offset, num_docs)
+        tfs = array('I', values)
+        return cls(array('I', accumulate(deltas)), tfs,
+                   loader=_PositionsDecoder(buf, offset, tfs))
+
+    @classmethod
+    def join(cls, parts: Sequence[PostingsPart]) -> 'PostingList':
+        """Join postings lists of consecutive document ID ranges.
+
+        Args:
+            parts: triples of a postings list, a base added to its document IDs
+                and a container of its document IDs to be dropped. Parts have to
+                be ordered so that the resulting document IDs are sorted.
+
+        Returns:
+            a postings list whose positions are decoded on first access.
+        """
+        doc_ids: 'array[int]' = array('I')
+        tfs: 'array[int]' = array('I')
+        sources: List[Tuple['PostingList', int]] = []
+        for plist, base, deleted in parts:
+            indices = [i for i, doc_id in enumerate(plist.doc_ids) if doc_id not in deleted]
+            doc_ids.extend(base + plist.doc_ids[i] for i in indices)
+            tfs.extend(plist.tfs[i] for i in indices)
+            sources.extend((plist, i) for i in indices)
+
+        def load(i: int) -> 'array[int]':
+            plist, j = sources[i]
+            return plist.positions(j)
+
+        return cls(doc_ids, tfs, loader=load)
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def nbytes(self) -> int:
+        """Estimate the memory consumption of the postings list in bytes,
+        including positions whether they are decoded or not.
+        """
+        return (_ARRAY_SIZE * (len(self) + 2)
+                + self.doc_ids.itemsize * (len(self.doc_ids) + len(self.tfs) + sum(self.tfs)))
+
+    def positions(self, i: int) -> 'array[int]':
+        """Returns positions in the i-th document of the postings list.
+
+        Positions of the other documents are not decoded. Threads may decode
+        the same positions at the same time, which only wastes work.
+
+        Args:
+            i: an index of the postings list, not a document ID.
+
+        Returns:
+            sorted positions.
+        """
+        positions = self._positions
+        if positions is None:
+            positions = self._positions = [None] * len(self)
+        found = positions[i]
+        if found is None:
+            assert self._loader is not None
+            found = positions[i] = self._loader(i)
+        return found
+
+    def items(self) -> Iterator[Tuple[DocID, 'array[int]']]:
+        """Iterate over pairs of a document ID and positions in the document.
+        """
+        return zip(self.doc_ids, (self.positions(i) for i in range(len(self))))
+
+    def to_dict(self) -> Dict[DocID, List[int]]:
+        """Returns the postings list as a mapping from document IDs to positions.
+        """
+        return {doc_id: list(positions) for doc_id, positions in self.items()}
@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 """Constant module
+
+This module is imported by `import dzo`, so it imports nothing to start fast.
 """
-import logging
 
 
-DEFAULT_LOG_LEVEL: int = logging.DEBUG
+DEFAULT_LOG_LEVEL: int = 10  # logging.DEBUG
 _VERSION: str = '0.0.7'
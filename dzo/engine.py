@@ -1,22 +1,122 @@
 # -*- coding: utf-8 -*-
 """Engine module
 """
+import functools
 import os
+import queue
+import re
+import threading
+import weakref
+from contextlib import contextmanager
 from os import path
 import logging
-import pickle
-from typing import Optional, Tuple
-
-import MeCab
+from typing import Callable, Hashable, Iterable, Iterator, List, Optional, Tuple, Union
 
 from .annot import Tokenizer
+from .cache import CachedReader, CacheStats, LRUCache
 from .const import _VERSION
-from .indexer import InvIndex
+from .loader import DirectoryLoader
+from .query import Evaluator, Node, parse
+from .regexp import compile_regexp
+from .ranking import BM25, CorpusStats, ScoredDoc, corpus_stats, rank_bm25
+from .segment import SegmentedReader, is_segmented
+from .storage import IndexReader
 from .tokenizer import MeCabTokenizer, NGramTokenizer
 
 
+class _TokenizerPool:
+    """A pool of tokenizers, so that each thread uses its own one at a time.
+
+    Tokenizers such as MeCabTokenizer keep state of the last sentence, and
+    cannot be shared between threads. A tokenizer is made only when all of
+    the pooled ones are in use, so that the pool grows up to the number of
+    concurrent queries, and threads made per request reuse tokenizers.
+    """
+
+    def __init__(self, factory: Callable[[], Tokenizer]) -> None:
+        self._factory = factory
+        self._idle: 'queue.SimpleQueue[Tokenizer]' = queue.SimpleQueue()
+        self.prototype = factory()  # for the name and the parameters
+        self._idle.put(self.prototype)
+
+    @contextmanager
+    def acquire(self) -> Iterator[Tokenizer]:
+        """Borrow a tokenizer, which is returned to the pool on exit.
+        """
+        try:
+            tokenizer = self._idle.get_nowait()
+        except queue.Empty:
+            tokenizer = self._factory()
+        try:
+            yield tokenizer
+        finally:
+            self._idle.put(tokenizer)
+
+    def after_fork(self) -> None:
+        """Make a new queue in a forked child process.
+
+        Tokenizers borrowed by other threads of the parent are not returned.
+        """
+        self._idle = queue.SimpleQueue()
+        self._idle.put(self.prototype)
+
+
+class _SharedLock:
+    """A readers-writer lock, preferring writers so that they do not starve.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        """Hold the lock with other readers.
+        """
+        with self._cond:
+            while self._writing or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """Hold the lock alone.
+        """
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
 class Engine:
     """Engine class.
+
+    Methods of an engine are thread-safe. Threads share the index and the
+    caches, and each of them borrows a tokenizer from a pool.
+
+    An engine can be made before forking worker processes, e.g. by pre-fork
+    servers. The index is memory-mapped, so that all of the workers share its
+    pages. Each worker starts with empty caches of its own, since cached
+    objects inherited from the parent would be copied as soon as they are
+    touched. Calling gc.freeze() before forking keeps the garbage collector
+    from touching the other inherited objects.
     """
 
     version: str = _VERSION
@@ -24,36 +124,59 @@ class Engine:
     def __init__(
             self,
             index_path: str,
-            dicdir: Optional[str] = None
+            dicdir: Optional[str] = None,
+            bm25: Optional[BM25] = None,
+            cache_size: int = 1024,
+            postings_cache_size: int = 64 * 1024 ** 2,
+            preload: bool = False
         ) -> None:
         """Initialize the search engine.
+
+        Args:
+            index_path: a path to the index file or the segmented index directory.
+            dicdir: MeCab dictionary directory.
+            bm25: a scoring function for ranked search; BM25() if None.
+            cache_size: the number of cached search results; 0 disables the cache.
+            postings_cache_size: memory budget of decoded postings lists in bytes;
+                0 disables the cache.
+            preload: whether to read the index into the page cache ahead.
         """
-        _inv_index: InvIndex
-        _tokenizer: Tokenizer
-        _inv_index, _tokenizer = self.__load_inv_index(index_path, dicdir)
+        _index: Union[IndexReader, SegmentedReader]
+        _factory: Callable[[], Tokenizer]
+        _index, _factory = self.__load_inv_index(index_path, dicdir, preload)
 
         logging.info('Loaded inverted index')
 
-        self._inv_index = _inv_index
-        self._tokenizer = _tokenizer
+        self._index = CachedReader(_index, postings_cache_size)
+        self._tokenizers = _TokenizerPool(_factory)
+        self._bm25 = BM25() if bm25 is None else bm25
+        self._results: LRUCache[list] = LRUCache(cache_size)
+        # queries share the index, while a refresh replaces it
+        self._lock = _SharedLock()
+        _ENGINES.add(self)
 
     def __load_inv_index(
             self,
             index_path: str,
-            dicdir: Optional[str]
-        ) -> Tuple[InvIndex, Tokenizer]:
-        """Load inverted index.
-        """
-        name: str
-        version: str
-        inv_index: InvIndex
+            dicdir: Optional[str],
+            preload: bool
+        ) -> Tuple[Union[IndexReader, SegmentedReader], Callable[[], Tokenizer]]:
+        """Load inverted index, and returns it with a factory of tokenizers.
 
-        tokenizer: Tokenizer
+        The index file is memory-mapped, so that no postings are decoded here.
+        A directory is opened as a segmented index (see `segment` module).
+        """
+        factory: Callable[[], Tokenizer]
+        index: Union[IndexReader, SegmentedReader]
 
         if not path.exists(index_path):
             raise FileNotFoundError
-        with open(index_path, mode='rb') as fp:
-            name, version, inv_index = pickle.load(fp)
+        if is_segmented(index_path):
+            index = SegmentedReader(index_path, preload)
+        else:
+            index = IndexReader(index_path, preload)
+        name = index.tokenizer_name
+        version = index.tokenizer_version
 
         if version != self.version:
             msg = f'Versions differ: current {self.version}, index {version}'
@@ -65,27 +188,228 @@ class Engine:
                 raise ValueError(msg)
             if not os.path.isdir(dicdir):
                 raise FileNotFoundError(f'not found: {dicdir}')
-            tagger = MeCab.Tagger(dicdir)
-            tokenizer = MeCabTokenizer(tagger)
+            factory = functools.partial(MeCabTokenizer.from_args, dicdir)
         elif name == NGramTokenizer.name:
-            tokenizer = NGramTokenizer(n=3)  # TODO retrive `n`
+            factory = functools.partial(NGramTokenizer, **index.tokenizer_params)
         else:
             raise ValueError(f'name of the inverted index is invalid')
 
-        return inv_index, tokenizer
+        return index, factory
 
-    def search(self, query: str) -> list:  # TODO type hinting
+    @property
+    def num_docs(self) -> int:
+        """The number of documents in the index.
+        """
+        return self._index.num_docs
+
+    def _after_fork(self) -> None:
+        """Reset the caches and the locks in a forked child process.
+        """
+        self._lock = _SharedLock()
+        self._results.after_fork()
+        self._index.after_fork()
+        self._tokenizers.after_fork()
+
+    def refresh(self) -> bool:
+        """Pick up changes of a segmented index.
+
+        Cached search results are discarded when the index has been changed.
+        The index is reloaded once running queries have finished.
+
+        Returns:
+            whether the index has been changed.
+        """
+        if not self._index.changed():
+            return False
+        with self._lock.exclusive():
+            if self._index.refresh():
+                self._results.clear()
+                return True
+        return False
+
+    def cache_stats(self) -> CacheStats:
+        """Returns hit and miss counters of the search result cache.
+        """
+        return self._results.stats()
+
+    def postings_cache_stats(self) -> CacheStats:
+        """Returns hit and miss counters of the decoded postings cache.
+        """
+        return self._index.cache_stats()
+
+    def _cached(self, key: Hashable, search: Callable[[], list]) -> list:
+        """Returns cached results of the key, or searches and caches them.
+
+        Results are copied, so that callers cannot modify the cached ones.
+        Results are searched and cached while the index is not being reloaded.
+        """
+        with self._lock.shared():
+            results = self._results.get(key)
+            if results is None:
+                results = search()
+                self._results.put(key, results)
+        return list(results)
+
+    def search(self, query: str, top_k: Optional[int] = None) -> list:  # TODO type hinting
         """Returns search results.
 
         Parameters:
             query: a search query, represented as a string.
+            top_k: if given, documents are ranked by BM25, and only the top k
+                documents are returned.
+
+        Returns:
+            results: names of matched documents for each token, or the top k
+                pairs of a document name and its score if `top_k` is given.
+        """
+        if top_k is not None:
+            return self.rank(query, top_k)
+        self.refresh()
+        terms = self._terms(query)  # equivalent queries share a cache entry
+        return self._cached(('search', terms), lambda: self._search(terms))
+
+    def _search(self, terms: Tuple[str, ...]) -> list:
+        """Returns names of documents which contain each term.
+        """
+        results = []
+        for term in terms:
+            postings = self._index.get(term)
+            if postings is not None:
+                results.extend([self._index.doc(doc_id).name for doc_id in postings.doc_ids])
+        return results
+
+    def _terms(self, query: str) -> Tuple[str, ...]:
+        """Returns normalized tokens of the query.
+        """
+        with self._tokenizers.acquire() as tokenizer:
+            return tuple(token.normalized for token in tokenizer.tokenize(query))
+
+    def corpus_stats(self, query: str) -> CorpusStats:
+        """Returns statistics of the index for ranking the query.
+
+        Statistics of shards are combined into those of the whole collection
+        (see `shard` module).
+        """
+        self.refresh()
+        terms = self._terms(query)
+        with self._lock.shared():
+            return corpus_stats(self._index, terms)
+
+    def rank(
+            self,
+            query: str,
+            k: int = 10,
+            stats: Optional[CorpusStats] = None
+        ) -> List[ScoredDoc]:
+        """Returns the top k documents ranked by BM25.
+
+        Parameters:
+            query: a search query, represented as a string.
+            k: the number of results.
+            stats: statistics of the whole collection, when the index is a shard
+                of it; results are not cached then.
 
         Returns:
-            results: WIP
+            pairs of a document name and its score in descending order of the score.
         """
-        tokens = self._tokenizer.tokenize(query)
+        self.refresh()
+        terms = self._terms(query)
+        if stats is not None:
+            with self._lock.shared():
+                return self._rank(terms, k, stats)
+        return self._cached(('rank', terms, k), lambda: self._rank(terms, k))
+
+    def _rank(
+            self,
+            terms: Tuple[str, ...],
+            k: int,
+            stats: Optional[CorpusStats] = None
+        ) -> List[ScoredDoc]:
+        """Returns the top k documents without the cache.
+        """
+        ranked = rank_bm25(self._index, terms, k, self._bm25, stats=stats)
+        return [ScoredDoc(self._index.doc(doc_id).name, score) for doc_id, score in ranked]
+
+    def query(self, query: str) -> List[str]:
+        """Returns documents which match a boolean query.
+
+        Parameters:
+            query: a query with AND, OR, NOT, NEAR/k and parentheses, whose words
+                are matched as phrases (see `query` module).
+
+        Returns:
+            names of matched documents in the order of document IDs.
+        """
+        self.refresh()
+        node = parse(query)  # normalizes spacing and redundant parentheses
+        return self._cached(('query', node), lambda: self._query(node))
+
+    def _query(self, node: Node) -> List[str]:
+        """Returns documents which match a parsed query without the cache.
+        """
+        with self._tokenizers.acquire() as tokenizer:
+            doc_ids = Evaluator(self._index, tokenizer).evaluate(node)
+        return [self._index.doc(doc_id).name for doc_id in doc_ids]
+
+    def regexp(self, pattern: str) -> List[str]:
+        """Returns documents which contain a match of a regular expression.
+
+        For an n-gram index, candidate documents are selected by a query of
+        n-grams compiled from the regular expression, and only the candidates
+        are read from their files and matched. Otherwise, all of the documents
+        are read. Results are not cached, since the files may have been changed.
+        Documents have to be named by the paths of their files; documents whose
+        files cannot be read as text are skipped.
+
+        Parameters:
+            pattern: a regular expression.
+
+        Returns:
+            names of matched documents in the order of document IDs.
+        """
+        self.refresh()
+        regexp = re.compile(pattern)
+        node = None
+        prototype = self._tokenizers.prototype
+        if isinstance(prototype, NGramTokenizer):
+            node = compile_regexp(pattern, prototype.n)
+        with self._lock.shared():
+            if node is None:
+                msg = f'Reading all of the documents to match {pattern!r}'
+                logging.info(msg)
+                doc_ids: Iterable[int] = self._index.doc_ids()
+            else:
+                with self._tokenizers.acquire() as tokenizer:
+                    doc_ids = Evaluator(self._index, tokenizer).evaluate(node)
+            names = [self._index.doc(doc_id).name for doc_id in doc_ids]
+
         results = []
-        for token in tokens:
-            if token.normalized in self._inv_index.keys():
-                results.extend([name for name in self._inv_index[token.normalized].keys()])
+        for name in names:
+            try:
+                doc = DirectoryLoader.read(name)
+            except (OSError, ValueError) as err:  # ValueError for a name with a null byte
+                msg = f'Cannot read {name}, which has been indexed: {err}'
+                logging.warning(msg)
+                continue
+            if doc is not None and regexp.search(doc.content):
+                results.append(name)
         return results
+
+    def close(self) -> None:
+        """Release the loaded index.
+        """
+        self._index.close()
+
+
+_ENGINES: 'weakref.WeakSet[Engine]' = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    """Reset all of the engines in a forked child process.
+    """
+    for engine in list(_ENGINES):
+        engine._after_fork()  # pylint: disable=protected-access
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -4,9 +4,10 @@
 from typing import Dict, List, NamedTuple
 
 
-Index = Dict[str, List[int]]                 # {'<Token>': [<Position>, ...]}
-FullIndex = Dict[str, Dict[str, List[int]]]  # {'<DocumentID>': {'<Token>': [<Position>, ...]}}
-InvIndex = Dict[str, Dict[str, List[int]]]   # {'<Token>': {'<DocumentID>': [<Position>, ...]}}
+DocID = int                                    # Dense integer ID, starting from 0
+Index = Dict[str, List[int]]                   # {'<Token>': [<Position>, ...]}
+FullIndex = Dict[str, Dict[str, List[int]]]    # {'<DocumentName>': {'<Token>': [<Position>, ...]}}
+InvIndex = Dict[str, Dict[DocID, List[int]]]   # {'<Token>': {<DocumentID>: [<Position>, ...]}}
 
 
 class NamedIndex(NamedTuple):
@@ -16,10 +17,111 @@ class NamedIndex(NamedTuple):
     idx: Index
 
 
+class DocInfo(NamedTuple):
+    """An entry of the document table.
+    """
+    name: str
+    length: int  # number of tokens
+
+
+DocTable = List[DocInfo]  # [<DocInfo of DocumentID 0>, <DocInfo of DocumentID 1>, ...]
+
+
+class IndexedCorpus(NamedTuple):
+    """An inverted index with its document table.
+    """
+    inv_index: InvIndex
+    doc_table: DocTable
+
+
 class Indexer:
     """An ordinary indexer class.
+
+    An instance of this class builds an inverted index incrementally; postings
+    of each document are added straight into the inverted index, so that no
+    per-document index has to be kept until all of the documents are tokenized.
+
+    Example:
+        >>> indexer = Indexer()
+        >>> indexer.add('first', ['すもも', 'も', 'もも', 'も', 'もも', 'の', 'うち'])
+        0
+        >>> indexer.add('second', ['もも', 'くり', 'さんねん', 'かき', 'はちねん'])
+        1
+        >>> indexer.corpus().inv_index['もも']
+        {0: [2, 4], 1: [0]}
     """
 
+    def __init__(self) -> None:
+        self._inv_index: InvIndex = {}
+        self._doc_table: DocTable = []
+
+    def __len__(self) -> int:
+        return len(self._doc_table)
+
+    @property
+    def doc_table(self) -> DocTable:
+        """The document table of all of the documents added so far.
+        """
+        return self._doc_table
+
+    def add(self, name: str, tokens: List[str]) -> DocID:
+        """Add a document (represented as a list of tokens) to the inverted index.
+
+        Args:
+            name: A name of the document.
+            tokens: A list of strings in the document.
+
+        Returns:
+            The document ID assigned to the document.
+        """
+        return self.add_index(name, self.make_index(tokens), len(tokens))
+
+    def add_index(self, name: str, index: Index, length: int) -> DocID:
+        """Add a document (represented as an index of its tokens) to the inverted index.
+
+        This is the same as `Indexer.add`, but takes positions of the tokens which
+        have been grouped by a tokenizer (see `AbstractTokenizer.index`).
+
+        Args:
+            name: A name of the document.
+            index: An index of the document.
+            length: The number of tokens in the document.
+
+        Returns:
+            The document ID assigned to the document.
+        """
+        doc_id = len(self._doc_table)
+        for token, positions in index.items():
+            if token in self._inv_index.keys():
+                self._inv_index[token][doc_id] = positions
+            else:
+                self._inv_index[token] = {doc_id: positions}
+        self._doc_table.append(DocInfo(name, length))
+        return doc_id
+
+    def update(self, corpus: IndexedCorpus) -> None:
+        """Add all of the documents in another inverted index.
+
+        Document IDs of the given inverted index are shifted, so that the
+        documents follow the ones added so far.
+
+        Args:
+            corpus: An inverted index with its document table.
+        """
+        base = len(self._doc_table)
+        for token, postings in corpus.inv_index.items():
+            shifted = {base + doc_id: positions for doc_id, positions in postings.items()}
+            if token in self._inv_index.keys():
+                self._inv_index[token].update(shifted)
+            else:
+                self._inv_index[token] = shifted
+        self._doc_table.extend(corpus.doc_table)
+
+    def corpus(self) -> IndexedCorpus:
+        """Returns the inverted index built so far with its document table.
+        """
+        return IndexedCorpus(self._inv_index, self._doc_table)
+
     @staticmethod
     def make_index(tokens: List[str]) -> Index:
         """Make an index for a document (represented as a list of tokens).
@@ -80,10 +182,34 @@ class Indexer:
         """
         return {name: idx for name, idx in named_indices}
 
+    @staticmethod
+    def make_doc_table(full_index: FullIndex) -> DocTable:
+        """Make a document table from full index.
+
+        The document ID of each document is its position in the full index, which
+        is the same as the one used by Indexer.make_inv_index().
+
+        Example:
+            >>> full_idx = Indexer.merge([first_idx, second_idx])
+            >>> Indexer.make_doc_table(full_idx)
+            >>> [DocInfo(name='first', length=7), DocInfo(name='second', length=5)]
+
+        Args:
+            full_index: A full index which is returned by Indexer.merge() method.
+
+        Returns:
+            A document table, whose indices are document IDs.
+        """
+        return [DocInfo(name, sum(len(positions) for positions in index.values()))
+                for name, index in full_index.items()]
+
     @staticmethod
     def make_inv_index(full_index: FullIndex) -> InvIndex:
         """Make an inverted index from full index.
 
+        Documents are identified by dense integer IDs in the order of the full
+        index, so that postings of each token are sorted by document ID.
+
         Example:
             >>> first_idx = NamedIndex('first', {
             ...     'すもも': [0], 'も': [1, 3], 'もも': [2, 4], 'の': [5], 'うち': [6]
@@ -94,15 +220,15 @@ class Indexer:
             >>> full_idx = Indexer.merge([first_idx, second_idx])
             >>> Indexer.make_inv_index(full_idx)
             >>> {
-            >>>     'すもも': {'first': [0]},
-            >>>     'も': {'first': [1, 3]},
-            >>>     'もも': {'first': [2, 4], 'second': [0]},
-            >>>     'の': {'first': [5]},
-            >>>     'うち': {'first': [6]},
-            >>>     'くり': {'second': [1]},
-            >>>     'さんねん': {'second': [2]},
-            >>>     'かき': {'second': [3]},
-            >>>     'はちねん': {'second': [4]},
+            >>>     'すもも': {0: [0]},
+            >>>     'も': {0: [1, 3]},
+            >>>     'もも': {0: [2, 4], 1: [0]},
+            >>>     'の': {0: [5]},
+            >>>     'うち': {0: [6]},
+            >>>     'くり': {1: [1]},
+            >>>     'さんねん': {1: [2]},
+            >>>     'かき': {1: [3]},
+            >>>     'はちねん': {1: [4]},
             >>> }
 
         Args:
@@ -112,13 +238,10 @@ class Indexer:
             An inverted index of given documents.
         """
         inv_index: InvIndex = {}
-        for name, index in full_index.items():
+        for doc_id, index in enumerate(full_index.values()):
             for token in index.keys():
                 if token in inv_index.keys():
-                    if name in inv_index[token].keys():
-                        inv_index[token][name].extend(index[token][:])
-                    else:
-                        inv_index[token][name] = index[token]
+                    inv_index[token][doc_id] = index[token]
                 else:
-                    inv_index[token] = {name: index[token]}
+                    inv_index[token] = {doc_id: index[token]}
         return inv_index
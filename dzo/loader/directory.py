@@ -1,10 +1,10 @@
 # -*- coding: utf-8 -*-
 """DirectoryLoader module
 """
-import glob
 import logging
+import os
 import os.path
-from typing import List, Optional, Set
+from typing import Iterator, List, Optional, Set
 
 from ..annot import Document
 from ..base import AbstractLoader
@@ -28,49 +28,86 @@ class DirectoryLoader(AbstractLoader):
         _, ext = os.path.splitext(file_name)
         return ext
 
-    def _get_file_paths(self, ignored_exts: Optional[Set[str]]) -> List[str]:
-        """Returns file paths included in target directory.
+    def _walk(self, dir_path: str, ignored_exts: Optional[Set[str]]) -> Iterator[str]:
+        """Walk a directory recursively, and yields file paths in sorted order.
+
+        Hidden files and directories are skipped as glob.glob() does, and symbolic
+        links to directories are not followed.
+        """
+        with os.scandir(dir_path) as it:
+            entries = sorted((e for e in it if not e.name.startswith('.')), key=lambda e: e.name)
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from self._walk(entry.path, ignored_exts)
+            elif entry.is_file():
+                if ignored_exts is None or self._extr_ext(entry.path) not in ignored_exts:
+                    yield entry.path
+
+    def iter_paths(self, ignored_exts: Optional[Set[str]] = None) -> Iterator[str]:
+        """Walk the target directory, and yield file paths without reading them.
 
         Args:
-            ignored_exts: file extensions to be ignored. e.g. {'.py', '.so'}
+            ignored_exts: File extensions to be ignored.
 
         Returns:
-            file_paths: a list of file paths.
+            An iterator of file paths in sorted order.
         """
-        dir_path = os.path.join(self._target_dir, '**')
-        all_paths = glob.glob(dir_path, recursive=True)
-        if ignored_exts is None:
-            return [p for p in all_paths if os.path.isfile(p)]
-        file_paths = [p for p in all_paths if self._extr_ext(p) not in ignored_exts]
-        return [p for p in file_paths if os.path.isfile(p)]
+        return self._walk(self._target_dir, ignored_exts)
 
-    def load(self, ignored_exts: Optional[Set[str]] = None) -> List[Document]:
-        """Load the target directory and load all of the files.
+    @staticmethod
+    def read(file_path: str) -> Optional[Document]:
+        """Read a file as a document.
+
+        Args:
+            file_path: a path to the file.
+
+        Returns:
+            A document, or None if the file seems to be a binary file.
+        """
+        with open(file_path, mode='r') as fp:
+            try:
+                content = fp.read().replace('\n', '')
+            except UnicodeDecodeError:
+                return None
+        return Document(file_path, content)
+
+    def iter_documents(self, ignored_exts: Optional[Set[str]] = None) -> Iterator[Document]:
+        """Walk the target directory, and yield documents one at a time.
+
+        Unlike DirectoryLoader.load(), only one file is read into memory at a
+        time, so that documents can be consumed as soon as they are read.
 
         Args:
             ignored_exts: File extensions to be ignored.
 
         Returns:
-            A list of documents.
+            An iterator of documents.
         """
-        # Read file paths
-        file_paths = self._get_file_paths(ignored_exts=ignored_exts)
-        if not file_paths:
-            raise FileNotFoundError('The directory seems to be empty')
-        # Read all files
-        docs: List[Document] = []
+        num_files = 0
         invalid_doc_paths: List[str] = []
-        for file_path in file_paths:
-            with open(file_path, mode='r') as fp:
-                try:
-                    content = fp.read().replace('\n', '')
-                except UnicodeDecodeError:
-                    invalid_doc_paths.append(file_path)
-            docs.append(Document(file_path, content))
+        for file_path in self.iter_paths(ignored_exts=ignored_exts):
+            num_files += 1
+            doc = self.read(file_path)
+            if doc is None:
+                invalid_doc_paths.append(file_path)
+                continue
+            yield doc
+
+        if not num_files:
+            raise FileNotFoundError('The directory seems to be empty')
 
         if invalid_doc_paths:
             listed_paths = '\n'.join(invalid_doc_paths)
             msg = f'Files in the following paths seem to be binary files:\n{listed_paths}'
             logging.warning(msg)
 
-        return docs
+    def load(self, ignored_exts: Optional[Set[str]] = None) -> List[Document]:
+        """Load the target directory and load all of the files.
+
+        Args:
+            ignored_exts: File extensions to be ignored.
+
+        Returns:
+            A list of documents.
+        """
+        return list(self.iter_documents(ignored_exts=ignored_exts))
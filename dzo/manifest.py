@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Manifest module
+
+A manifest records the state of every file indexed in an index file, so that an
+incremental preprocessing run can tell which files were added, changed or
+deleted since the last run. It is saved alongside the index as a JSON file.
+
+A file is considered unchanged when its modification time and size are the
+same as recorded. Otherwise the digest of its content decides whether it has to
+be tokenized again.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, NamedTuple, Optional
+
+from .annot import Document
+
+
+class FileStat(NamedTuple):
+    """State of an indexed file.
+    """
+    mtime: int  # modification time in nanoseconds
+    size: int
+    digest: str
+
+
+def manifest_path(index_path: str) -> str:
+    """Returns the path to the manifest of an index file.
+    """
+    return f'{index_path}.manifest'
+
+
+def content_digest(content: str) -> str:
+    """Returns the digest of a document content.
+    """
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class Manifest:
+    """A mapping from file paths to the state of the files when indexed.
+
+    Example:
+        >>> manifest = Manifest.load(manifest_path('/path/to/index'))
+        >>> manifest.is_unchanged('/path/to/document.txt')
+        True
+    """
+
+    def __init__(self, files: Optional[Dict[str, FileStat]] = None) -> None:
+        self.files: Dict[str, FileStat] = {} if files is None else files
+
+    @classmethod
+    def load(cls, p: str) -> 'Manifest':
+        """Load a manifest saved by Manifest().save() method.
+
+        Args:
+            p: a path to the manifest.
+
+        Returns:
+            a manifest.
+        """
+        if not os.path.isfile(p):
+            raise FileNotFoundError(f'file not found: {p}')
+        with open(p, mode='r') as fp:
+            obj = json.load(fp)
+        return cls({name: FileStat(*stat) for name, stat in obj['files'].items()})
+
+    def save(self, p: str) -> None:
+        """Save the manifest atomically.
+
+        Args:
+            p: a path to the manifest.
+        """
+        tmp_path = f'{p}.tmp'
+        with open(tmp_path, mode='w') as fp:
+            json.dump({'files': {name: list(stat) for name, stat in self.files.items()}},
+                      fp, ensure_ascii=False)
+        os.replace(tmp_path, p)
+
+    def is_unchanged(self, file_path: str, st: os.stat_result) -> bool:
+        """Whether the modification time and the size of the file are as recorded.
+
+        Args:
+            file_path: a path to the file.
+            st: the current status of the file.
+        """
+        stat = self.files.get(file_path)
+        return stat is not None and stat.mtime == st.st_mtime_ns and stat.size == st.st_size
+
+    def has_same_content(self, doc: Document) -> bool:
+        """Whether the content of the document is the same as recorded.
+        """
+        stat = self.files.get(doc.name)
+        return stat is not None and stat.digest == content_digest(doc.content)
+
+    def record(self, doc: Document, st: os.stat_result) -> None:
+        """Record the state of the file of a document.
+
+        Args:
+            doc: a document read from the file.
+            st: the status of the file taken before it was read. If the file
+                is changed while it is read, the recorded status is older than
+                the file, which is then read again by the next run.
+        """
+        self.files[doc.name] = FileStat(st.st_mtime_ns, st.st_size, content_digest(doc.content))
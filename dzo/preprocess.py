@@ -2,13 +2,21 @@
 """Preprocess module
 """
 import logging
-import pickle
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from itertools import islice
 from os import path
-from typing import List, Optional, Set
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-from .annot import Tokenizer
-from .indexer import Indexer, NamedIndex, InvIndex
+from .annot import Document, Tokenizer
+from .indexer import DocID, DocTable, Indexer, IndexedCorpus
 from .loader import DirectoryLoader
+from .manifest import Manifest, manifest_path
+from .shard import Shards, shard_name, shard_of, write_shards
+from .spill import SpillingIndexer, merge_entries, remap_entries
+from .storage import Entry, IndexReader, iter_entries, write_entries, write_index
 
 
 def _extr_ext(p: str) -> str:
@@ -30,22 +38,71 @@ def _extr_ext(p: str) -> str:
     return ext
 
 
+_CHUNK_SIZE: int = 32  # number of documents sent to a worker at once
+
+_worker_tokenizer: Optional[Tokenizer] = None
+
+
+def _init_worker(tokenizer: Tokenizer) -> None:
+    """Initialize a worker process with its own tokenizer.
+    """
+    global _worker_tokenizer  # pylint: disable=global-statement
+    _worker_tokenizer = tokenizer
+
+
+def _index_chunk(docs: List[Document]) -> IndexedCorpus:
+    """Tokenize a chunk of documents, and make a partial inverted index of them.
+
+    This function runs in worker processes.
+    """
+    assert _worker_tokenizer is not None
+    indexer = Indexer()
+    for doc in docs:
+        indexer.add_index(doc.name, *_worker_tokenizer.index(doc.content))
+    return indexer.corpus()
+
+
+def _chunked(docs: Iterable[Document], size: int) -> Iterator[List[Document]]:
+    """Split documents into chunks.
+    """
+    it = iter(docs)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
 class Preprocessor:
     """Preprocess pipeline class.
-
-    Todo:
-        - parallelization: tokeninzation & indexing steps
     """
 
     def __init__(
             self,
             loader: DirectoryLoader,
-            tokenizer: Tokenizer
+            tokenizer: Tokenizer,
+            memory_budget: Optional[int] = None,
+            workers: int = 1
         ) -> None:
+        """Initialize the pipeline.
+
+        Args:
+            loader: a document loader.
+            tokenizer: a tokenizer.
+            memory_budget: memory budget in bytes for Preprocessor.build() method.
+                If it is set, partial inverted indices are spilled to temporary
+                files whenever the budget is reached. Defaults to None.
+            workers: the number of processes for tokenization and indexing. Each
+                process has its own copy of the tokenizer. Defaults to 1.
+        """
+        if workers < 1:
+            raise ValueError('the number of workers has to be positive')
         self._loader = loader
         self._tokenizer = tokenizer
+        self._memory_budget = memory_budget
+        self._workers = workers
 
-    def preprocess(self, ignored_exts: Optional[Set[str]] = None) -> InvIndex:
+    def preprocess(self, ignored_exts: Optional[Set[str]] = None) -> IndexedCorpus:
         """A preprocessing pipeline.
 
         This method consists of some steps;
@@ -53,38 +110,294 @@ class Preprocessor:
         2) Tokenization (tokenizers are in chargs of this step).
         3) Make an inverted index of documents represented as a series of tokens.
 
+        All of the steps are done document by document, so that the content,
+        tokens and the index of a document are released as soon as they are
+        added to the inverted index.
+
         Args:
             ignored_exts: File extensions to be ignored. Defaults to None.
 
         Returns:
-            An inverted index.
+            An inverted index with its document table.
+        """
+        indexer = Indexer()
+        self._index(indexer, self._load(ignored_exts))
+        return indexer.corpus()
+
+    def _load(self, ignored_exts: Optional[Set[str]]) -> Iterator[Document]:
+        """Load documents lazily.
         """
         if (isinstance(self._loader, DirectoryLoader)) and (ignored_exts is not None):
             exts = ', '.join(ignored_exts)
             msg = f'Files whose extension is {exts} will be ignored'
             logging.info(msg)
 
-        docs = self._loader.load(ignored_exts=ignored_exts)
+        return self._loader.iter_documents(ignored_exts=ignored_exts)
 
-        # Make inverted index
-        named_indices: List[NamedIndex] = []
-        for doc in docs:
-            tokens = self._tokenizer.tokenize(doc.content)
-            normalized_tokens = [t.normalized for t in tokens]
-            index = Indexer.make_index(normalized_tokens)
-            named_indices.append(NamedIndex(doc.name, index))
-        full_index = Indexer.merge(named_indices)
-        inv_index = Indexer.make_inv_index(full_index)
-        return inv_index
+    def _index(self, indexer: Indexer, docs: Iterable[Document]) -> None:
+        """Tokenize documents, and add them to the indexer.
+        """
+        self._index_shards([indexer], docs, lambda doc: 0)
+
+    def _index_shards(
+            self,
+            indexers: List[Indexer],
+            docs: Iterable[Document],
+            route: Callable[[Document], int]
+        ) -> None:
+        """Tokenize documents, and add each of them to the indexer it is routed to.
+        """
+        if self._workers == 1:
+            for doc in docs:
+                indexers[route(doc)].add_index(doc.name, *self._tokenizer.index(doc.content))
+            return
+
+        # Partial indices are merged in the order of chunks, so that the result
+        # is identical to the serial one. The number of chunks in flight is
+        # bounded not to load the whole corpus ahead of the workers. A chunk
+        # consists of documents of the same indexer.
+        with ProcessPoolExecutor(max_workers=self._workers,
+                                 initializer=_init_worker,
+                                 initargs=(self._tokenizer,)) as executor:
+            pending: Deque[Tuple[Indexer, 'Future[IndexedCorpus]']] = deque()
+            chunks: List[List[Document]] = [[] for _ in indexers]
+
+            def submit(i: int) -> None:
+                if len(pending) >= 2 * self._workers:
+                    indexer, future = pending.popleft()
+                    indexer.update(future.result())
+                pending.append((indexers[i], executor.submit(_index_chunk, chunks[i])))
+                chunks[i] = []
+
+            for doc in docs:
+                i = route(doc)
+                chunks[i].append(doc)
+                if len(chunks[i]) >= _CHUNK_SIZE:
+                    submit(i)
+            for i, chunk in enumerate(chunks):
+                if chunk:
+                    submit(i)
+            while pending:
+                indexer, future = pending.popleft()
+                indexer.update(future.result())
+
+    @contextmanager
+    def _indexer(self, num_indexers: int = 1) -> Iterator[Indexer]:
+        """Returns an indexer which respects its share of the memory budget.
+        """
+        if self._memory_budget is None:
+            yield Indexer()
+            return
+        with SpillingIndexer(self._memory_budget // num_indexers) as indexer:
+            yield indexer
 
-    def save(self, inv_index: InvIndex, result_path: str) -> None:
+    @staticmethod
+    def _entries(indexer: Indexer) -> Iterator[Entry]:
+        """Returns entries of the index built by the indexer.
+        """
+        if isinstance(indexer, SpillingIndexer):
+            msg = f'Merging {indexer.num_runs} runs of the inverted index'
+            logging.info(msg)
+            return indexer.entries()
+        return iter_entries(indexer.corpus().inv_index)
+
+    def save(self, corpus: IndexedCorpus, result_path: str) -> None:
         """save the results of preprocess pipeline.
         """
         if path.exists(result_path):
             raise FileExistsError
-        with open(result_path, mode='wb') as fp:
-            obj = (self._tokenizer.name, self._tokenizer.version, inv_index)
-            pickle.dump(obj, fp)
+        write_index(result_path, self._tokenizer.name, self._tokenizer.version, corpus,
+                    tokenizer_params=self._tokenizer.params)
+
+        msg = f'Successfully saved the inverted index to {result_path}'
+        logging.info(msg)
+
+    def build(self, result_path: str, ignored_exts: Optional[Set[str]] = None) -> None:
+        """Run the preprocessing pipeline and save the result.
+
+        Unless the memory budget is set, this is the same as calling
+        Preprocessor.preprocess() and Preprocessor.save(). Otherwise the inverted
+        index is built in runs, which are merged into the index file at the end,
+        so that memory usage is bounded by the budget instead of corpus size.
+
+        Args:
+            result_path: a path to the index file.
+            ignored_exts: File extensions to be ignored. Defaults to None.
+        """
+        if path.exists(result_path):
+            raise FileExistsError
+        with self._indexer() as indexer:
+            self._index(indexer, self._load(ignored_exts))
+            write_entries(result_path, self._tokenizer.name, self._tokenizer.version,
+                          indexer.doc_table, self._entries(indexer),
+                          tokenizer_params=self._tokenizer.params)
 
         msg = f'Successfully saved the inverted index to {result_path}'
         logging.info(msg)
+
+    def build_shards(
+            self,
+            result_dir: str,
+            num_shards: int,
+            ignored_exts: Optional[Set[str]] = None
+        ) -> None:
+        """Run the preprocessing pipeline, and save the result split into shards.
+
+        Documents are partitioned by the hashes of their names, and each shard
+        is saved as an index file of its own (see `shard` module). The memory
+        budget is shared by the shards.
+
+        Args:
+            result_dir: a path to the directory of the shards.
+            num_shards: the number of shards.
+            ignored_exts: File extensions to be ignored. Defaults to None.
+        """
+        if num_shards < 1:
+            raise ValueError('the number of shards has to be positive')
+        if path.exists(result_dir):
+            raise FileExistsError
+        os.makedirs(result_dir)
+        with ExitStack() as stack:
+            indexers = [stack.enter_context(self._indexer(num_shards)) for _ in range(num_shards)]
+            self._index_shards(indexers, self._load(ignored_exts),
+                               lambda doc: shard_of(doc.name, num_shards))
+            for i, indexer in enumerate(indexers):
+                write_entries(path.join(result_dir, shard_name(i)), self._tokenizer.name,
+                              self._tokenizer.version, indexer.doc_table, self._entries(indexer),
+                              tokenizer_params=self._tokenizer.params)
+        write_shards(result_dir, Shards(self._tokenizer.name, self._tokenizer.version,
+                                        self._tokenizer.params,
+                                        tuple(shard_name(i) for i in range(num_shards))))
+
+        msg = f'Successfully saved the inverted index to {result_dir} in {num_shards} shards'
+        logging.info(msg)
+
+    def update(self, result_path: str, ignored_exts: Optional[Set[str]] = None) -> None:
+        """Update an index file incrementally.
+
+        A manifest of indexed files is saved alongside the index. Only files
+        added or changed since the last run are tokenized, and postings of the
+        deleted files are dropped. If the index or its manifest does not exist
+        yet, the whole index is built. The index file is replaced atomically.
+
+        Args:
+            result_path: a path to the index file.
+            ignored_exts: File extensions to be ignored. Defaults to None.
+        """
+        index_manifest_path = manifest_path(result_path)
+        tmp_path = f'{result_path}.tmp'
+        manifest: Manifest
+        try:
+            if path.exists(result_path) and path.exists(index_manifest_path):
+                old_manifest = Manifest.load(index_manifest_path)
+                manifest = self._update(result_path, tmp_path, old_manifest, ignored_exts)
+            else:
+                msg = f'No manifest of {result_path} is found, the whole index will be built'
+                logging.info(msg)
+                manifest = Manifest()
+                with self._indexer() as indexer:
+                    self._index(indexer, self._read_changed(manifest, Manifest(), set(),
+                                                            ignored_exts))
+                    write_entries(tmp_path, self._tokenizer.name, self._tokenizer.version,
+                                  indexer.doc_table, self._entries(indexer),
+                                  tokenizer_params=self._tokenizer.params)
+            os.replace(tmp_path, result_path)
+        finally:
+            if path.exists(tmp_path):
+                os.remove(tmp_path)
+        manifest.save(index_manifest_path)
+
+        msg = f'Successfully updated the inverted index {result_path}'
+        logging.info(msg)
+
+    def _read_changed(
+            self,
+            manifest: Manifest,
+            old_manifest: Manifest,
+            unchanged: Set[str],
+            ignored_exts: Optional[Set[str]]
+        ) -> Iterator[Document]:
+        """Read files changed since the old manifest, and record every file in the manifest.
+
+        Files whose status is as recorded in the old manifest are not read, and
+        neither are files of the same content yielded. Both are added to
+        `unchanged`. The status of a file is taken before it is read, so that
+        a change while reading it is found by the next run.
+        """
+        num_files = 0
+        invalid_doc_paths: List[str] = []
+        for file_path in self._loader.iter_paths(ignored_exts=ignored_exts):
+            num_files += 1
+            st = os.stat(file_path)
+            if old_manifest.is_unchanged(file_path, st):
+                unchanged.add(file_path)
+                manifest.files[file_path] = old_manifest.files[file_path]
+                continue
+            doc = self._loader.read(file_path)
+            if doc is None:
+                invalid_doc_paths.append(file_path)
+                continue
+            manifest.record(doc, st)
+            if old_manifest.has_same_content(doc):
+                unchanged.add(file_path)
+            else:
+                yield doc
+
+        if not num_files:
+            raise FileNotFoundError('The directory seems to be empty')
+
+        if invalid_doc_paths:
+            listed_paths = '\n'.join(invalid_doc_paths)
+            msg = f'Files in the following paths seem to be binary files:\n{listed_paths}'
+            logging.warning(msg)
+
+    def _update(
+            self,
+            result_path: str,
+            tmp_path: str,
+            old_manifest: Manifest,
+            ignored_exts: Optional[Set[str]]
+        ) -> Manifest:
+        """Write an updated index to the temporary path, and returns its manifest.
+
+        Files are read once; unchanged ones are skipped as they are found, and
+        the others are indexed right away.
+        """
+        manifest = Manifest()
+        unchanged: Set[str] = set()
+
+        with IndexReader(result_path) as reader, self._indexer() as indexer:
+            if reader.tokenizer_name != self._tokenizer.name:
+                msg = f'the index was made by {reader.tokenizer_name}, not {self._tokenizer.name}'
+                raise ValueError(msg)
+            if reader.tokenizer_params != self._tokenizer.params:
+                msg = (f'the index was made with {reader.tokenizer_params}, '
+                       f'not {self._tokenizer.params}')
+                raise ValueError(msg)
+
+            self._index(indexer, self._read_changed(manifest, old_manifest, unchanged,
+                                                    ignored_exts))
+            indexed = {doc.name for doc in indexer.doc_table}
+            num_deleted = len(old_manifest.files.keys() - unchanged - indexed)
+            msg = (f'{len(indexed)} files indexed, {num_deleted} files deleted, '
+                   f'{len(unchanged)} files unchanged')
+            logging.info(msg)
+
+            # Documents kept from the index come first with compacted IDs.
+            doc_table: DocTable = []
+            kept: Dict[DocID, DocID] = {}
+            for doc_id in range(reader.num_docs):
+                doc_info = reader.doc(doc_id)
+                if doc_info.name in unchanged:
+                    kept[doc_id] = len(doc_table)
+                    doc_table.append(doc_info)
+            shifted = {doc_id: len(doc_table) + doc_id for doc_id in range(len(indexer))}
+
+            runs = [
+                remap_entries(reader.entries(), None if len(kept) == reader.num_docs else kept),
+                remap_entries(self._entries(indexer), shifted if doc_table else None),
+            ]
+            write_entries(tmp_path, self._tokenizer.name, self._tokenizer.version,
+                          doc_table + indexer.doc_table, merge_entries(runs),
+                          tokenizer_params=self._tokenizer.params)
+        return manifest
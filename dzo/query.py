@@ -0,0 +1,465 @@
+# -*- coding: utf-8 -*-
+"""Query module
+
+A boolean query consists of words combined with AND, OR, NOT, NEAR/k and
+parentheses;
+
+    query     := or_expr
+    or_expr   := and_expr ('OR' and_expr)*
+    and_expr  := not_expr ('AND'? not_expr)*     # adjacent operands are ANDed
+    not_expr  := 'NOT' not_expr | near_expr
+    near_expr := atom ('NEAR/' k atom)?          # both atoms have to be words
+    atom      := '(' or_expr ')' | word | '"' any characters '"'
+
+A word (or a quoted string) matches documents which contain its tokens at
+consecutive positions, which is exact substring matching for an n-gram index.
+`a NEAR/k b` matches documents where at most k positions are between
+occurrences of a and b in either order, where an occurrence spans as many
+positions as its tokens. Note that a position of an n-gram index is a character,
+so words k characters apart are k - n + 1 positions apart.
+
+Queries are evaluated over sorted document IDs; the operands of AND are
+processed from the rarest one, and the other postings lists are intersected by
+galloping search, so that an AND query costs about as much as its shortest
+postings list. Positions are only decoded for the remaining candidates.
+
+Overlapping n-grams of a long word are redundant; for an n-gram index, only a
+subset of n-grams which covers every character of the word is looked up, chosen
+by the least total document frequency (see `cover_ngrams`).
+"""
+import bisect
+import heapq
+import re
+from array import array
+from itertools import groupby
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+try:
+    from typing import Protocol
+except ImportError:  # Python 3.7
+    from typing_extensions import Protocol  # type: ignore
+
+from .annot import Tokenizer
+from .codec import PostingList
+from .indexer import DocID
+from .tokenizer.ngram import NGramTokenizer
+
+
+DocIDs = Sequence[DocID]       # sorted document IDs without duplicates
+Matches = Dict[DocID, DocIDs]  # {<DocumentID>: [<StartPosition>, ...]}
+
+_LEXEME = re.compile(r'\s*(?:(?P<paren>[()])|"(?P<quoted>[^"]*)"|(?P<word>[^\s()"]+)'
+                     r'|(?P<error>\S))')
+_NEAR = re.compile(r'NEAR/(\d+)')
+
+
+class QuerySyntaxError(ValueError):
+    """Raised when a query cannot be parsed.
+    """
+
+
+class Term(NamedTuple):
+    """A word, or a quoted string.
+    """
+    text: str
+
+
+class Near(NamedTuple):
+    """Occurrences of two words within a distance in tokens.
+    """
+    left: Term
+    right: Term
+    distance: int
+
+
+class And(NamedTuple):  # pylint: disable=missing-docstring
+    operands: Tuple['Node', ...]
+
+
+class Or(NamedTuple):  # pylint: disable=missing-docstring
+    operands: Tuple['Node', ...]
+
+
+class Not(NamedTuple):  # pylint: disable=missing-docstring
+    operand: 'Node'
+
+
+Node = Union[Term, Near, And, Or, Not]
+
+
+class QueryIndex(Protocol):
+    """An index which boolean queries are evaluated over.
+    """
+    # pylint: disable=missing-docstring
+
+    @property
+    def num_docs(self) -> int:
+        ...
+
+    def doc_ids(self) -> Iterator[DocID]:
+        ...
+
+    def df(self, term: str) -> int:
+        ...
+
+    def get(self, term: str) -> Optional[PostingList]:
+        ...
+
+
+def _lex(query: str) -> List[Tuple[str, str]]:
+    """Split a query into pairs of a kind and a lexeme.
+    """
+    lexemes: List[Tuple[str, str]] = []
+    for m in _LEXEME.finditer(query.rstrip()):
+        kind = m.lastgroup
+        assert kind is not None
+        if kind == 'error':
+            raise QuerySyntaxError(f'unclosed quotation at {m.start(kind)}')
+        value = m.group(kind)
+        if kind == 'paren' or (kind == 'word' and value in ('AND', 'OR', 'NOT')):
+            kind = value
+        elif kind == 'word' and _NEAR.fullmatch(value):
+            kind = 'NEAR'
+        lexemes.append((kind, value))
+    return lexemes
+
+
+class _Parser:
+    """A recursive descent parser of boolean queries.
+    """
+
+    def __init__(self, query: str) -> None:
+        self._lexemes = _lex(query)
+        self._pos = 0
+
+    def _peek(self) -> Optional[str]:
+        return self._lexemes[self._pos][0] if self._pos < len(self._lexemes) else None
+
+    def _next(self) -> Tuple[str, str]:
+        if self._pos >= len(self._lexemes):
+            raise QuerySyntaxError('unexpected end of query')
+        lexeme = self._lexemes[self._pos]
+        self._pos += 1
+        return lexeme
+
+    def parse(self) -> Node:  # pylint: disable=missing-docstring
+        node = self._or()
+        if self._pos < len(self._lexemes):
+            raise QuerySyntaxError(f'unexpected {self._lexemes[self._pos][1]!r}')
+        return node
+
+    def _or(self) -> Node:
+        operands = [self._and()]
+        while self._peek() == 'OR':
+            self._next()
+            operands.append(self._and())
+        return operands[0] if len(operands) == 1 else Or(tuple(operands))
+
+    def _and(self) -> Node:
+        operands = [self._not()]
+        while self._peek() not in (None, 'OR', ')'):
+            if self._peek() == 'AND':
+                self._next()
+            operands.append(self._not())
+        return operands[0] if len(operands) == 1 else And(tuple(operands))
+
+    def _not(self) -> Node:
+        if self._peek() == 'NOT':
+            self._next()
+            return Not(self._not())
+        return self._near()
+
+    def _near(self) -> Node:
+        left = self._atom()
+        if self._peek() != 'NEAR':
+            return left
+        m = _NEAR.fullmatch(self._next()[1])
+        assert m is not None
+        right = self._atom()
+        if not isinstance(left, Term) or not isinstance(right, Term):
+            raise QuerySyntaxError('operands of NEAR have to be words')
+        return Near(left, right, int(m.group(1)))
+
+    def _atom(self) -> Node:
+        kind, value = self._next()
+        if kind == '(':
+            node = self._or()
+            if self._next()[0] != ')':
+                raise QuerySyntaxError('unclosed parenthesis')
+            return node
+        if kind in ('word', 'quoted'):
+            return Term(value)
+        raise QuerySyntaxError(f'unexpected {value!r}')
+
+
+def parse(query: str) -> Node:
+    """Parse a boolean query.
+
+    Example:
+        >>> parse('猫 AND (犬 OR NOT 鳥)')
+        And(operands=(Term(text='猫'), Or(operands=(Term(text='犬'), Not(operand=Term(text='鳥'))))))
+
+    Args:
+        query: a query string.
+
+    Returns:
+        the root node of the query.
+    """
+    return _Parser(query).parse()
+
+
+def gallop(doc_ids: DocIDs, target: DocID, lo: int = 0) -> int:
+    """Find the leftmost position of a target at or after `lo` by galloping search.
+
+    The step is doubled until it passes over the target, and the last step is
+    searched by bisection, so that the cost is logarithmic in the distance.
+
+    Args:
+        doc_ids: sorted document IDs.
+        target: a document ID to be found.
+        lo: where to start searching.
+
+    Returns:
+        the position where the target is, or would be inserted.
+    """
+    step = 1
+    hi = lo
+    while hi < len(doc_ids) and doc_ids[hi] < target:
+        lo = hi + 1
+        hi += step
+        step *= 2
+    return bisect.bisect_left(doc_ids, target, lo, min(hi, len(doc_ids)))
+
+
+def intersect(shorter: DocIDs, longer: DocIDs) -> 'array[int]':
+    """Intersect two sorted lists of document IDs by galloping through the longer one.
+    """
+    result: 'array[int]' = array('I')
+    pos = 0
+    for doc_id in shorter:
+        pos = gallop(longer, doc_id, pos)
+        if pos == len(longer):
+            break
+        if longer[pos] == doc_id:
+            result.append(doc_id)
+    return result
+
+
+def difference(doc_ids: DocIDs, excluded: DocIDs) -> 'array[int]':
+    """Returns sorted document IDs which are not excluded.
+    """
+    result: 'array[int]' = array('I')
+    pos = 0
+    for doc_id in doc_ids:
+        pos = gallop(excluded, doc_id, pos)
+        if pos == len(excluded) or excluded[pos] != doc_id:
+            result.append(doc_id)
+    return result
+
+
+def union(lists: Sequence[DocIDs]) -> 'array[int]':
+    """Merge sorted lists of document IDs without duplicates.
+    """
+    return array('I', (doc_id for doc_id, _ in groupby(heapq.merge(*lists))))
+
+
+def cover_ngrams(dfs: Sequence[int], n: int) -> List[int]:
+    """Select n-grams which cover a string at the least cost.
+
+    The i-th n-gram of a string covers characters from i to i+n-1, and
+    occurrences of the selected n-grams at the same offsets from a position
+    imply an occurrence of the whole string. The cost of an n-gram is its
+    document frequency plus one, so that fewer postings lists are preferred
+    among rare ones. The first and the last n-grams are always selected.
+
+    Example:
+        >>> cover_ngrams([9, 9, 9, 9, 9, 9, 9], n=3)
+        [0, 3, 6]
+        >>> cover_ngrams([9, 1, 9, 9, 1, 9, 9], n=3)
+        [0, 1, 4, 6]
+
+    Args:
+        dfs: document frequencies of all of the n-grams of a string in order.
+        n: the length of the n-grams.
+
+    Returns:
+        offsets of the selected n-grams in increasing order.
+    """
+    if not dfs:
+        return []
+    # costs[i] is the least cost to cover characters up to i+n-1 ending with the i-th n-gram
+    costs: List[int] = [dfs[0] + 1]
+    prevs: List[int] = [-1]
+    for i in range(1, len(dfs)):
+        prev = min(range(max(i - n, 0), i), key=costs.__getitem__)
+        costs.append(costs[prev] + dfs[i] + 1)
+        prevs.append(prev)
+    offsets: List[int] = []
+    i = len(dfs) - 1
+    while i >= 0:
+        offsets.append(i)
+        i = prevs[i]
+    return offsets[::-1]
+
+
+class Evaluator:
+    """Evaluate boolean queries over an index.
+
+    Example:
+        >>> evaluator = Evaluator(reader, NGramTokenizer(n=2))
+        >>> list(evaluator.evaluate(parse('すもも AND NOT くり')))
+        [0]
+    """
+
+    def __init__(self, index: QueryIndex, tokenizer: Tokenizer) -> None:
+        self._index = index
+        self._tokenizer = tokenizer
+
+    def _tokens(self, text: str) -> List[str]:
+        """Returns the tokens of a word in order.
+        """
+        return [t.normalized for t in self._tokenizer.tokenize(text)]
+
+    def estimate(self, node: Node) -> int:
+        """Estimate the number of documents which match the node.
+        """
+        if isinstance(node, Term):
+            return min((self._index.df(t) for t in self._tokens(node.text)), default=0)
+        if isinstance(node, Near):
+            return min(self.estimate(node.left), self.estimate(node.right))
+        if isinstance(node, And):
+            return min(self.estimate(n) for n in node.operands)
+        if isinstance(node, Or):
+            return min(sum(self.estimate(n) for n in node.operands), self._index.num_docs)
+        return max(self._index.num_docs - self.estimate(node.operand), 0)
+
+    def plan(self, text: str) -> List[Tuple[int, str]]:
+        """Returns tokens of a word to be looked up with their offsets.
+
+        All of the tokens are needed in general, but for an n-gram index, only
+        the n-grams selected by `cover_ngrams` are.
+        """
+        tokens = self._tokens(text)
+        if not isinstance(self._tokenizer, NGramTokenizer) or len(tokens) <= 2:
+            return list(enumerate(tokens))
+        dfs = [self._index.df(t) for t in tokens]
+        if 0 in dfs:  # no documents can match
+            return [(dfs.index(0), tokens[dfs.index(0)])]
+        offsets = cover_ngrams(dfs, self._tokenizer.n)
+        return [(offset, tokens[offset]) for offset in offsets]
+
+    def matches(self, text: str, candidates: Optional[DocIDs] = None) -> Matches:
+        """Find occurrences of the tokens of a word at consecutive positions.
+
+        Documents which contain all of the planned tokens are found first, from
+        the rarest token, and then the positions of each token are shifted by
+        its offset in the word and intersected. For an n-gram index, this is
+        exact substring matching.
+
+        Args:
+            text: a word, or a quoted string.
+            candidates: sorted document IDs to which the matches are limited.
+
+        Returns:
+            start positions of the occurrences by document.
+        """
+        planned = self.plan(text)
+        plists: Dict[str, PostingList] = {}
+        for term in {term for _, term in planned}:
+            plist = self._index.get(term)
+            if plist is None:
+                return {}
+            plists[term] = plist
+        if not plists:
+            return {}
+        rarest = sorted(plists, key=lambda t: len(plists[t]))
+        doc_ids: DocIDs = plists[rarest[0]].doc_ids
+        if candidates is not None:
+            doc_ids = intersect(candidates, doc_ids)
+        for term in rarest[1:]:
+            if not doc_ids:
+                return {}
+            doc_ids = intersect(doc_ids, plists[term].doc_ids)
+
+        offsets = sorted(planned, key=lambda x: len(plists[x[1]]))
+        cursors = dict.fromkeys(plists, 0)
+        matches: Matches = {}
+        for doc_id in doc_ids:
+            starts: Optional[DocIDs] = None
+            for offset, term in offsets:
+                plist = plists[term]
+                cursors[term] = i = gallop(plist.doc_ids, doc_id, cursors[term])
+                shifted = [p - offset for p in plist.positions(i) if p >= offset]
+                starts = shifted if starts is None else intersect(starts, shifted)
+                if not starts:
+                    break
+            if starts:
+                matches[doc_id] = starts
+        return matches
+
+    def _near(self, node: 'Near', candidates: Optional[DocIDs]) -> 'array[int]':
+        """Returns documents where both operands occur within the distance.
+        """
+        left = self.matches(node.left.text, candidates)
+        if not left:
+            return array('I')
+        right = self.matches(node.right.text, sorted(left))
+        left_length = len(self._tokens(node.left.text))
+        right_length = len(self._tokens(node.right.text))
+        result: 'array[int]' = array('I')
+        for doc_id in sorted(right):
+            rights = right[doc_id]
+            for start in left[doc_id]:
+                # the first right occurrence which does not end too early
+                i = gallop(rights, start - right_length - node.distance)
+                if i < len(rights) and rights[i] <= start + left_length + node.distance:
+                    result.append(doc_id)
+                    break
+        return result
+
+    def _restrict(self, node: Node, candidates: DocIDs) -> 'array[int]':
+        """Evaluate a node only for the candidate documents.
+        """
+        if isinstance(node, Term):
+            return array('I', sorted(self.matches(node.text, candidates)))
+        if isinstance(node, Near):
+            return self._near(node, candidates)
+        return intersect(candidates, self.evaluate(node))
+
+    def _conjunction(self, operands: Sequence[Node]) -> 'array[int]':
+        """Evaluate AND of the operands from the rarest one.
+
+        Negated operands are subtracted from the result of the others, and the
+        evaluation stops as soon as the result gets empty.
+        """
+        positives: List[Node] = [n for n in operands if not isinstance(n, Not)]
+        negatives = [n.operand for n in operands if isinstance(n, Not)]
+        if positives:
+            positives.sort(key=self.estimate)
+            result = self.evaluate(positives[0])
+            for node in positives[1:]:
+                if not result:
+                    return result
+                result = self._restrict(node, result)
+        else:
+            result = array('I', self._index.doc_ids())
+        for node in negatives:
+            if not result:
+                break
+            result = difference(result, self.evaluate(node))
+        return result
+
+    def evaluate(self, node: Node) -> 'array[int]':
+        """Returns sorted document IDs which match the node.
+        """
+        if isinstance(node, Term):
+            tokens = self._tokens(node.text)
+            if len(tokens) == 1:
+                plist = self._index.get(tokens[0])
+                return plist.doc_ids if plist is not None else array('I')
+            return array('I', sorted(self.matches(node.text)))
+        if isinstance(node, Near):
+            return self._near(node, None)
+        if isinstance(node, (And, Not)):
+            return self._conjunction(node.operands if isinstance(node, And) else (node,))
+        return union([self.evaluate(n) for n in node.operands])
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""Ranking module
+
+Documents are scored by Okapi BM25;
+
+    score(D, Q) = sum of idf(t) * tf(t, D) * (k1 + 1) / (tf(t, D) + k1 * (1 - b + b * |D| / avgdl))
+    idf(t) = log(1 + (N - df(t) + 0.5) / (df(t) + 0.5))
+
+The statistics (document lengths, document frequencies and the total length) are
+stored in the index file at index time, so that only the postings of the query
+terms are read at query time.
+
+The score of a term is increasing in its term frequency and decreasing in the
+document length, so the maximum term frequency and the minimum document length
+of a term, which are also stored at index time, bound the score of the term in
+any document. Top k queries use the bounds to skip documents (MaxScore).
+
+An index split into shards is ranked with statistics of the whole collection
+(see `CorpusStats`), so that scores of documents in different shards are
+comparable, and the merged top k are the same as those of a single index.
+"""
+import heapq
+import math
+from collections import Counter
+from itertools import accumulate
+from typing import Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    from typing import Protocol
+except ImportError:  # Python 3.7
+    from typing_extensions import Protocol  # type: ignore
+
+from .codec import PostingList
+from .indexer import DocID
+from .query import gallop
+from .storage import TermStats, merge_term_stats
+
+
+class ScoredDoc(NamedTuple):
+    """A search result with its relevance score.
+    """
+    name: str
+    score: float
+
+
+class RankedIndex(Protocol):
+    """An index which provides statistics for ranking.
+    """
+    # pylint: disable=missing-docstring
+
+    @property
+    def num_docs(self) -> int:
+        ...
+
+    @property
+    def total_length(self) -> int:
+        ...
+
+    def doc_length(self, doc_id: DocID) -> int:
+        ...
+
+    def term_stats(self, term: str) -> Optional[TermStats]:
+        ...
+
+    def get(self, term: str) -> Optional[PostingList]:
+        ...
+
+
+class CorpusStats(NamedTuple):
+    """Statistics of a collection of documents for ranking the query terms.
+    """
+    num_docs: int
+    total_length: int
+    terms: Mapping[str, Optional[TermStats]]  # statistics of each query term
+
+
+def corpus_stats(index: RankedIndex, terms: Iterable[str]) -> CorpusStats:
+    """Collect statistics of the query terms from an index.
+    """
+    return CorpusStats(index.num_docs, index.total_length,
+                       {term: index.term_stats(term) for term in set(terms)})
+
+
+def merge_corpus_stats(stats: Sequence[CorpusStats]) -> CorpusStats:
+    """Combine statistics of disjoint collections, such as shards of an index.
+
+    Args:
+        stats: statistics of each collection.
+
+    Returns:
+        statistics of all of the collections.
+    """
+    terms = {term for s in stats for term in s.terms}
+    return CorpusStats(sum(s.num_docs for s in stats), sum(s.total_length for s in stats),
+                       {term: merge_term_stats(s.terms.get(term) for s in stats)
+                        for term in terms})
+
+
+class BM25:
+    """Okapi BM25 scoring function.
+
+    Example:
+        >>> bm25 = BM25(k1=1.2, b=0.75)
+        >>> round(bm25.score(tf=2, doc_length=10, avg_doc_length=10.0, idf=1.0), 3)
+        1.375
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        """Initialize the scoring function.
+
+        Args:
+            k1: saturation of term frequencies.
+            b: strength of document length normalization.
+        """
+        if k1 < 0 or not 0 <= b <= 1:
+            raise ValueError('k1 has to be non-negative, and b has to be in [0, 1]')
+        self.k1 = k1
+        self.b = b
+
+    @staticmethod
+    def idf(num_docs: int, df: int) -> float:
+        """Returns the inverse document frequency, which is always positive.
+        """
+        return math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+
+    def score(self, tf: int, doc_length: int, avg_doc_length: float, idf: float) -> float:
+        """Returns the contribution of a term to the score of a document.
+        """
+        norm = self.k1 * (1 - self.b + self.b * doc_length / avg_doc_length)
+        return idf * tf * (self.k1 + 1) / (tf + norm)
+
+
+def top_k(scores: Mapping[DocID, float], k: int) -> List[Tuple[DocID, float]]:
+    """Select the k highest scores with a heap bounded by k.
+
+    Ties are broken by document ID, so that results are deterministic.
+
+    Args:
+        scores: scores of documents.
+        k: the number of results.
+
+    Returns:
+        pairs of a document ID and its score in descending order of the score.
+    """
+    return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+
+
+class _Cursor:
+    """A cursor over the postings list of a query term.
+    """
+
+    __slots__ = ('plist', 'pos', 'idf', 'bound')
+
+    def __init__(self, plist: PostingList, idf: float, bound: float) -> None:
+        self.plist = plist
+        self.pos = 0
+        self.idf = idf      # weighted by the query term frequency
+        self.bound = bound  # maximum score of the term in any document
+
+    def tf(self) -> int:
+        """Returns the term frequency in the current document.
+        """
+        return self.plist.tfs[self.pos]
+
+    def doc_id(self) -> Optional[DocID]:
+        """Returns the current document ID, or None if exhausted.
+        """
+        return self.plist.doc_ids[self.pos] if self.pos < len(self.plist) else None
+
+    def seek(self, doc_id: DocID) -> bool:
+        """Move to the first document at or after the given one, and returns
+        whether the document is the given one.
+        """
+        self.pos = gallop(self.plist.doc_ids, doc_id, self.pos)
+        return self.pos < len(self.plist) and self.plist.doc_ids[self.pos] == doc_id
+
+
+def _maxscore(
+        cursors: List[_Cursor],
+        k: int,
+        score: Callable[[int, DocID, float], float]
+    ) -> List[Tuple[DocID, float]]:
+    """Select the top k documents by MaxScore dynamic pruning.
+
+    Cursors are sorted by their score bounds. Once the heap of the top k is full,
+    the longest prefix of cursors whose bounds sum below the k-th score cannot
+    make a document enter the top k by themselves (non-essential). Candidates are
+    drawn only from the other cursors (essential), and non-essential ones are
+    skipped to a candidate only while it can still reach the k-th score.
+    """
+    cursors.sort(key=lambda c: c.bound)
+    prefix = list(accumulate(c.bound for c in cursors))  # bounds of the first i+1 cursors
+    heap: List[Tuple[float, int]] = []  # (<Score>, -<DocumentID>) of the top k
+    threshold = 0.0
+    num_non_essential = 0
+    while True:
+        doc_ids = [c.doc_id() for c in cursors[num_non_essential:]]
+        doc_id = min((d for d in doc_ids if d is not None), default=None)
+        if doc_id is None:
+            break
+        total = 0.0
+        for cursor in cursors[num_non_essential:]:
+            if cursor.doc_id() == doc_id:
+                total += score(cursor.tf(), doc_id, cursor.idf)
+                cursor.pos += 1
+        for i in range(num_non_essential - 1, -1, -1):
+            if total + prefix[i] < threshold:
+                break
+            if cursors[i].seek(doc_id):
+                total += score(cursors[i].tf(), doc_id, cursors[i].idf)
+
+        if len(heap) < k:
+            heapq.heappush(heap, (total, -doc_id))
+        elif (total, -doc_id) > heap[0]:
+            heapq.heapreplace(heap, (total, -doc_id))
+        if len(heap) == k:
+            threshold = heap[0][0]
+            while num_non_essential < len(cursors) and prefix[num_non_essential] < threshold:
+                num_non_essential += 1
+    return [(-neg_doc_id, total) for total, neg_doc_id in sorted(heap, reverse=True)]
+
+
+def rank_bm25(
+        index: RankedIndex,
+        terms: Iterable[str],
+        k: int,
+        bm25: Optional[BM25] = None,
+        prune: bool = True,
+        stats: Optional[CorpusStats] = None
+    ) -> List[Tuple[DocID, float]]:
+    """Score documents which contain any of the terms, and select the top k.
+
+    A term repeated in the query counts as many times as it appears. By
+    default, documents which cannot reach the top k are skipped without being
+    scored, using the score bounds of the terms stored in the index (MaxScore).
+    The results are the same as scoring all of the documents term at a time.
+
+    Args:
+        index: an index with statistics.
+        terms: normalized query tokens.
+        k: the number of results.
+        bm25: a scoring function; BM25() if None.
+        prune: whether to skip documents which cannot reach the top k.
+        stats: statistics of the whole collection, when the index is a part of
+            it; those of the index if None.
+
+    Returns:
+        pairs of a document ID and its score in descending order of the score.
+    """
+    counts = Counter(terms)
+    if stats is None:
+        stats = corpus_stats(index, counts)
+    if k <= 0 or not index.num_docs or not stats.num_docs:
+        return []
+    bm25 = BM25() if bm25 is None else bm25
+    avg_doc_length = stats.total_length / stats.num_docs or 1.0
+    cursors: List[_Cursor] = []
+    for term, qtf in counts.items():
+        plist = index.get(term)
+        term_stats = stats.terms.get(term)
+        if plist is None or term_stats is None:
+            continue
+        idf = qtf * bm25.idf(stats.num_docs, term_stats.df)
+        bound = bm25.score(term_stats.max_tf, term_stats.min_length, avg_doc_length, idf)
+        cursors.append(_Cursor(plist, idf, bound))
+
+    def score(tf: int, doc_id: DocID, idf: float) -> float:
+        return bm25.score(tf, index.doc_length(doc_id), avg_doc_length, idf)
+
+    if prune:
+        return _maxscore(cursors, k, score)
+    scores: Dict[DocID, float] = {}
+    for cursor in cursors:
+        for doc_id, tf in zip(cursor.plist.doc_ids, cursor.plist.tfs):
+            scores[doc_id] = scores.get(doc_id, 0.0) + score(tf, doc_id, cursor.idf)
+    return top_k(scores, k)
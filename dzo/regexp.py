@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=no-member
+"""Regexp module
+
+A regular expression is compiled into a boolean query over literal strings
+which every matching document satisfies, as code search engines do with
+trigram indices. The query prefilters candidate documents through an n-gram
+index (see `query` module), and only the candidates are matched against the
+regular expression itself.
+
+Each node of the parsed regular expression is summarized by;
+
+    exact  the set of all strings the node matches, if there are a few of them
+    match  a query which a document containing a match of the node satisfies
+
+Literal strings shorter than n cannot be looked up, so they match all documents.
+"""
+import re
+from typing import FrozenSet, List, NamedTuple, Optional, Sequence
+
+from .query import And, Node, Or, Term
+
+try:
+    from re import _parser as sre_parse  # type: ignore  # Python 3.11+
+except ImportError:
+    import sre_parse  # type: ignore  # pylint: disable=deprecated-module
+
+
+_MAX_EXACT: int = 64  # the largest number of exact strings of a node
+
+_Exact = Optional[FrozenSet[str]]
+_EMPTY: FrozenSet[str] = frozenset([''])
+
+
+class _Info(NamedTuple):
+    """Summary of a node of a regular expression; None means unknown.
+    """
+    exact: _Exact
+    match: Optional[Node]
+
+
+_ANY = _Info(None, None)
+
+
+def _and(a: Optional[Node], b: Optional[Node]) -> Optional[Node]:
+    """AND of two queries, where None matches all.
+    """
+    if a is None:
+        return b
+    if b is None:
+        return a
+    operands = (a.operands if isinstance(a, And) else (a,)) + \
+               (b.operands if isinstance(b, And) else (b,))
+    return And(tuple(dict.fromkeys(operands)))
+
+
+def _or(nodes: Sequence[Optional[Node]]) -> Optional[Node]:
+    """OR of queries, where None matches all.
+    """
+    operands: List[Node] = []
+    for node in nodes:
+        if node is None:
+            return None
+        operands.extend(node.operands if isinstance(node, Or) else (node,))
+    unique = tuple(dict.fromkeys(operands))
+    return unique[0] if len(unique) == 1 else Or(unique)
+
+
+def _strings(exact: FrozenSet[str], n: int) -> Optional[Node]:
+    """Returns a query which matches any of the strings.
+    """
+    if any(len(s) < n for s in exact):
+        return None
+    return _or([Term(s) for s in sorted(exact)])
+
+
+def _to_match(info: _Info, n: int) -> Optional[Node]:
+    """Returns the query of a node.
+    """
+    return info.match if info.exact is None else _strings(info.exact, n)
+
+
+def _product(a: FrozenSet[str], b: FrozenSet[str]) -> _Exact:
+    """Concatenate every pair of strings, unless there are too many of them.
+    """
+    if len(a) * len(b) > _MAX_EXACT:
+        return None
+    return frozenset(x + y for x in a for y in b)
+
+
+def _concat(infos: Sequence[_Info], n: int) -> _Info:
+    """Summarize a concatenation.
+
+    Exact strings of consecutive nodes are joined as long as they are few, and
+    flushed into the query otherwise.
+    """
+    match: Optional[Node] = None
+    run: FrozenSet[str] = _EMPTY
+    exact = True
+    for info in infos:
+        joined = _product(run, info.exact) if info.exact is not None else None
+        if joined is not None:
+            run = joined
+            continue
+        exact = False
+        match = _and(match, _strings(run, n))
+        if info.exact is not None:
+            run = info.exact
+        else:
+            match = _and(match, info.match)
+            run = _EMPTY
+    if exact:
+        return _Info(run, None)
+    return _Info(None, _and(match, _strings(run, n)))
+
+
+def _chars(items: Sequence[tuple]) -> _Exact:
+    """Expand a character class, if it is small.
+    """
+    chars: List[str] = []
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            chars.append(chr(av))
+        elif op is sre_parse.RANGE and av[1] - av[0] < _MAX_EXACT:
+            chars.extend(chr(c) for c in range(av[0], av[1] + 1))
+        else:
+            return None
+        if len(chars) > _MAX_EXACT:
+            return None
+    return frozenset(chars)
+
+
+def _analyze(pattern: Sequence[tuple], n: int) -> _Info:
+    """Summarize a sequence of parsed nodes.
+    """
+    infos: List[_Info] = []
+    for op, av in pattern:
+        if op is sre_parse.LITERAL:
+            infos.append(_Info(frozenset([chr(av)]), None))
+        elif op is sre_parse.IN:
+            infos.append(_Info(_chars(av), None))
+        elif op is sre_parse.SUBPATTERN:
+            add_flags = av[1]
+            infos.append(_ANY if add_flags & re.IGNORECASE else _analyze(av[-1], n))
+        elif op is sre_parse.BRANCH:
+            branches = [_analyze(p, n) for p in av[1]]
+            if all(b.exact is not None for b in branches):
+                union = frozenset().union(*(b.exact for b in branches if b.exact is not None))
+                if len(union) <= _MAX_EXACT:
+                    infos.append(_Info(union, None))
+                    continue
+            infos.append(_Info(None, _or([_to_match(b, n) for b in branches])))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT,
+                    getattr(sre_parse, 'POSSESSIVE_REPEAT', None)):
+            infos.append(_repeat(av[0], av[1], _analyze(av[2], n), n))
+        elif op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            infos.append(_Info(_EMPTY, None))  # zero-width
+        else:
+            infos.append(_ANY)
+    return _concat(infos, n)
+
+
+def _repeat(min_count: int, max_count: int, info: _Info, n: int) -> _Info:
+    """Summarize a repetition.
+    """
+    if min_count == 0:
+        return _ANY
+    if min_count == max_count and info.exact is not None:
+        exact: _Exact = _EMPTY
+        for _ in range(min_count):
+            exact = _product(exact, info.exact) if exact is not None else None
+        if exact is not None:
+            return _Info(exact, None)
+    return _Info(None, _to_match(info, n))
+
+
+def compile_regexp(pattern: str, n: int) -> Optional[Node]:
+    """Compile a regular expression into a boolean query over n-gram strings.
+
+    Example:
+        >>> compile_regexp('(abc|de)fg', n=3)
+        Or(operands=(Term(text='abcfg'), Term(text='defg')))
+        >>> compile_regexp('すもも.*うち', n=2)
+        And(operands=(Term(text='すもも'), Term(text='うち')))
+
+    Args:
+        pattern: a regular expression.
+        n: the length of the n-grams of the index.
+
+    Returns:
+        a query which every document containing a match satisfies, or None if
+        all of the documents have to be matched.
+    """
+    if re.compile(pattern).flags & re.IGNORECASE:
+        return None
+    info = _analyze(sre_parse.parse(pattern), n)
+    return _to_match(info, n)
@@ -0,0 +1,604 @@
+# -*- coding: utf-8 -*-
+"""Segment module
+
+A segmented index is a directory of small index files (segments) listed in a
+segments file. New documents are written to new segments, and deleted documents
+are recorded as tombstones in the segments file instead of rewriting segments.
+A merge policy compacts consecutive segments into larger ones, dropping the
+deleted documents. The layout of the directory is as follows;
+
+    segments.json   generation, tokenizer, segments and their tombstones
+    <NNNNNNNN>.dzo  segments (see `storage` module)
+
+The segments file is replaced atomically on every change with an incremented
+generation, so that readers in other threads or processes can detect changes.
+Document IDs of a segmented index are the local ones shifted by the number of
+documents in the preceding segments.
+"""
+import bisect
+import heapq
+import json
+import logging
+import os
+import threading
+from itertools import groupby
+from os import path
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .annot import Document, Tokenizer
+from .codec import PostingList, PostingsPart
+from .indexer import DocID, DocInfo, DocTable, Indexer
+from .spill import merge_entries, remap_entries
+from .storage import Entry, IndexReader, TermStats, merge_term_stats, write_entries, write_index
+
+
+SEGMENTS_FILE: str = 'segments.json'
+
+_MAX_RETRIES: int = 3
+
+
+class SegmentInfo(NamedTuple):
+    """An entry of the segments file.
+    """
+    name: str                  # file name of the segment
+    num_docs: int
+    deleted: FrozenSet[DocID]  # local document IDs of deleted documents
+
+    @property
+    def num_live_docs(self) -> int:  # pylint: disable=missing-docstring
+        return self.num_docs - len(self.deleted)
+
+
+class Segments(NamedTuple):
+    """Contents of the segments file.
+    """
+    generation: int
+    tokenizer_name: str
+    tokenizer_version: str
+    tokenizer_params: Dict[str, Any]
+    next_id: int  # sequence number of the next segment
+    segments: Tuple[SegmentInfo, ...]
+
+
+def read_segments(index_dir: str) -> Segments:
+    """Read the segments file of a segmented index.
+
+    Args:
+        index_dir: a path to the index directory.
+
+    Returns:
+        contents of the segments file.
+    """
+    p = path.join(index_dir, SEGMENTS_FILE)
+    if not path.isfile(p):
+        raise FileNotFoundError(f'not found: {p}')
+    with open(p, mode='r') as fp:
+        obj = json.load(fp)
+    segments = tuple(SegmentInfo(s['name'], s['num_docs'], frozenset(s['deleted']))
+                     for s in obj['segments'])
+    return Segments(obj['generation'], obj['tokenizer_name'], obj['tokenizer_version'],
+                    obj.get('tokenizer_params', {}), obj['next_id'], segments)
+
+
+def write_segments(index_dir: str, segments: Segments) -> None:
+    """Write the segments file of a segmented index atomically.
+
+    Args:
+        index_dir: a path to the index directory.
+        segments: contents of the segments file.
+    """
+    p = path.join(index_dir, SEGMENTS_FILE)
+    obj = segments._asdict()
+    obj['segments'] = [{'name': s.name, 'num_docs': s.num_docs, 'deleted': sorted(s.deleted)}
+                       for s in segments.segments]
+    with open(f'{p}.tmp', mode='w') as fp:
+        json.dump(obj, fp)
+    os.replace(f'{p}.tmp', p)
+
+
+def is_segmented(index_path: str) -> bool:
+    """Whether the path is a segmented index.
+    """
+    return path.isfile(path.join(index_path, SEGMENTS_FILE))
+
+
+class SegmentedIndex:
+    """A writer of a segmented index.
+
+    Only one writer should open an index directory at a time. Methods of a
+    writer are thread-safe, and merges can run in a background thread.
+
+    Example:
+        >>> with SegmentedIndex('/path/to/index_dir', NGramTokenizer(n=3)) as index:
+        ...     index.start_merging()
+        ...     index.add([Document('first', 'すもももももももものうち')])
+        ...     index.delete(['second'])
+    """
+
+    def __init__(self, index_dir: str, tokenizer: Tokenizer, merge_factor: int = 10) -> None:
+        """Open or create a segmented index.
+
+        Args:
+            index_dir: a path to the index directory.
+            tokenizer: a tokenizer.
+            merge_factor: the number of segments merged at once. Segments are
+                merged when there are at least this number of segments.
+        """
+        if merge_factor < 2:
+            raise ValueError('merge factor has to be at least 2')
+        os.makedirs(index_dir, exist_ok=True)
+        self._index_dir = index_dir
+        self._tokenizer = tokenizer
+        self._merge_factor = merge_factor
+
+        if is_segmented(index_dir):
+            self._segments = read_segments(index_dir)
+            if self._segments.tokenizer_name != tokenizer.name:
+                msg = f'the index was made by {self._segments.tokenizer_name}, not {tokenizer.name}'
+                raise ValueError(msg)
+            if self._segments.tokenizer_params != tokenizer.params:
+                msg = (f'the index was made with {self._segments.tokenizer_params}, '
+                       f'not {tokenizer.params}')
+                raise ValueError(msg)
+        else:
+            self._segments = Segments(0, tokenizer.name, tokenizer.version, tokenizer.params, 0, ())
+            write_segments(index_dir, self._segments)
+
+        # locations of live documents by their names
+        self._names: Dict[str, Tuple[str, DocID]] = {}
+        for seg in self._segments.segments:
+            with IndexReader(self._path(seg.name)) as reader:
+                for doc_id in range(reader.num_docs):
+                    if doc_id not in seg.deleted:
+                        self._names[reader.doc(doc_id).name] = (seg.name, doc_id)
+
+        self._lock = threading.RLock()
+        self._merge_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._merger: Optional[threading.Thread] = None
+
+    def _path(self, name: str) -> str:
+        return path.join(self._index_dir, name)
+
+    @property
+    def generation(self) -> int:
+        """Generation of the segments file, incremented on every change.
+        """
+        return self._segments.generation
+
+    @property
+    def segments(self) -> Tuple[SegmentInfo, ...]:
+        """Current segments.
+        """
+        return self._segments.segments
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _reserve(self) -> str:
+        """Reserve a file name for a new segment.
+        """
+        with self._lock:
+            name = f'{self._segments.next_id:08d}.dzo'
+            self._segments = self._segments._replace(next_id=self._segments.next_id + 1)
+            return name
+
+    def _commit(self, segments: Tuple[SegmentInfo, ...]) -> None:
+        """Write the segments file with the given segments and a new generation.
+        """
+        self._segments = self._segments._replace(generation=self._segments.generation + 1,
+                                                 segments=segments)
+        write_segments(self._index_dir, self._segments)
+
+    def _tombstones(self, names: Iterable[str]) -> Dict[str, FrozenSet[DocID]]:
+        """Pop live documents by their names, and returns them by segment.
+        """
+        deleted: Dict[str, List[DocID]] = {}
+        for name in names:
+            location = self._names.pop(name, None)
+            if location is not None:
+                deleted.setdefault(location[0], []).append(location[1])
+        return {seg_name: frozenset(doc_ids) for seg_name, doc_ids in deleted.items()}
+
+    def add(self, docs: Iterable[Document]) -> int:
+        """Add documents as a new segment.
+
+        Live documents with the same names as the added ones are deleted.
+
+        Args:
+            docs: documents to be added.
+
+        Returns:
+            the number of added documents.
+        """
+        indexer = Indexer()
+        doc_ids: Dict[str, DocID] = {}
+        for doc in docs:
+            doc_ids[doc.name] = indexer.add_index(doc.name, *self._tokenizer.index(doc.content))
+        if len(indexer) == 0:
+            return 0
+        # a document added twice in the same batch is replaced by the last one
+        replaced = frozenset(set(range(len(indexer))) - set(doc_ids.values()))
+
+        name = self._reserve()
+        write_index(f'{self._path(name)}.tmp', self._tokenizer.name, self._tokenizer.version,
+                    indexer.corpus(), tokenizer_params=self._tokenizer.params)
+        os.replace(f'{self._path(name)}.tmp', self._path(name))
+
+        with self._lock:
+            tombstones = self._tombstones(doc_ids.keys())
+            segments = tuple(s._replace(deleted=s.deleted | tombstones.get(s.name, frozenset()))
+                             for s in self._segments.segments)
+            self._commit(segments + (SegmentInfo(name, len(indexer), replaced),))
+            self._names.update({doc_name: (name, doc_id) for doc_name, doc_id in doc_ids.items()})
+
+        self._wakeup.set()
+        return len(doc_ids)
+
+    def delete(self, names: Iterable[str]) -> int:
+        """Delete documents by their names.
+
+        Args:
+            names: names of documents to be deleted.
+
+        Returns:
+            the number of deleted documents.
+        """
+        with self._lock:
+            tombstones = self._tombstones(names)
+            if not tombstones:
+                return 0
+            segments = tuple(s._replace(deleted=s.deleted | tombstones.get(s.name, frozenset()))
+                             for s in self._segments.segments)
+            self._commit(segments)
+        self._wakeup.set()
+        return sum(len(doc_ids) for doc_ids in tombstones.values())
+
+    def _select(self, segments: Tuple[SegmentInfo, ...], force: bool) -> Optional[slice]:
+        """Select consecutive segments to be merged.
+
+        Unless forced, the window of `merge_factor` consecutive segments with the
+        fewest live documents is selected when there are enough segments.
+        """
+        if force:
+            if len(segments) > 1 or (segments and segments[0].deleted):
+                return slice(0, len(segments))
+            return None
+        if len(segments) < self._merge_factor:
+            return None
+        sizes = [s.num_live_docs for s in segments]
+        starts = range(len(segments) - self._merge_factor + 1)
+        start = min(starts, key=lambda i: sum(sizes[i:i+self._merge_factor]))
+        return slice(start, start + self._merge_factor)
+
+    def merge(self, force: bool = False) -> bool:
+        """Merge segments selected by the merge policy.
+
+        Segments are written without holding the lock, so that documents can be
+        added or deleted during a merge. Deletions made in the meantime are
+        carried over to the merged segment.
+
+        Args:
+            force: merge all of the segments into one, dropping deleted documents.
+
+        Returns:
+            whether segments are merged.
+        """
+        with self._merge_lock:
+            with self._lock:
+                window = self._select(self._segments.segments, force)
+                if window is None:
+                    return False
+                sources = self._segments.segments[window]
+            name = self._reserve()
+
+            # map local document IDs of the sources to the merged ones
+            doc_table: DocTable = []
+            mappings: List[Dict[DocID, DocID]] = []
+            runs: List[Iterator[Entry]] = []
+            readers = [IndexReader(self._path(s.name)) for s in sources]
+            try:
+                for seg, reader in zip(sources, readers):
+                    mapping: Dict[DocID, DocID] = {}
+                    for doc_id in range(seg.num_docs):
+                        if doc_id not in seg.deleted:
+                            mapping[doc_id] = len(doc_table)
+                            doc_table.append(reader.doc(doc_id))
+                    mappings.append(mapping)
+                    runs.append(remap_entries(reader.entries(), mapping))
+                write_entries(f'{self._path(name)}.tmp', self._tokenizer.name,
+                              self._tokenizer.version, doc_table, merge_entries(runs),
+                              tokenizer_params=self._tokenizer.params)
+            finally:
+                for reader in readers:
+                    reader.close()
+            os.replace(f'{self._path(name)}.tmp', self._path(name))
+
+            with self._lock:
+                current = self._segments.segments
+                start = [s.name for s in current].index(sources[0].name)
+                deleted: List[DocID] = []
+                for seg, mapping in zip(current[start:start+len(sources)], mappings):
+                    deleted.extend(mapping[doc_id] for doc_id in seg.deleted if doc_id in mapping)
+                merged = SegmentInfo(name, len(doc_table), frozenset(deleted))
+                self._commit(current[:start] + (merged,) + current[start+len(sources):])
+                for doc_id, doc in enumerate(doc_table):
+                    if doc_id not in merged.deleted:
+                        self._names[doc.name] = (name, doc_id)
+
+            for seg in sources:
+                os.remove(self._path(seg.name))
+
+        msg = f'Merged {len(sources)} segments into {name}'
+        logging.info(msg)
+        return True
+
+    def _merge_loop(self, interval: float) -> None:
+        """Merge segments whenever the index is changed.
+        """
+        while not self._stop.is_set():
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            try:
+                while not self._stop.is_set() and self.merge():
+                    pass
+            except Exception:  # pylint: disable=broad-except
+                logging.exception('Failed to merge segments')
+
+    def start_merging(self, interval: float = 1.0) -> None:
+        """Start merging segments in a background thread.
+
+        Args:
+            interval: the longest interval in seconds between merge attempts.
+        """
+        if self._merger is not None:
+            return
+        self._stop.clear()
+        self._merger = threading.Thread(target=self._merge_loop, args=(interval,), daemon=True)
+        self._merger.start()
+
+    def stop_merging(self) -> None:
+        """Stop the background merge thread, waiting for a running merge.
+        """
+        if self._merger is None:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._merger.join()
+        self._merger = None
+
+    def close(self) -> None:
+        """Stop merging segments.
+        """
+        self.stop_merging()
+
+    def __enter__(self) -> 'SegmentedIndex':
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class SegmentedReader:
+    """Read-only view of all of the live segments in a segmented index.
+
+    This class has the same interface as `IndexReader`. Deleted documents are
+    dropped from postings, and SegmentedReader().refresh() method picks up the
+    changes made by a writer.
+    """
+
+    def __init__(self, index_dir: str, preload: bool = False) -> None:
+        """Open a segmented index.
+
+        Args:
+            index_dir: a path to the index directory.
+            preload: whether to read segments into the page cache ahead
+                (see `IndexReader`).
+        """
+        if not is_segmented(index_dir):
+            raise FileNotFoundError(f'not a segmented index: {index_dir}')
+        self._index_dir = index_dir
+        self._preload = preload
+        self._readers: Dict[str, IndexReader] = {}
+        self._stat: Optional[Tuple[int, int, int]] = None
+        self._load()
+
+    def _segments_stat(self) -> Tuple[int, int, int]:
+        st = os.stat(path.join(self._index_dir, SEGMENTS_FILE))
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _load(self) -> None:
+        """Read the segments file, and open new segments.
+
+        A merge may remove segments between reading the segments file and
+        opening them, in which case the segments file is read again.
+        """
+        for retry in range(_MAX_RETRIES):
+            stat = self._segments_stat()
+            segments = read_segments(self._index_dir)
+            try:
+                readers = {s.name: self._open(s.name) for s in segments.segments}
+            except FileNotFoundError:
+                if retry == _MAX_RETRIES - 1:
+                    raise
+                continue
+            break
+
+        for name, reader in self._readers.items():
+            if name not in readers:
+                reader.close()
+        self._readers = readers
+        self._stat = stat
+        self._segments = segments
+        self._live_dfs: Dict[Tuple[str, str], int] = {}
+        self._bases: List[int] = []
+        self._total_length = 0
+        base = 0
+        for seg in segments.segments:
+            self._bases.append(base)
+            base += seg.num_docs
+            reader = readers[seg.name]
+            self._total_length += reader.total_length - sum(reader.doc_length(doc_id)
+                                                            for doc_id in seg.deleted)
+
+    def _open(self, name: str) -> IndexReader:
+        """Returns the reader of a segment, which is opened unless it has been.
+        """
+        reader = self._readers.get(name)
+        if reader is None:
+            reader = IndexReader(path.join(self._index_dir, name), self._preload)
+        return reader
+
+    def changed(self) -> bool:
+        """Returns whether the index has been changed since the segments were loaded.
+        """
+        return self._segments_stat() != self._stat
+
+    def refresh(self) -> bool:
+        """Reload the segments if the index has been changed.
+
+        Returns:
+            whether the segments are reloaded.
+        """
+        if not self.changed():
+            return False
+        self._load()
+        return True
+
+    @property
+    def generation(self) -> int:
+        """Generation of the loaded segments file.
+        """
+        return self._segments.generation
+
+    @property
+    def tokenizer_name(self) -> str:  # pylint: disable=missing-docstring
+        return self._segments.tokenizer_name
+
+    @property
+    def tokenizer_version(self) -> str:  # pylint: disable=missing-docstring
+        return self._segments.tokenizer_version
+
+    @property
+    def tokenizer_params(self) -> Dict[str, Any]:  # pylint: disable=missing-docstring
+        return self._segments.tokenizer_params
+
+    @property
+    def num_docs(self) -> int:
+        """The number of live documents.
+        """
+        return sum(seg.num_live_docs for seg in self._segments.segments)
+
+    def doc_ids(self) -> Iterator[DocID]:
+        """Iterate over the document IDs of live documents in increasing order.
+        """
+        for seg, base in zip(self._segments.segments, self._bases):
+            for doc_id in range(seg.num_docs):
+                if doc_id not in seg.deleted:
+                    yield base + doc_id
+
+    @property
+    def total_length(self) -> int:
+        """The number of tokens in all of the live documents.
+        """
+        return self._total_length
+
+    def _locate(self, doc_id: DocID) -> Tuple[IndexReader, DocID]:
+        """Returns the segment of the document and the local document ID.
+        """
+        i = bisect.bisect_right(self._bases, doc_id) - 1
+        if i < 0:
+            raise IndexError(f'document ID out of range: {doc_id}')
+        seg = self._segments.segments[i]
+        return self._readers[seg.name], doc_id - self._bases[i]
+
+    def doc(self, doc_id: DocID) -> DocInfo:
+        """Returns the document table entry of the document.
+        """
+        reader, local_id = self._locate(doc_id)
+        return reader.doc(local_id)
+
+    def doc_length(self, doc_id: DocID) -> int:
+        """Returns the number of tokens in the document.
+        """
+        reader, local_id = self._locate(doc_id)
+        return reader.doc_length(local_id)
+
+    def _segment_stats(self, seg: SegmentInfo, term: str) -> Optional[TermStats]:
+        """Returns statistics of the term over live documents in a segment, or None.
+
+        For segments with deleted documents, the document IDs of the postings
+        are decoded once, and the number of live documents is cached until the
+        segments are reloaded. The maximum term frequency and the minimum
+        length still include deleted documents, which keeps them bounds of the
+        live ones.
+        """
+        reader = self._readers[seg.name]
+        stats = reader.term_stats(term)
+        if stats is None or not seg.deleted:
+            return stats
+        key = (seg.name, term)
+        df = self._live_dfs.get(key)
+        if df is None:
+            plist = reader.get(term)
+            assert plist is not None
+            df = sum(1 for doc_id in plist.doc_ids if doc_id not in seg.deleted)
+            self._live_dfs[key] = df
+        return stats._replace(df=df) if df else None
+
+    def df(self, term: str) -> int:
+        """Returns the number of documents which contain the term.
+
+        Deleted documents are counted, so this is an upper bound of the number
+        of live ones, which is cheap enough for planning queries. See
+        `term_stats` for the exact number.
+        """
+        return sum(self._readers[seg.name].df(term) for seg in self._segments.segments)
+
+    def term_stats(self, term: str) -> Optional[TermStats]:
+        """Returns statistics of the term over all of the live documents, or None.
+        """
+        return merge_term_stats(self._segment_stats(seg, term) for seg in self._segments.segments)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.terms())
+
+    def __contains__(self, term: object) -> bool:
+        return self.get(term) is not None if isinstance(term, str) else False
+
+    def terms(self) -> Iterator[str]:
+        """Iterate over terms of all of the segments in the dictionary order.
+        """
+        merged = heapq.merge(*(reader.terms() for reader in self._readers.values()),
+                             key=lambda t: t.encode('utf-8'))
+        for term, _ in groupby(merged):
+            yield term
+
+    def get(self, term: str) -> Optional[PostingList]:
+        """Returns the postings of the term in live documents, or None.
+        """
+        parts: List[PostingsPart] = []
+        for seg, base in zip(self._segments.segments, self._bases):
+            plist = self._readers[seg.name].get(term)
+            if plist is not None:
+                parts.append((plist, base, seg.deleted))
+        if not parts:
+            return None
+        if len(parts) == 1 and parts[0][1] == 0 and not parts[0][2]:
+            return parts[0][0]
+        plist = PostingList.join(parts)
+        return plist if len(plist) else None
+
+    def close(self) -> None:
+        """Release all of the segments.
+        """
+        for reader in self._readers.values():
+            reader.close()
+        self._readers = {}
+
+    def __enter__(self) -> 'SegmentedReader':
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
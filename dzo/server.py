@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""Server module
+
+A search server keeps an `Engine` or a `ShardedEngine` loaded, and answers
+queries over HTTP on a TCP or a Unix domain socket. Responses are JSON;
+
+    GET  /health                        {"status": "ok", "num_docs": <N>}
+    GET  /search?q=<Query>[&mode=<Mode>][&k=<K>]
+                                        {"results": [...]}
+    POST /search  {"queries": [{"q": <Query>, "mode": <Mode>, "k": <K>}, ...]}
+                                        {"results": [[...], ...]}
+
+where a mode is one of `search` (default; ranked by BM25 if k is given), `query`
+(boolean query) and `regexp`. A POST request answers a batch of queries at once,
+in the order of the queries. An invalid request is answered with status 400 and
+{"error": <Message>}, and a failed query with status 500 and {"error": <Message>}.
+Requests are handled concurrently by threads sharing
+the engine.
+"""
+import json
+import logging
+import os
+import re
+import socket
+import socketserver
+import stat
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from .engine import Engine
+from .shard import ShardedEngine
+from .query import QuerySyntaxError
+from .ranking import ScoredDoc
+
+
+MODES: Tuple[str, ...] = ('search', 'query', 'regexp')
+
+_MAX_BODY_SIZE: int = 16 * 1024 ** 2
+
+
+class BadRequest(ValueError):
+    """Raised when a request is invalid.
+    """
+
+
+AnyEngine = Union[Engine, ShardedEngine]
+
+
+def run_query(engine: AnyEngine, request: Mapping[str, Any]) -> List[Any]:
+    """Answer a query of a request.
+
+    Args:
+        engine: a search engine.
+        request: a mapping with a query `q`, and optionally `mode` and `k`.
+
+    Returns:
+        results which can be serialized as JSON.
+    """
+    query = request.get('q')
+    mode = request.get('mode') or 'search'
+    k = request.get('k')
+    if not isinstance(query, str):
+        raise BadRequest('a query `q` has to be given as a string')
+    if mode not in MODES:
+        raise BadRequest(f'mode has to be one of {", ".join(MODES)}')
+    if k is not None:
+        try:
+            k = int(k)
+        except (TypeError, ValueError):
+            raise BadRequest('k has to be an integer') from None
+
+    try:
+        if mode == 'query':
+            results: list = engine.query(query)
+        elif mode == 'regexp':
+            results = engine.regexp(query)
+        else:
+            results = engine.search(query, top_k=k)
+    except QuerySyntaxError as err:
+        raise BadRequest(f'invalid query: {err}') from None
+    except re.error as err:
+        raise BadRequest(f'invalid regular expression: {err}') from None
+    return [{'name': r.name, 'score': r.score} if isinstance(r, ScoredDoc) else r
+            for r in results]
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    """HTTP request handler of a search server.
+    """
+
+    server: Union['SearchServer', 'UnixSearchServer']
+
+    def _send(self, status: int, obj: Dict[str, Any]) -> None:
+        body = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _fail(self, err: Exception) -> None:
+        """Log an unexpected error of a query, and answer it with status 500.
+        """
+        msg = f'Failed to answer {self.command} {self.path}'
+        logging.exception(msg)
+        self._send(500, {'error': f'{type(err).__name__}: {err}'})
+
+    def _read_queries(self) -> List[Dict[str, Any]]:
+        """Read the queries in the body of a POST request.
+
+        Raises:
+            BadRequest: if the body is not a JSON object with a list of queries.
+        """
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            raise BadRequest('`Content-Length` has to be an integer') from None
+        if length < 0:
+            raise BadRequest('`Content-Length` has to be non-negative')
+        if length > _MAX_BODY_SIZE:
+            raise BadRequest('request body is too large')
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError as err:
+            raise BadRequest(f'request body is not valid JSON: {err}') from None
+        queries = body.get('queries') if isinstance(body, dict) else None
+        if not isinstance(queries, list) or not all(isinstance(q, dict) for q in queries):
+            raise BadRequest('`queries` has to be a list of objects')
+        return queries
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name,missing-docstring
+        url = urlsplit(self.path)
+        if url.path == '/health':
+            self._send(200, {'status': 'ok', 'num_docs': self.server.engine.num_docs})
+        elif url.path == '/search':
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            try:
+                self._send(200, {'results': run_query(self.server.engine, params)})
+            except BadRequest as err:
+                self._send(400, {'error': str(err)})
+            except Exception as err:  # pylint: disable=broad-except
+                self._fail(err)
+        else:
+            self._send(404, {'error': f'not found: {url.path}'})
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name,missing-docstring
+        if urlsplit(self.path).path != '/search':
+            self._send(404, {'error': f'not found: {self.path}'})
+            return
+        try:
+            results = [run_query(self.server.engine, q) for q in self._read_queries()]
+        except BadRequest as err:
+            self._send(400, {'error': str(err)})
+            return
+        except Exception as err:  # pylint: disable=broad-except
+            self._fail(err)
+            return
+        self._send(200, {'results': results})
+
+    def address_string(self) -> str:
+        # a client of a Unix domain socket has no address
+        return super().address_string() if self.client_address else 'unix'
+
+    def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+        msg = f'{self.address_string()} {format % args}'
+        logging.info(msg)
+
+
+class SearchServer(ThreadingHTTPServer):
+    """A search server on a TCP socket, which handles each request in a thread.
+    """
+
+    def __init__(self, engine: AnyEngine, address: Tuple[str, int]) -> None:
+        self.engine = engine
+        super().__init__(address, SearchHandler)
+
+
+def _remove_stale_socket(socket_path: str) -> None:
+    """Remove a socket file left by a server which is not running anymore.
+
+    Raises:
+        OSError: when the path is not a socket, or a server is listening to it.
+    """
+    try:
+        mode = os.stat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f'not a socket: {socket_path}')
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except ConnectionRefusedError:
+            os.remove(socket_path)
+            return
+    raise OSError(f'a server is already listening to {socket_path}')
+
+
+class UnixSearchServer(socketserver.ThreadingUnixStreamServer):
+    """A search server on a Unix domain socket, which handles each request in a thread.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, engine: AnyEngine, socket_path: str) -> None:
+        self.engine = engine
+        self.socket_path = socket_path
+        _remove_stale_socket(socket_path)
+        super().__init__(socket_path, SearchHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def make_server(
+        engine: AnyEngine,
+        host: str = '127.0.0.1',
+        port: int = 8000,
+        unix_socket: Optional[str] = None
+    ) -> Union[SearchServer, UnixSearchServer]:
+    """Make a search server.
+
+    Example:
+        >>> server = make_server(Engine('/path/to/index'), port=8000)
+        >>> server.serve_forever()
+
+    Args:
+        engine: a search engine, which is shared by all of the requests.
+        host: a host name to listen to.
+        port: a port to listen to; 0 picks a free port.
+        unix_socket: a path to a Unix domain socket, which is used instead of
+            the host and the port if given.
+
+    Returns:
+        a server, which is not started yet.
+    """
+    if unix_socket is not None:
+        return UnixSearchServer(engine, unix_socket)
+    return SearchServer(engine, (host, port))
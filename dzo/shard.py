@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""Shard module
+
+A sharded index is a directory of index files (shards) which partition the
+documents by the hashes of their names, listed in a shards file;
+
+    shards.json     tokenizer and file names of the shards
+    <NNNNNNNN>.dzo  shards (see `storage` module)
+
+ShardedEngine is a coordinator which queries all of the shards in parallel in
+worker processes, and merges their results. Ranked queries are answered in two
+rounds; statistics of the query terms are collected from the shards first, and
+the shards rank their documents with the combined statistics, so that the
+scores are the same as those of a single index (see `ranking` module).
+
+Worker processes open all of the shards, which are memory-mapped, so that
+they share the pages of the shards, and any of them can query any shard.
+"""
+import heapq
+import json
+import os
+import re
+import zlib
+from itertools import chain, islice
+from os import path
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from .engine import Engine
+from .query import parse
+from .ranking import BM25, ScoredDoc, merge_corpus_stats
+from .storage import IndexReader
+from .tokenizer import MeCabTokenizer
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+
+SHARDS_FILE: str = 'shards.json'
+
+
+class Shards(NamedTuple):
+    """Contents of the shards file.
+    """
+    tokenizer_name: str
+    tokenizer_version: str
+    tokenizer_params: Dict[str, Any]
+    shards: Tuple[str, ...]  # file names of the shards
+
+
+def shard_name(i: int) -> str:
+    """Returns the file name of the i-th shard.
+    """
+    return f'{i:08d}.dzo'
+
+
+def shard_of(name: str, num_shards: int) -> int:
+    """Returns the shard of a document, which is stable across processes.
+
+    Example:
+        >>> shard_of('/path/to/doc', 4)
+        0
+
+    Args:
+        name: a name of the document.
+        num_shards: the number of shards.
+
+    Returns:
+        an index of the shard.
+    """
+    return zlib.crc32(name.encode('utf-8')) % num_shards
+
+
+def read_shards(index_dir: str) -> Shards:
+    """Read the shards file of a sharded index.
+
+    Args:
+        index_dir: a path to the index directory.
+
+    Returns:
+        contents of the shards file.
+    """
+    p = path.join(index_dir, SHARDS_FILE)
+    if not path.isfile(p):
+        raise FileNotFoundError(f'not found: {p}')
+    with open(p, mode='r') as fp:
+        obj = json.load(fp)
+    return Shards(obj['tokenizer_name'], obj['tokenizer_version'],
+                  obj.get('tokenizer_params', {}), tuple(obj['shards']))
+
+
+def write_shards(index_dir: str, shards: Shards) -> None:
+    """Write the shards file of a sharded index atomically.
+
+    Args:
+        index_dir: a path to the index directory.
+        shards: contents of the shards file.
+    """
+    p = path.join(index_dir, SHARDS_FILE)
+    with open(f'{p}.tmp', mode='w') as fp:
+        json.dump({**shards._asdict(), 'shards': list(shards.shards)}, fp)
+    os.replace(f'{p}.tmp', p)
+
+
+def is_sharded(index_path: str) -> bool:
+    """Whether the path is a sharded index.
+    """
+    return path.isfile(path.join(index_path, SHARDS_FILE))
+
+
+_worker_engines: List[Engine] = []
+
+
+def _init_worker(paths: List[str], dicdir: Optional[str], bm25: Optional[BM25]) -> None:
+    """Initialize a worker process with engines of all of the shards.
+    """
+    _worker_engines.extend(Engine(p, dicdir=dicdir, bm25=bm25) for p in paths)
+
+
+def _call(shard: int, method: str, *args: Any) -> Any:
+    """Call a method of the engine of a shard.
+
+    This function runs in worker processes.
+    """
+    return getattr(_worker_engines[shard], method)(*args)
+
+
+class ShardedEngine:
+    """A coordinator of the shards of a sharded index.
+
+    This class has the same search methods as `Engine`. Results of the shards
+    are concatenated in the order of the shards, except for ranked results,
+    which are merged by their scores.
+
+    Example:
+        >>> with ShardedEngine('/path/to/index_dir', workers=4) as engine:
+        ...     engine.rank('おにぎり', k=10)
+        [ScoredDoc(name='/path/to/doc', score=1.23), ...]
+    """
+
+    def __init__(
+            self,
+            index_dir: str,
+            dicdir: Optional[str] = None,
+            bm25: Optional[BM25] = None,
+            workers: Optional[int] = None
+        ) -> None:
+        """Initialize the coordinator.
+
+        Args:
+            index_dir: a path to the sharded index directory.
+            dicdir: MeCab dictionary directory.
+            bm25: a scoring function for ranked search; BM25() if None.
+            workers: the number of worker processes; the number of shards, up to
+                the number of CPUs, if None.
+        """
+        shards = read_shards(index_dir)
+        if shards.tokenizer_name == MeCabTokenizer.name and dicdir is None:
+            msg = 'dicdir should not be None set when the index was made by MeCabTokenizer'
+            raise ValueError(msg)
+        paths = [path.join(index_dir, name) for name in shards.shards]
+        num_docs = 0
+        for p in paths:
+            with IndexReader(p) as reader:
+                num_docs += reader.num_docs
+        if workers is None:
+            workers = min(len(paths), os.cpu_count() or 1)
+        if workers < 1:
+            raise ValueError('the number of workers has to be positive')
+
+        # imported here not to load multiprocessing for the other engines
+        # pylint: disable=import-outside-toplevel,redefined-outer-name
+        from concurrent.futures import ProcessPoolExecutor
+
+        self._num_shards = len(paths)
+        self._num_docs = num_docs
+        self._executor: ProcessPoolExecutor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(paths, dicdir, bm25))
+
+    @property
+    def num_docs(self) -> int:
+        """The number of documents in all of the shards.
+        """
+        return self._num_docs
+
+    def _fan_out(self, method: str, *args: Any) -> List[Any]:
+        """Call a method of the engines of all of the shards in parallel.
+
+        Returns:
+            results of the shards in the order of the shards.
+        """
+        futures = [self._executor.submit(_call, shard, method, *args)
+                   for shard in range(self._num_shards)]
+        return [future.result() for future in futures]
+
+    def search(self, query: str, top_k: Optional[int] = None) -> list:
+        """Returns search results (see `Engine.search`).
+        """
+        if top_k is not None:
+            return self.rank(query, top_k)
+        return list(chain.from_iterable(self._fan_out('search', query)))
+
+    def rank(self, query: str, k: int = 10) -> List[ScoredDoc]:
+        """Returns the top k documents of all of the shards ranked by BM25.
+
+        Parameters:
+            query: a search query, represented as a string.
+            k: the number of results.
+
+        Returns:
+            pairs of a document name and its score in descending order of the score.
+        """
+        stats = merge_corpus_stats(self._fan_out('corpus_stats', query))
+        results = self._fan_out('rank', query, k, stats)
+        return list(islice(heapq.merge(*results, key=lambda r: -r.score), k))
+
+    def query(self, query: str) -> List[str]:
+        """Returns documents which match a boolean query (see `Engine.query`).
+        """
+        parse(query)  # raises syntax errors here
+        return list(chain.from_iterable(self._fan_out('query', query)))
+
+    def regexp(self, pattern: str) -> List[str]:
+        """Returns documents which contain a match of a regular expression
+        (see `Engine.regexp`).
+        """
+        re.compile(pattern)  # raises syntax errors here
+        return list(chain.from_iterable(self._fan_out('regexp', pattern)))
+
+    def close(self) -> None:
+        """Stop the worker processes.
+        """
+        self._executor.shutdown()
+
+    def __enter__(self) -> 'ShardedEngine':
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def open_engine(index_path: str, dicdir: Optional[str] = None) -> Union[Engine, ShardedEngine]:
+    """Open an engine of an index file, a segmented index or a sharded index.
+
+    Args:
+        index_path: a path to the index.
+        dicdir: MeCab dictionary directory.
+
+    Returns:
+        a ShardedEngine for a sharded index, or an Engine otherwise.
+    """
+    if is_sharded(index_path):
+        return ShardedEngine(index_path, dicdir=dicdir)
+    return Engine(index_path, dicdir=dicdir)
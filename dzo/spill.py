@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""Spill module
+
+An inverted index of a corpus larger than memory is built in runs; once the
+estimated size of the in-memory inverted index reaches a memory budget, it is
+flushed to a temporary file as a run sorted by term. Runs are merged by a k-way
+merge into the entries of the final index file (see `storage.write_entries`).
+
+Since document IDs are assigned in increasing order, postings of a term in a run
+always precede the ones in the following runs.
+"""
+import heapq
+import logging
+import os
+import shutil
+import struct
+import tempfile
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterable, Iterator, List, Mapping, Optional, Sequence
+
+from .codec import PostingList, concat_postings, encode_postings
+from .indexer import DocID, Index, IndexedCorpus, Indexer, InvIndex
+from .storage import Entry, iter_entries
+
+
+# Rough estimation of memory consumption in bytes
+_POSITION_SIZE: int = 36   # an int object and a list slot
+_POSTING_SIZE: int = 160   # a dict entry, an int key and a list
+_TERM_SIZE: int = 300      # a str object and a dict
+
+_RECORD = struct.Struct('<II')
+
+
+def write_run(run_path: str, inv_index: InvIndex) -> None:
+    """Write an inverted index to a run file sorted by term.
+
+    Args:
+        run_path: a path to the run file.
+        inv_index: an inverted index.
+    """
+    with open(run_path, mode='wb') as fp:
+        for term, postings in iter_entries(inv_index):
+            fp.write(_RECORD.pack(len(term), len(postings)))
+            fp.write(term)
+            fp.write(postings)
+
+
+def iter_run(run_path: str) -> Iterator[Entry]:
+    """Iterate over entries in a run file written by `write_run`.
+    """
+    with open(run_path, mode='rb') as fp:
+        while True:
+            record = fp.read(_RECORD.size)
+            if not record:
+                return
+            term_length, postings_length = _RECORD.unpack(record)
+            yield fp.read(term_length), fp.read(postings_length)
+
+
+def merge_entries(runs: Sequence[Iterable[Entry]]) -> Iterator[Entry]:
+    """K-way merge of sorted runs.
+
+    Postings of the same term in several runs are concatenated in the order of
+    the runs without decoding their positions, so that a term in many runs
+    costs as much memory as its encoded postings.
+
+    Args:
+        runs: runs of entries, each of which is sorted by term. Document IDs of
+            a run have to be greater than those of the previous runs.
+
+    Returns:
+        merged entries sorted by term without duplicates.
+    """
+    merged = heapq.merge(*runs, key=itemgetter(0))
+    for term, group in groupby(merged, key=itemgetter(0)):
+        encoded = [postings for _, postings in group]
+        if len(encoded) == 1:
+            yield term, encoded[0]
+            continue
+        yield term, concat_postings(encoded)
+
+
+def remap_entries(
+        entries: Iterable[Entry],
+        doc_ids: Optional[Mapping[DocID, DocID]]
+    ) -> Iterator[Entry]:
+    """Rewrite document IDs in entries.
+
+    Args:
+        entries: entries sorted by term.
+        doc_ids: a mapping from old document IDs to new ones. Documents not in
+            the mapping are dropped, as well as terms without any documents. If
+            it is None, entries are passed through as they are.
+
+    Returns:
+        entries sorted by term.
+    """
+    if doc_ids is None:
+        yield from entries
+        return
+    for term, buf in entries:
+        postings = {doc_ids[doc_id]: positions
+                    for doc_id, positions in PostingList.decode(buf).items()
+                    if doc_id in doc_ids}
+        if postings:
+            yield term, encode_postings(postings)
+
+
+class SpillingIndexer(Indexer):
+    """An indexer whose memory usage is bounded by a budget.
+
+    Example:
+        >>> with SpillingIndexer(memory_budget=256 * 1024 ** 2) as indexer:
+        ...     for doc in docs:
+        ...         indexer.add(doc.name, tokens_of(doc))
+        ...     write_entries(result_path, name, version,
+        ...                   indexer.doc_table, indexer.entries())
+    """
+
+    def __init__(self, memory_budget: int, tmp_dir: Optional[str] = None) -> None:
+        super().__init__()
+        if memory_budget <= 0:
+            raise ValueError('memory budget has to be positive')
+        self._memory_budget = memory_budget
+        self._tmp_dir = tmp_dir
+        self._run_dir: Optional[str] = None
+        self._run_paths: List[str] = []
+        self._size = 0
+
+    def add_index(self, name: str, index: Index, length: int) -> DocID:
+        """Add a document, and flush the inverted index if it exceeds the budget.
+        """
+        num_terms = len(self._inv_index)
+        doc_id = super().add_index(name, index, length)
+        self._size += (_TERM_SIZE * (len(self._inv_index) - num_terms)
+                       + _POSTING_SIZE * len(index)
+                       + _POSITION_SIZE * length)
+        if self._size >= self._memory_budget:
+            self.flush()
+        return doc_id
+
+    def update(self, corpus: IndexedCorpus) -> None:
+        """Add documents of another index, and flush the inverted index if it
+        exceeds the budget.
+        """
+        num_terms = len(self._inv_index)
+        super().update(corpus)
+        self._size += (_TERM_SIZE * (len(self._inv_index) - num_terms)
+                       + _POSTING_SIZE * sum(len(ps) for ps in corpus.inv_index.values())
+                       + _POSITION_SIZE * sum(doc.length for doc in corpus.doc_table))
+        if self._size >= self._memory_budget:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the in-memory inverted index to a new run, and release it.
+        """
+        if not self._inv_index:
+            return
+        if self._run_dir is None:
+            self._run_dir = tempfile.mkdtemp(prefix='dzo-', dir=self._tmp_dir)
+        run_path = os.path.join(self._run_dir, f'{len(self._run_paths)}.run')
+        write_run(run_path, self._inv_index)
+        self._run_paths.append(run_path)
+        self._inv_index = {}
+        self._size = 0
+        msg = f'Flushed an inverted index run to {run_path}'
+        logging.info(msg)
+
+    def entries(self) -> Iterator[Entry]:
+        """Returns merged entries of all of the runs and the in-memory index.
+        """
+        runs: List[Iterable[Entry]] = [iter_run(p) for p in self._run_paths]
+        runs.append(iter_entries(self._inv_index))
+        return merge_entries(runs)
+
+    @property
+    def num_runs(self) -> int:
+        """The number of runs flushed so far.
+        """
+        return len(self._run_paths)
+
+    def close(self) -> None:
+        """Remove temporary run files.
+        """
+        if self._run_dir is not None:
+            shutil.rmtree(self._run_dir, ignore_errors=True)
+            self._run_dir = None
+        self._run_paths = []
+
+    def __enter__(self) -> 'SpillingIndexer':
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
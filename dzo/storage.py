@@ -0,0 +1,515 @@
+# -*- coding: utf-8 -*-
+"""Storage module
+
+An inverted index is saved as a single binary file which consists of a header
+and four sections. The layout is as follows (all integers are little endian);
+
+    header      magic, format version, (offset, length) of each section, number
+                of documents, number of terms, CRC32 of each section
+    meta        tokenizer name, version and parameters (JSON)
+    documents   number of documents, total length, name offsets, lengths, name blob
+    postings    encoded postings lists, one after another (see `codec` module)
+    dictionary  number of terms, term offsets, postings offsets, document
+                frequencies, maximum term frequencies, minimum document
+                lengths, term blob
+
+Terms in the dictionary are sorted by their UTF-8 representation, so that a term
+can be looked up by binary search without decoding the whole dictionary.
+Document lengths and statistics of each term are stored for ranking, so that no
+statistics have to be computed from the corpus at query time. The maximum term
+frequency and the minimum length of the documents which contain a term bound the
+score of the term in any document (see `ranking` module).
+The header has a fixed layout, so that `read_header()` reads the metadata of an
+index without touching the other sections. `IndexReader` maps the file into
+memory and decodes postings lazily.
+"""
+import json
+import mmap
+import struct
+import zlib
+from array import array
+from os import path
+from typing import (Any, BinaryIO, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional,
+                    Sequence, Tuple)
+
+from .codec import PostingList, encode_postings
+from .indexer import DocID, DocInfo, DocTable, IndexedCorpus, InvIndex
+
+
+MAGIC: bytes = b'DZOI'
+FORMAT_VERSION: int = 7
+
+_HEADER = struct.Struct('<4sI8Q2Q4I')
+_SECTIONS: Tuple[str, ...] = ('meta', 'documents', 'dictionary', 'postings')
+_U32 = struct.Struct('<I')
+_U64 = struct.Struct('<Q')
+
+Entry = Tuple[bytes, bytes]  # (<UTF-8 encoded term>, <encoded postings>)
+
+
+class TermStats(NamedTuple):
+    """Statistics of a term for ranking.
+    """
+    df: int          # number of documents which contain the term
+    max_tf: int      # maximum term frequency in a document
+    min_length: int  # minimum length of the documents which contain the term
+
+
+class IndexHeader(NamedTuple):
+    """The header and the metadata of an index file.
+    """
+    format_version: int
+    tokenizer_name: str
+    tokenizer_version: str
+    tokenizer_params: Dict[str, Any]  # e.g. {'n': 3} for NGramTokenizer
+    num_docs: int
+    num_terms: int
+    sections: Tuple[Tuple[int, int], ...]  # (offset, length) of each section
+    checksums: Tuple[int, ...]             # CRC32 of each section
+
+
+def _decode_str(buf: bytes, offset: int) -> Tuple[str, int]:
+    """Decode a length prefixed string, and returns it with the next offset.
+    """
+    (length,) = _U32.unpack_from(buf, offset)
+    start = offset + _U32.size
+    return bytes(buf[start:start+length]).decode('utf-8'), start + length
+
+
+def _unpack_header(head: bytes, index_path: str) -> Tuple[Tuple[Tuple[int, int], ...], tuple]:
+    """Unpack the fixed-layout header, and returns the sections and the rest.
+    """
+    if len(head) < _HEADER.size:
+        raise ValueError(f'not an index file: {index_path}')
+    magic, fmt_version, *fields = _HEADER.unpack_from(head, 0)
+    if magic != MAGIC:
+        raise ValueError(f'not an index file: {index_path}')
+    if fmt_version != FORMAT_VERSION:
+        raise ValueError(f'unsupported index format version: {fmt_version}')
+    sections = tuple((fields[i], fields[i+1]) for i in range(0, 2 * len(_SECTIONS), 2))
+    return sections, tuple(fields[2*len(_SECTIONS):])
+
+
+def _decode_header(sections: Tuple[Tuple[int, int], ...], rest: tuple, meta: bytes) -> IndexHeader:
+    """Decode the header with the meta section.
+    """
+    tokenizer_name, offset = _decode_str(meta, 0)
+    tokenizer_version, offset = _decode_str(meta, offset)
+    params, _ = _decode_str(meta, offset)
+    num_docs, num_terms, *checksums = rest
+    return IndexHeader(FORMAT_VERSION, tokenizer_name, tokenizer_version, json.loads(params),
+                       num_docs, num_terms, sections, tuple(checksums))
+
+
+def read_header(index_path: str) -> IndexHeader:
+    """Read the header and the metadata of an index file, without the other sections.
+
+    Example:
+        >>> read_header('/path/to/index').tokenizer_params
+        {'n': 3}
+
+    Args:
+        index_path: a path to the index file.
+
+    Returns:
+        the header.
+    """
+    if not path.isfile(index_path):
+        raise FileNotFoundError(f'not found: {index_path}')
+    with open(index_path, mode='rb') as fp:
+        sections, rest = _unpack_header(fp.read(_HEADER.size), index_path)
+        meta_offset, meta_length = sections[0]
+        fp.seek(meta_offset)
+        meta = fp.read(meta_length)
+    return _decode_header(sections, rest, meta)
+
+
+def merge_term_stats(stats: Iterable[Optional[TermStats]]) -> Optional[TermStats]:
+    """Combine statistics of a term in disjoint sets of documents.
+
+    Example:
+        >>> merge_term_stats([TermStats(2, 3, 10), None, TermStats(1, 5, 20)])
+        TermStats(df=3, max_tf=5, min_length=10)
+
+    Args:
+        stats: statistics of the term in each set, or None if it does not occur.
+
+    Returns:
+        statistics of the term in all of the documents, or None if it does not occur.
+    """
+    known = [s for s in stats if s is not None]
+    if not known:
+        return None
+    return TermStats(sum(s.df for s in known), max(s.max_tf for s in known),
+                     min(s.min_length for s in known))
+
+
+def _write_section(fp: BinaryIO, data: bytes) -> Tuple[int, int]:
+    """Write a section aligned on 8 bytes, and returns its offset and length.
+    """
+    fp.write(b'\x00' * (-fp.tell() % 8))
+    offset = fp.tell()
+    fp.write(data)
+    return offset, len(data)
+
+
+def _encode_str(s: str) -> bytes:
+    """Encode a string as a length prefixed UTF-8 bytes.
+    """
+    b = s.encode('utf-8')
+    return _U32.pack(len(b)) + b
+
+
+def _pack_u64s(values: Sequence[int]) -> bytes:
+    """Pack unsigned integers as an array of 8 bytes integers.
+    """
+    return struct.pack(f'<{len(values)}Q', *values)
+
+
+def _encode_documents(doc_table: DocTable) -> bytes:
+    """Encode a document table as the documents section.
+    """
+    encoded_names = [doc.name.encode('utf-8') for doc in doc_table]
+    name_offsets: List[int] = [0]
+    for encoded in encoded_names:
+        name_offsets.append(name_offsets[-1] + len(encoded))
+    return b''.join([_U64.pack(len(doc_table)),
+                     _U64.pack(sum(doc.length for doc in doc_table)),
+                     _pack_u64s(name_offsets),
+                     _pack_u64s([doc.length for doc in doc_table]),
+                     *encoded_names])
+
+
+def _term_stats(postings: bytes, doc_table: DocTable) -> TermStats:
+    """Compute statistics of a term from its encoded postings without positions.
+    """
+    plist = PostingList.decode(postings)
+    if not plist:
+        return TermStats(0, 0, 0)
+    return TermStats(len(plist), max(plist.tfs), min(doc_table[d].length for d in plist.doc_ids))
+
+
+def iter_entries(inv_index: InvIndex) -> Iterator[Entry]:
+    """Iterate over entries of an inverted index in the dictionary order.
+
+    Args:
+        inv_index: an inverted index.
+
+    Returns:
+        pairs of a UTF-8 encoded term and its encoded postings.
+    """
+    for encoded, term in sorted((term.encode('utf-8'), term) for term in inv_index.keys()):
+        yield encoded, encode_postings(inv_index[term])
+
+
+def _write_postings(
+        fp: BinaryIO,
+        doc_table: DocTable,
+        entries: Iterable[Entry]
+    ) -> Tuple[Tuple[int, int], int, int, bytes]:
+    """Write the postings section from entries, and returns its offset and length,
+    its checksum, the number of terms and the dictionary section.
+    """
+    fp.write(b'\x00' * (-fp.tell() % 8))
+    postings_offset = fp.tell()
+    postings_length = 0
+    postings_crc = 0
+    postings_offsets = array('Q', [0])
+    term_offsets = array('Q', [0])
+    stats: List['array[int]'] = [array('Q'), array('Q'), array('Q')]
+    terms = bytearray()
+    prev: Optional[bytes] = None
+    for term, postings in entries:
+        if prev is not None and term <= prev:
+            raise ValueError('entries have to be sorted by term without duplicates')
+        fp.write(postings)
+        postings_crc = zlib.crc32(postings, postings_crc)
+        postings_length += len(postings)
+        postings_offsets.append(postings_length)
+        for values, value in zip(stats, _term_stats(postings, doc_table)):
+            values.append(value)
+        terms.extend(term)
+        term_offsets.append(len(terms))
+        prev = term
+
+    num_terms = len(term_offsets) - 1
+    dictionary = b''.join([_U64.pack(num_terms),
+                           _pack_u64s(term_offsets),
+                           _pack_u64s(postings_offsets),
+                           *(_pack_u64s(values) for values in stats),
+                           terms])
+    return (postings_offset, postings_length), postings_crc, num_terms, dictionary
+
+
+def write_index(
+        result_path: str,
+        tokenizer_name: str,
+        tokenizer_version: str,
+        corpus: IndexedCorpus,
+        tokenizer_params: Optional[Mapping[str, Any]] = None
+    ) -> None:
+    """Write an inverted index to the given path in the binary format.
+
+    Args:
+        result_path: a path to the index file.
+        tokenizer_name: name of the tokenizer used to build the index.
+        tokenizer_version: version of the tokenizer.
+        corpus: an inverted index with its document table.
+        tokenizer_params: parameters of the tokenizer, which can be serialized
+            as JSON.
+    """
+    write_entries(result_path, tokenizer_name, tokenizer_version,
+                  corpus.doc_table, iter_entries(corpus.inv_index), tokenizer_params)
+
+
+def write_entries(
+        result_path: str,
+        tokenizer_name: str,
+        tokenizer_version: str,
+        doc_table: DocTable,
+        entries: Iterable[Entry],
+        tokenizer_params: Optional[Mapping[str, Any]] = None
+    ) -> None:
+    """Write an index file from entries sorted in the dictionary order.
+
+    Postings are written to the file as soon as they are given, so that only
+    the term dictionary is kept in memory.
+
+    Args:
+        result_path: a path to the index file.
+        tokenizer_name: name of the tokenizer used to build the index.
+        tokenizer_version: version of the tokenizer.
+        doc_table: a document table.
+        entries: pairs of a UTF-8 encoded term and its encoded postings, which
+            are sorted by the term without duplicates.
+        tokenizer_params: parameters of the tokenizer, which can be serialized
+            as JSON.
+    """
+    meta_data = b''.join([_encode_str(tokenizer_name), _encode_str(tokenizer_version),
+                          _encode_str(json.dumps(dict(tokenizer_params or {}), sort_keys=True))])
+    docs_data = _encode_documents(doc_table)
+    with open(result_path, mode='wb') as fp:
+        fp.write(b'\x00' * _HEADER.size)
+        meta = _write_section(fp, meta_data)
+        docs = _write_section(fp, docs_data)
+        postings, postings_crc, num_terms, dict_data = _write_postings(fp, doc_table, entries)
+        dictionary = _write_section(fp, dict_data)
+
+        fp.seek(0)
+        fp.write(_HEADER.pack(MAGIC, FORMAT_VERSION, *meta, *docs, *dictionary, *postings,
+                              len(doc_table), num_terms,
+                              zlib.crc32(meta_data), zlib.crc32(docs_data),
+                              zlib.crc32(dict_data), postings_crc))
+
+
+class IndexReader:
+    """Read-only view of an index file.
+
+    The file is memory-mapped, and only the postings of the looked up terms are
+    decoded. Several processes reading the same file share one page cache, and
+    no Python objects are made per term or per document, so that forked
+    processes share the pages of the index without copying them.
+
+    Example:
+        >>> reader = IndexReader('/path/to/index')
+        >>> reader.get('もも').to_dict()
+        {0: [2, 4], 1: [0]}
+        >>> reader.doc(1)
+        DocInfo(name='second', length=5)
+        >>> reader.close()
+    """
+
+    def __init__(self, index_path: str, preload: bool = False) -> None:
+        """Open an index file.
+
+        Args:
+            index_path: a path to the index file.
+            preload: whether to read the whole file into the page cache ahead,
+                e.g. once in a parent process before forking workers.
+        """
+        if not path.isfile(index_path):
+            raise FileNotFoundError(f'not found: {index_path}')
+        with open(index_path, mode='rb') as fp:
+            self._mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if preload and hasattr(self._mm, 'madvise') and hasattr(mmap, 'MADV_WILLNEED'):
+            self._mm.madvise(mmap.MADV_WILLNEED)
+        try:
+            sections, rest = _unpack_header(self._mm[:_HEADER.size], index_path)
+        except ValueError:
+            self._mm.close()
+            raise
+        (meta_offset, meta_length), (docs_offset, _), (dict_offset, _), (postings_offset, _) = \
+            sections
+
+        self.index_path = index_path
+        self.header = _decode_header(sections, rest, self._mm[meta_offset:meta_offset+meta_length])
+        self.tokenizer_name = self.header.tokenizer_name
+        self.tokenizer_version = self.header.tokenizer_version
+        self.tokenizer_params = self.header.tokenizer_params
+
+        self._view = memoryview(self._mm)
+
+        num_docs, total_length = struct.unpack_from('<2Q', self._mm, docs_offset)
+        offset = docs_offset + 2 * _U64.size
+        size = _U64.size * (num_docs + 1)
+        self._name_offsets = self._view[offset:offset+size].cast('Q')
+        self._doc_lengths = self._view[offset+size:offset+2*size-_U64.size].cast('Q')
+        self._names_base = offset + 2 * size - _U64.size
+        self._num_docs = num_docs
+        self._total_length = total_length
+
+        (num_terms,) = _U64.unpack_from(self._mm, dict_offset)
+        offset = dict_offset + _U64.size
+        size = _U64.size * (num_terms + 1)
+        self._term_offsets = self._view[offset:offset+size].cast('Q')
+        self._postings_offsets = self._view[offset+size:offset+2*size].cast('Q')
+        offset += 2 * size
+        size -= _U64.size
+        self._dfs = self._view[offset:offset+size].cast('Q')
+        self._max_tfs = self._view[offset+size:offset+2*size].cast('Q')
+        self._min_lengths = self._view[offset+2*size:offset+3*size].cast('Q')
+        self._terms_base = offset + 3 * size
+        self._postings_base = postings_offset
+        self._num_terms = num_terms
+
+    def _term_at(self, i: int) -> bytes:
+        """Returns the UTF-8 representation of the i-th term.
+        """
+        start = self._terms_base + self._term_offsets[i]
+        end = self._terms_base + self._term_offsets[i+1]
+        return self._mm[start:end]
+
+    def _find(self, term: str) -> int:
+        """Returns the position of the term in the dictionary, or -1.
+        """
+        key = term.encode('utf-8')
+        lo, hi = 0, self._num_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._num_terms and self._term_at(lo) == key:
+            return lo
+        return -1
+
+    def __len__(self) -> int:
+        return self._num_terms
+
+    @property
+    def num_docs(self) -> int:
+        """The number of documents in the index.
+        """
+        return self._num_docs
+
+    def doc_ids(self) -> Iterator[DocID]:
+        """Iterate over all of the document IDs in increasing order.
+        """
+        return iter(range(self._num_docs))
+
+    @property
+    def total_length(self) -> int:
+        """The number of tokens in all of the documents.
+        """
+        return self._total_length
+
+    def doc_length(self, doc_id: DocID) -> int:
+        """Returns the number of tokens in the document without decoding its name.
+        """
+        if not 0 <= doc_id < self._num_docs:
+            raise IndexError(f'document ID out of range: {doc_id}')
+        return self._doc_lengths[doc_id]
+
+    def doc(self, doc_id: DocID) -> DocInfo:
+        """Returns the document table entry of the document.
+
+        Args:
+            doc_id: a document ID.
+
+        Returns:
+            the name and the length of the document.
+        """
+        if not 0 <= doc_id < self._num_docs:
+            raise IndexError(f'document ID out of range: {doc_id}')
+        start = self._names_base + self._name_offsets[doc_id]
+        end = self._names_base + self._name_offsets[doc_id+1]
+        return DocInfo(self._mm[start:end].decode('utf-8'), self._doc_lengths[doc_id])
+
+    def __contains__(self, term: object) -> bool:
+        return isinstance(term, str) and self._find(term) >= 0
+
+    def terms(self) -> Iterator[str]:
+        """Iterate over terms in the dictionary order.
+        """
+        for i in range(self._num_terms):
+            yield self._term_at(i).decode('utf-8')
+
+    def entries(self) -> Iterator[Entry]:
+        """Iterate over entries in the dictionary order without decoding postings.
+        """
+        for i in range(self._num_terms):
+            start = self._postings_base + self._postings_offsets[i]
+            end = self._postings_base + self._postings_offsets[i+1]
+            yield self._term_at(i), self._mm[start:end]
+
+    def df(self, term: str) -> int:
+        """Returns the number of documents which contain the term.
+        """
+        i = self._find(term)
+        return self._dfs[i] if i >= 0 else 0
+
+    def term_stats(self, term: str) -> Optional[TermStats]:
+        """Returns statistics of the term, or None if the term is unknown.
+        """
+        i = self._find(term)
+        if i < 0:
+            return None
+        return TermStats(self._dfs[i], self._max_tfs[i], self._min_lengths[i])
+
+    def get(self, term: str) -> Optional[PostingList]:
+        """Returns the postings of the term, or None if the term is unknown.
+
+        Args:
+            term: a normalized token.
+
+        Returns:
+            a postings list sorted by document ID.
+        """
+        i = self._find(term)
+        if i < 0:
+            return None
+        start = self._postings_base + self._postings_offsets[i]
+        end = self._postings_base + self._postings_offsets[i+1]
+        return PostingList.decode(self._mm[start:end])
+
+    def verify(self) -> None:
+        """Verify the checksums of all of the sections, which reads the whole file.
+
+        Raises:
+            ValueError: when a section is corrupted.
+        """
+        for name, (offset, length), checksum in zip(_SECTIONS, self.header.sections,
+                                                    self.header.checksums):
+            with self._view[offset:offset+length] as section:
+                if zlib.crc32(section) != checksum:
+                    raise ValueError(f'checksum mismatch in the {name} section: {self.index_path}')
+
+    def close(self) -> None:
+        """Release the memory-mapped file.
+        """
+        self._name_offsets.release()
+        self._doc_lengths.release()
+        self._term_offsets.release()
+        self._postings_offsets.release()
+        self._dfs.release()
+        self._max_tfs.release()
+        self._min_lengths.release()
+        self._view.release()
+        self._mm.close()
+
+    def __enter__(self) -> 'IndexReader':
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
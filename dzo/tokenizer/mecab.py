@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 """MeCab tokenizer module
+
+MeCab is imported only when a tagger is made, so that this module can be
+imported without it.
 """
-from typing import List, NamedTuple, Tuple
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
 
-import MeCab
+if TYPE_CHECKING:
+    import MeCab
 
 from ..annot import Token
 from ..base import AbstractTokenizer
@@ -29,13 +33,44 @@ class MeCabToken(NamedTuple):
 
 class MeCabTokenizer(AbstractTokenizer):
     """MeCab tokenizer.
+
+    A tokenizer can be pickled (e.g. sent to worker processes) only when the
+    arguments of its tagger are given, since MeCab.Tagger cannot be pickled;
+    the tagger is constructed again when it is unpickled.
     """
 
     name: str = 'MeCabTokenizer'
     version: str = _VERSION
 
-    def __init__(self, tagger: MeCab.Tagger) -> None:
+    def __init__(self, tagger: 'MeCab.Tagger', tagger_args: Optional[str] = None) -> None:
         self.tagger = tagger
+        self.tagger_args = tagger_args
+
+    @classmethod
+    def from_args(cls, tagger_args: str) -> 'MeCabTokenizer':
+        """Make a tokenizer with a new tagger, importing MeCab.
+
+        Example:
+            >>> tokenizer = MeCabTokenizer.from_args('/path/to/dicdir')
+
+        Args:
+            tagger_args: arguments of the tagger, such as a dictionary directory.
+
+        Returns:
+            a tokenizer, which can be pickled.
+        """
+        import MeCab  # pylint: disable=import-outside-toplevel,redefined-outer-name
+        return cls(MeCab.Tagger(tagger_args), tagger_args=tagger_args)
+
+    def __getstate__(self) -> Dict[str, str]:
+        if self.tagger_args is None:
+            raise TypeError('MeCabTokenizer without tagger_args cannot be pickled')
+        return {'tagger_args': self.tagger_args}
+
+    def __setstate__(self, state: Dict[str, str]) -> None:
+        import MeCab  # pylint: disable=import-outside-toplevel,redefined-outer-name
+        self.tagger_args = state['tagger_args']
+        self.tagger = MeCab.Tagger(self.tagger_args)
 
     def tokenize(self, sentence: str) -> List[Token]:
         """MeCab morphological analysis tokenization.
@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
 """N-gram tokenizer module
 """
-from typing import List, NamedTuple, cast
+from typing import Any, Dict, List, NamedTuple, Tuple, cast
 
 from ..annot import Token
 from ..base import AbstractTokenizer
 from ..const import _VERSION
+from ..indexer import Index
+
+
+_CODE_POINT_BITS: int = 21  # code points are less than 0x110000
 
 
 class NGramToken(NamedTuple):
@@ -29,6 +33,12 @@ class NGramTokenizer(AbstractTokenizer):
     def __init__(self, n: int = 3) -> None:
         self.n = n
 
+    @property
+    def params(self) -> Dict[str, Any]:
+        """Parameters of the tokenizer (see `AbstractTokenizer.params`).
+        """
+        return {'n': self.n}
+
     def tokenize(self, sentence: str) -> List[Token]:
         """N-gram tokenization.
 
@@ -48,3 +58,54 @@ class NGramTokenizer(AbstractTokenizer):
             return [cast(Token, NGramToken(sentence))]
         l = len(sentence)
         return [cast(Token, NGramToken(sentence[i:i+self.n])) for i in range(l-self.n+1)]
+
+    def index(self, sentence: str) -> Tuple[Index, int]:
+        """Group positions of the n-grams of a sentence by n-gram.
+
+        The result is the same as `Indexer.make_index()` of the tokens, but the
+        n-grams are grouped with NumPy in a single pass over an array of code
+        points, so that a string is made only once for each distinct n-gram
+        instead of a token object for each position.
+
+        Example:
+            >>> tokenizer = NGramTokenizer(n=2)
+            >>> tokenizer.index('すもももも')
+            ({'すも': [0], 'もも': [1, 2, 3]}, 4)
+
+        Args:
+            sentence: a sentence to be tokenized.
+
+        Returns:
+            an index of the sentence, and the number of n-grams in it.
+        """
+        if len(sentence) <= self.n:
+            return {sentence: [0]}, 1
+
+        # imported here not to load NumPy for searching
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        codes = np.frombuffer(sentence.encode('utf-32-le', 'surrogatepass'), dtype='<u4')
+        length = len(codes) - self.n + 1
+        keys: np.ndarray
+        if self.n * _CODE_POINT_BITS <= 64:
+            # an n-gram is packed into an integer
+            keys = codes[:length].astype(np.uint64)
+            for i in range(1, self.n):
+                keys <<= np.uint64(_CODE_POINT_BITS)
+                keys |= codes[i:i+length]
+        else:
+            # an n-gram is compared as raw bytes
+            # as_strided instead of sliding_window_view, which needs NumPy 1.20
+            windows = np.lib.stride_tricks.as_strided(
+                codes, shape=(length, self.n), strides=(codes.itemsize, codes.itemsize),
+                writeable=False)
+            keys = np.ascontiguousarray(windows).view(np.dtype((np.void, 4 * self.n))).ravel()
+
+        order = np.argsort(keys, kind='stable')  # positions of an n-gram stay sorted
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+        positions: List[int] = order.tolist()
+        bounds: List[int] = [0, *starts.tolist(), length]
+        index = {sentence[positions[start]:positions[start]+self.n]: positions[start:end]
+                 for start, end in zip(bounds, bounds[1:])}
+        return index, length
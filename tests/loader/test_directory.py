@@ -1,3 +1,63 @@
 # -*- coding: utf-8 -*-
 """Testing directory module.
 """
+import os
+import tempfile
+import types
+
+import pytest
+
+from dzo.annot import Document
+from dzo.loader import DirectoryLoader
+
+
+contents = {
+    'b.txt': 'いろはにほへと\n',
+    'a.md': 'ちりぬるを\n',
+    'sub/c.txt': 'わかよたれそ\n',
+    '.hidden/d.txt': 'つねならむ\n',
+}
+
+
+def _make_corpus(target_dir: str) -> None:
+    for name, content in contents.items():
+        p = os.path.join(target_dir, name)
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        with open(p, mode='w') as fp:
+            fp.write(content)
+    with open(os.path.join(target_dir, 'e.bin'), mode='wb') as fp:
+        fp.write(b'\x80\x81\x82')
+
+
+def test_DirectoryLoader_iter_documents() -> None:
+    """Test for DirectoryLoader().iter_documents() method.
+    """
+    with tempfile.TemporaryDirectory() as tp:
+        # should raise FileNotFoundError.
+        with pytest.raises(FileNotFoundError):
+            DirectoryLoader(os.path.join(tp, 'missing'))
+        with pytest.raises(FileNotFoundError):
+            list(DirectoryLoader(tp).iter_documents())
+
+        _make_corpus(tp)
+        loader = DirectoryLoader(tp)
+
+        # should be a generator.
+        docs = loader.iter_documents()
+        assert isinstance(docs, types.GeneratorType)
+
+        # should yield documents in sorted order, skipping hidden and binary files.
+        got = list(docs)
+        want = [
+            Document(os.path.join(tp, 'a.md'), 'ちりぬるを'),
+            Document(os.path.join(tp, 'b.txt'), 'いろはにほへと'),
+            Document(os.path.join(tp, 'sub', 'c.txt'), 'わかよたれそ'),
+        ]
+        assert got == want
+
+        # should ignore files by extensions.
+        got = list(loader.iter_documents(ignored_exts={'.md', '.bin'}))
+        assert [doc.name for doc in got] == [want[1].name, want[2].name]
+
+        # should be the same as the one loaded at once.
+        assert loader.load() == want
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Testing async_engine module.
+"""
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from typing import Iterator, List
+
+import pytest
+
+from dzo.async_engine import AsyncEngine
+from dzo.engine import Engine
+from dzo.loader import DirectoryLoader
+from dzo.preprocess import Preprocessor
+from dzo.ranking import ScoredDoc
+from dzo.tokenizer import NGramTokenizer
+
+
+@pytest.fixture(name='engine')
+def fixture_engine() -> Iterator[Engine]:
+    """Load an engine of an n-gram index of a few documents.
+    """
+    contents = {
+        'a.txt': 'order 1234 shipped',
+        'b.txt': 'order abc shipped',
+        'c.txt': 'invoice 5678 paid',
+    }
+    with tempfile.TemporaryDirectory() as tp:
+        target_dir = os.path.join(tp, 'docs')
+        os.makedirs(target_dir)
+        for name, content in contents.items():
+            with open(os.path.join(target_dir, name), mode='w') as fp:
+                fp.write(content)
+        index_path = os.path.join(tp, 'index.dzo')
+        preprocessor = Preprocessor(DirectoryLoader(target_dir), NGramTokenizer(n=3))
+        preprocessor.build(index_path)
+        engine = Engine(index_path)
+        yield engine
+        engine.close()
+
+
+def test_AsyncEngine(engine: Engine) -> None:
+    """Test for async_engine.AsyncEngine class.
+    """
+    # should raise ValueError.
+    with pytest.raises(ValueError):
+        AsyncEngine(engine, max_workers=0)
+    with pytest.raises(ValueError):
+        AsyncEngine(engine, max_concurrency=0)
+
+    want = (
+        engine.search('shipped'),
+        engine.rank('shipped', 2),
+        engine.query('order AND NOT abc'),
+        engine.regexp(r'\d{4}'),
+    )
+
+    async def main() -> tuple:
+        async with AsyncEngine(engine, max_workers=1) as aengine:
+            return await asyncio.gather(
+                aengine.search('shipped'),
+                aengine.rank('shipped', 2),
+                aengine.query('order AND NOT abc'),
+                aengine.regexp(r'\d{4}'),
+            )
+
+    # should return the same results as Engine.
+    assert tuple(asyncio.run(main())) == want
+
+
+def test_AsyncEngine_timeout(engine: Engine) -> None:
+    """Test for async_engine.AsyncEngine class with timeouts and cancellation.
+    """
+    started = threading.Event()
+    unblock = threading.Event()
+    calls: List[str] = []
+
+    def rank(query: str, k: int = 10) -> List[ScoredDoc]:
+        calls.append(query)
+        if query == 'slow':
+            started.set()
+            unblock.wait(10)
+        return [ScoredDoc(query, float(k))]
+
+    engine.rank = rank  # type: ignore
+
+    async def main() -> None:
+        aengine = AsyncEngine(engine, max_workers=1, max_concurrency=2)
+        slow = asyncio.ensure_future(aengine.rank('slow'))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 10)
+
+        # should not block the event loop while a query is running.
+        await asyncio.sleep(0)
+
+        # should time out a query waiting for a worker, and drop it.
+        with pytest.raises(asyncio.TimeoutError):
+            await aengine.rank('queued', timeout=0.05)
+
+        # should drop a cancelled query which has not started.
+        cancelled = asyncio.ensure_future(aengine.rank('cancelled'))
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+
+        # should time out a query waiting for a slot.
+        blocker = asyncio.ensure_future(aengine.rank('blocker'))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await aengine.rank('limited', timeout=0.05)
+
+        unblock.set()
+        assert await slow == [ScoredDoc('slow', 10.0)]
+        assert await blocker == [ScoredDoc('blocker', 10.0)]
+        assert await aengine.rank('fast', 1) == [ScoredDoc('fast', 1.0)]
+        await aengine.close()
+
+    asyncio.run(main())
+    assert calls == ['slow', 'blocker', 'fast']
+
+
+def test_AsyncEngine_close(engine: Engine) -> None:
+    """Test for async_engine.AsyncEngine().close() method.
+    """
+    started = threading.Event()
+    calls: List[str] = []
+
+    def rank(query: str, k: int = 10) -> List[ScoredDoc]:
+        calls.append(query)
+        if query == 'slow':
+            started.set()
+            time.sleep(0.1)
+        return [ScoredDoc(query, float(k))]
+
+    engine.rank = rank  # type: ignore
+
+    async def main() -> None:
+        aengine = AsyncEngine(engine, max_workers=1)
+        slow = asyncio.ensure_future(aengine.rank('slow'))
+        queued = asyncio.ensure_future(aengine.rank('queued'))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 10)
+
+        # should wait for a running query, and drop queued ones.
+        await aengine.close()
+        assert await slow == [ScoredDoc('slow', 10.0)]
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+    asyncio.run(main())
+    assert calls == ['slow']
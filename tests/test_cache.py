@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Testing cache module.
+"""
+import os
+import tempfile
+
+import pytest
+
+from dzo import indexer
+from dzo.cache import CachedReader, CacheStats, LRUCache
+from dzo.storage import IndexReader, write_index
+
+
+def test_LRUCache() -> None:
+    """Test for cache.LRUCache class.
+    """
+    # should raise ValueError.
+    with pytest.raises(ValueError):
+        LRUCache(-1)
+
+    cache: LRUCache[list] = LRUCache(2)
+    cache.put('a', [1])
+    cache.put('b', [2])
+
+    # should evict the least recently used entry.
+    assert cache.get('a') == [1]
+    cache.put('c', [3])
+    assert cache.get('b') is None
+    assert cache.get('a') == [1]
+    assert cache.get('c') == [3]
+
+    # should count hits and misses.
+    assert cache.stats() == CacheStats(hits=3, misses=1, size=2, max_size=2)
+
+    # should remove entries, keeping the counters.
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get('a') is None
+    assert cache.stats() == CacheStats(hits=3, misses=2, size=0, max_size=2)
+
+    # should cache nothing when disabled.
+    cache = LRUCache(0)
+    cache.put('a', [1])
+    assert cache.get('a') is None
+
+
+def test_LRUCache_size_of() -> None:
+    """Test for cache.LRUCache class with sizes of values.
+    """
+    cache: LRUCache[str] = LRUCache(10, size_of=len)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'yyyy')
+
+    # should evict entries until the total size fits.
+    cache.put('c', 'zzzz')
+    assert cache.get('a') is None
+    assert cache.stats().size == 8
+
+    # should not cache a value larger than the max size.
+    cache.put('d', 'w' * 11)
+    assert cache.get('d') is None
+    assert cache.get('b') == 'yyyy'
+
+
+def test_CachedReader() -> None:
+    """Test for cache.CachedReader class.
+    """
+    idx = indexer.Indexer()
+    idx.add('first', ['すもも', 'も', 'もも', 'も', 'もも', 'の', 'うち'])
+    idx.add('second', ['もも', 'くり', 'さんねん', 'かき', 'はちねん'])
+    with tempfile.TemporaryDirectory() as tp:
+        p = os.path.join(tp, 'index.dzo')
+        write_index(p, 'NGramTokenizer', '0.0.7', idx.corpus())
+
+        reader = CachedReader(IndexReader(p), budget=1024)
+        try:
+            # should return the same decoded postings.
+            plist = reader.get('もも')
+            assert plist is not None
+            assert reader.get('もも') is plist
+            assert reader.get('なし') is None
+            stats = reader.cache_stats()
+            assert (stats.hits, stats.size) == (1, plist.nbytes())
+
+            # should delegate to the reader.
+            assert reader.num_docs == 2
+            assert reader.doc(1).name == 'second'
+            assert reader.df('も') == 1
+        finally:
+            reader.close()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Testing codec module.
+"""
+from array import array
+from typing import List
+
+import pytest
+
+from dzo import codec
+from dzo.codec import PostingList
+
+
+def test_varint() -> None:
+    """Test for codec.encode_varint() and codec.decode_varints() functions.
+    """
+    values = [0, 1, 127, 128, 300, 16383, 16384, 2 ** 32 - 1]
+    buf = bytearray()
+    for value in values:
+        codec.encode_varint(value, buf)
+
+    # should be encoded in variable bytes.
+    assert len(buf) == 1 + 1 + 1 + 2 + 2 + 2 + 3 + 5
+
+    # should be decoded in the same order.
+    got, offset = codec.decode_varints(bytes(buf), 0, len(values))
+    assert got == values
+    assert offset == len(buf)
+
+
+def test_PostingList() -> None:
+    """Test for codec.PostingList class.
+    """
+    postings = {3: [5, 6, 100], 0: [2, 4], 1000: [0]}
+    buf = codec.encode_postings(postings)
+    plist = PostingList.decode(buf)
+
+    # should be sorted by document ID.
+    assert len(plist) == 3
+    assert list(plist.doc_ids) == [0, 3, 1000]
+    assert list(plist.tfs) == [2, 3, 1]
+
+    # should decode positions on access.
+    assert list(plist.positions(1)) == [5, 6, 100]
+    assert plist.to_dict() == {0: [2, 4], 3: [5, 6, 100], 1000: [0]}
+
+    # should decode positions of any document first.
+    plist = PostingList.decode(buf)
+    assert list(plist.positions(2)) == [0]
+    assert list(plist.positions(0)) == [2, 4]
+
+    # should be able to decode an empty postings list.
+    plist = PostingList.decode(codec.encode_postings({}))
+    assert len(plist) == 0
+    assert plist.to_dict() == {}
+
+
+def test_PostingList_join() -> None:
+    """Test for codec.PostingList.join() method.
+    """
+    first = PostingList.decode(codec.encode_postings({0: [1], 2: [3, 4]}))
+    second = PostingList.decode(codec.encode_postings({0: [5], 1: [6]}))
+    plist = PostingList.join([(first, 0, set()), (second, 3, {1})])
+
+    # should shift document IDs by the bases, and drop deleted documents.
+    assert list(plist.doc_ids) == [0, 2, 3]
+    assert list(plist.tfs) == [1, 2, 1]
+
+    # should keep positions of the joined documents.
+    assert plist.to_dict() == {0: [1], 2: [3, 4], 3: [5]}
+
+
+def test_PostingList_positions() -> None:
+    """Test for codec.PostingList().positions() method.
+    """
+    loaded: List[int] = []
+
+    def load(i: int) -> 'array[int]':
+        loaded.append(i)
+        return array('I', [i])
+
+    plist = PostingList(array('I', [0, 5, 9]), array('I', [1, 1, 1]), loader=load)
+
+    # should decode positions of the accessed documents only, at most once.
+    assert list(plist.positions(1)) == [1]
+    assert list(plist.positions(1)) == [1]
+    assert loaded == [1]
+    assert plist.to_dict() == {0: [0], 5: [1], 9: [2]}
+    assert loaded == [1, 0, 2]
+
+
+def test_concat_postings() -> None:
+    """Test for codec.concat_postings() function.
+    """
+    first = {0: [1, 4], 3: [2]}
+    second = {5: [0, 7, 9], 130: [300]}
+    third = {200: [1]}
+
+    # should be the same as the postings list encoded at once.
+    bufs = [codec.encode_postings(p) for p in (first, {}, second, third)]
+    got = codec.concat_postings(bufs)
+    assert got == codec.encode_postings({**first, **second, **third})
+
+    # should raise ValueError if document IDs are not increasing.
+    with pytest.raises(ValueError):
+        codec.concat_postings([codec.encode_postings(second), codec.encode_postings(first)])
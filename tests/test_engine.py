@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""Testing engine module.
+"""
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import pytest
+
+from dzo.annot import Document
+from dzo.engine import Engine, _TokenizerPool
+from dzo.segment import SegmentedIndex
+from dzo.tokenizer import NGramTokenizer, WhitespaceTokenizer
+
+
+def test_Engine_threads() -> None:
+    """Test for Engine class called from many threads.
+    """
+    tokenizer = NGramTokenizer(n=3)
+    with tempfile.TemporaryDirectory() as tp:
+        index_dir = os.path.join(tp, 'index')
+        with SegmentedIndex(index_dir, tokenizer) as index:
+            index.add([Document(str(i), f'すもも{i} もものうち') for i in range(50)])
+        engine = Engine(index_dir, cache_size=0, postings_cache_size=1024)
+        want = engine.query('すもも AND ものう')
+        assert len(want) == 50
+        stop = threading.Event()
+
+        def write() -> None:
+            # documents are added to and deleted from the index meanwhile
+            with SegmentedIndex(index_dir, tokenizer, merge_factor=3) as index:
+                i = 0
+                while not stop.is_set():
+                    index.add([Document(f'x{i}', 'かきくけ')])
+                    index.delete([f'x{i}'])
+                    index.merge()
+                    i += 1
+
+        def search(_: int) -> List[str]:
+            return engine.query('すもも AND ものう')
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            with ThreadPoolExecutor(8) as executor:
+                results = list(executor.map(search, range(1000)))
+        finally:
+            stop.set()
+            writer.join()
+
+        # should return the same results from all of the threads.
+        assert all(r == want for r in results)
+
+        # should pick up the changes.
+        assert engine.query('かきく') == []
+        with SegmentedIndex(index_dir, tokenizer) as index:
+            index.add([Document('y', 'かきくけ')])
+        assert engine.query('かきく') == ['y']
+        assert engine.query('すもも') == want
+        engine.close()
+
+
+def test_Engine_tokenizer_params() -> None:
+    """Test for Engine class with tokenizer parameters saved in the index.
+    """
+    with tempfile.TemporaryDirectory() as tp:
+        index_dir = os.path.join(tp, 'index')
+        with SegmentedIndex(index_dir, NGramTokenizer(n=2)) as index:
+            index.add([Document('first', 'すもももももももものうち'), Document('second', 'かき')])
+
+        # should tokenize queries into bigrams as the index.
+        engine = Engine(index_dir)
+        assert engine.query('すもも') == ['first']
+        assert [r.name for r in engine.rank('すもも')] == ['first']
+        engine.close()
+
+
+def test_Engine_cache() -> None:
+    """Test for the search result cache of Engine class.
+    """
+    with tempfile.TemporaryDirectory() as tp:
+        index_dir = os.path.join(tp, 'index')
+        with SegmentedIndex(index_dir, NGramTokenizer(n=2)) as index:
+            index.add([Document('first', 'もも くり'), Document('second', 'くり かき')])
+        engine = Engine(index_dir)
+        # a tokenizer which drops redundant spaces from queries
+        engine._tokenizers = _TokenizerPool(WhitespaceTokenizer)  # pylint: disable=protected-access
+
+        # should share results of queries with the same tokens.
+        results = engine.search('もも くり')
+        assert engine.search('  もも   くり ') == results
+        ranked = engine.rank('もも くり', k=2)
+        assert engine.rank(' もも くり', k=2) == ranked
+        assert engine.cache_stats().hits == 2
+        assert engine.cache_stats().size == 2
+        engine.close()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='os.fork() is not available')
+def test_Engine_fork() -> None:
+    """Test for Engine class used by forked processes.
+    """
+    tokenizer = NGramTokenizer(n=2)
+    with tempfile.TemporaryDirectory() as tp:
+        index_dir = os.path.join(tp, 'index')
+        with SegmentedIndex(index_dir, tokenizer) as index:
+            index.add([Document(str(i), f'すもも{i} もものうち') for i in range(5)])
+        engine = Engine(index_dir, preload=True)
+        want = engine.query('すもも AND うち')
+        assert engine.cache_stats().size == 1
+
+        # should start with empty caches and new locks, even if another thread
+        # of the parent holds a lock.
+        with engine._results._lock:  # pylint: disable=protected-access
+            pid = os.fork()
+            if pid == 0:
+                ok = engine.cache_stats().size == 0 and \
+                     engine.postings_cache_stats().size == 0 and \
+                     engine.query('すもも AND うち') == want
+                os._exit(0 if ok else 1)  # pylint: disable=protected-access
+        _, status = os.waitpid(pid, 0)
+        assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+
+        # should keep the caches of the parent.
+        assert engine.cache_stats().size == 1
+        engine.close()
@@ -79,14 +79,72 @@ def test_Indexer_make_inv_index() -> None:
     }
     got = Indexer.make_inv_index(full_idx)
     want: indexer.InvIndex = {
-        'すもも': {'first': [0]},
-        'も': {'first': [1, 3]},
-        'もも': {'first': [2, 4], 'second': [0]},
-        'の': {'first': [5]},
-        'うち': {'first': [6]},
-        'くり': {'second': [1]},
-        'さんねん': {'second': [2]},
-        'かき': {'second': [3]},
-        'はちねん': {'second': [4]},
+        'すもも': {0: [0]},
+        'も': {0: [1, 3]},
+        'もも': {0: [2, 4], 1: [0]},
+        'の': {0: [5]},
+        'うち': {0: [6]},
+        'くり': {1: [1]},
+        'さんねん': {1: [2]},
+        'かき': {1: [3]},
+        'はちねん': {1: [4]},
     }
     assert got == want
+
+def test_Indexer_make_doc_table() -> None:
+    """Test for Indexer.make_doc_table() static method.
+    """
+    full_idx: indexer.FullIndex = {
+        'first': {
+            'すもも': [0],
+            'も': [1, 3],
+            'もも': [2, 4],
+            'の': [5],
+            'うち': [6],
+        },
+        'second': {
+            'もも': [0],
+            'くり': [1],
+            'さんねん': [2],
+            'かき': [3],
+            'はちねん': [4],
+        },
+    }
+    got = Indexer.make_doc_table(full_idx)
+    want: indexer.DocTable = [
+        indexer.DocInfo('first', 7),
+        indexer.DocInfo('second', 5),
+    ]
+    assert got == want
+
+def test_Indexer_add() -> None:
+    """Test for Indexer().add() method.
+    """
+    idx = Indexer()
+    assert len(idx) == 0
+
+    # should assign dense document IDs.
+    assert idx.add('first', ['すもも', 'も', 'もも', 'も', 'もも', 'の', 'うち']) == 0
+    assert idx.add('second', ['もも', 'くり', 'さんねん', 'かき', 'はちねん']) == 1
+    assert len(idx) == 2
+
+    # should be the same as the one made from a full index.
+    full_idx = Indexer.merge([
+        indexer.NamedIndex('first', {
+            'すもも': [0],
+            'も': [1, 3],
+            'もも': [2, 4],
+            'の': [5],
+            'うち': [6],
+        }),
+        indexer.NamedIndex('second', {
+            'もも': [0],
+            'くり': [1],
+            'さんねん': [2],
+            'かき': [3],
+            'はちねん': [4],
+        }),
+    ])
+    got = idx.corpus()
+    assert got.inv_index == Indexer.make_inv_index(full_idx)
+    assert got.doc_table == Indexer.make_doc_table(full_idx)
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""Testing preprocess module.
+"""
+import os
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from dzo.annot import Document
+from dzo.loader import DirectoryLoader
+from dzo.manifest import Manifest, manifest_path
+from dzo.preprocess import Preprocessor
+from dzo.storage import IndexReader
+from dzo.tokenizer import NGramTokenizer
+
+
+contents = {
+    'a.txt': '吾輩は猫である。名前はまだ無い。',
+    'b.txt': 'どこで生れたかとんと見当がつかぬ。',
+    'sub/c.txt': '何でも薄暗いじめじめした所でニャーニャー泣いていた事だけは記憶している。',
+    'sub/d.txt': '吾輩はここで始めて人間というものを見た。',
+}
+
+
+def _make_corpus(target_dir: str) -> None:
+    for name, content in contents.items():
+        p = os.path.join(target_dir, name)
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        with open(p, mode='w') as fp:
+            fp.write(content)
+
+
+def test_Preprocessor_workers() -> None:
+    """Test for Preprocessor class with worker processes.
+    """
+    with tempfile.TemporaryDirectory() as tp:
+        _make_corpus(tp)
+        loader = DirectoryLoader(tp)
+
+        # should raise ValueError.
+        with pytest.raises(ValueError):
+            Preprocessor(loader, NGramTokenizer(n=3), workers=0)
+
+        # should be identical to the serial one.
+        want = Preprocessor(loader, NGramTokenizer(n=3)).preprocess()
+        got = Preprocessor(loader, NGramTokenizer(n=3), workers=2).preprocess()
+        assert got == want
+        assert len(got.doc_table) == len(contents)
+
+
+def test_Preprocessor_build() -> None:
+    """Test for Preprocessor().build() method.
+    """
+    with tempfile.TemporaryDirectory() as tp:
+        target_dir = os.path.join(tp, 'target')
+        _make_corpus(target_dir)
+        loader = DirectoryLoader(target_dir)
+
+        # should write the same index file whether it spills or not.
+        want_path = os.path.join(tp, 'want.dzo')
+        Preprocessor(loader, NGramTokenizer(n=3)).build(want_path)
+        got_path = os.path.join(tp, 'got.dzo')
+        Preprocessor(loader, NGramTokenizer(n=3), memory_budget=1, workers=2).build(got_path)
+        with open(want_path, mode='rb') as want, open(got_path, mode='rb') as got:
+            assert got.read() == want.read()
+
+        # should not overwrite an existing index.
+        with pytest.raises(FileExistsError):
+            Preprocessor(loader, NGramTokenizer(n=3)).build(want_path)
+
+
+def _read_postings(index_path: str) -> Dict[str, Dict[str, List[int]]]:
+    """Read an index file as a mapping from terms to document names to positions.
+    """
+    with IndexReader(index_path) as reader:
+        return {term: {reader.doc(doc_id).name: list(positions)
+                       for doc_id, positions in reader.get(term).items()}
+                for term in reader.terms()}
+
+
+def test_Preprocessor_update() -> None:
+    """Test for Preprocessor().update() method.
+    """
+    with tempfile.TemporaryDirectory() as tp:
+        target_dir = os.path.join(tp, 'target')
+        _make_corpus(target_dir)
+        loader = DirectoryLoader(target_dir)
+        index_path = os.path.join(tp, 'index.dzo')
+
+        # should build the whole index with its manifest.
+        Preprocessor(loader, NGramTokenizer(n=3)).update(index_path)
+        assert os.path.exists(manifest_path(index_path))
+        assert Manifest.load(manifest_path(index_path)).files.keys() == {
+            os.path.join(target_dir, name) for name in contents.keys()}
+
+        # add, change, touch and delete files.
+        with open(os.path.join(target_dir, 'e.txt'), mode='w') as fp:
+            fp.write('名前はまだつけてくれないが')
+        with open(os.path.join(target_dir, 'a.txt'), mode='w') as fp:
+            fp.write('吾輩は猫である。名前はもうある。')
+        os.utime(os.path.join(target_dir, 'b.txt'), ns=(0, 0))
+        os.remove(os.path.join(target_dir, 'sub/c.txt'))
+
+        # should be the same as the one built from scratch.
+        Preprocessor(loader, NGramTokenizer(n=3), memory_budget=1).update(index_path)
+        want_path = os.path.join(tp, 'want.dzo')
+        Preprocessor(loader, NGramTokenizer(n=3)).build(want_path)
+        assert _read_postings(index_path) == _read_postings(want_path)
+        assert not os.path.exists(f'{index_path}.tmp')
+
+        # should be unchanged without any modification.
+        with open(index_path, mode='rb') as fp:
+            want = fp.read()
+        Preprocessor(loader, NGramTokenizer(n=3)).update(index_path)
+        with open(index_path, mode='rb') as fp:
+            assert fp.read() == want
+
+        # should not mix n-grams of another tokenizer into the index.
+        with open(os.path.join(target_dir, 'f.txt'), mode='w') as fp:
+            fp.write('おにぎり')
+        with pytest.raises(ValueError):
+            Preprocessor(loader, NGramTokenizer(n=2)).update(index_path)
+        with open(index_path, mode='rb') as fp:
+            assert fp.read() == want
+
+
+class _CountingLoader(DirectoryLoader):
+    """A loader which counts reads of each file.
+    """
+
+    def __init__(self, target_dir: str) -> None:
+        super().__init__(target_dir)
+        self.reads: Dict[str, int] = {}
+
+    def read(self, file_path: str) -> Optional[Document]:  # type: ignore
+        self.reads[file_path] = self.reads.get(file_path, 0) + 1
+        return DirectoryLoader.read(file_path)
+
+
+def test_Preprocessor_update_reads(monkeypatch: Any) -> None:
+    """Test for file reads and failures of Preprocessor().update() method.
+    """
+    with tempfile.TemporaryDirectory() as tp:
+        target_dir = os.path.join(tp, 'target')
+        _make_corpus(target_dir)
+        index_path = os.path.join(tp, 'index.dzo')
+        Preprocessor(DirectoryLoader(target_dir), NGramTokenizer(n=3)).update(index_path)
+
+        # should read a changed file only once.
+        changed = os.path.join(target_dir, 'a.txt')
+        with open(changed, mode='w') as fp:
+            fp.write('吾輩は猫である。名前はもうある。')
+        loader = _CountingLoader(target_dir)
+        Preprocessor(loader, NGramTokenizer(n=3)).update(index_path)
+        assert loader.reads == {changed: 1}
+
+        # should remove the temporary file when the update fails.
+        def write_entries(result_path: str, *args: Any, **kwargs: Any) -> None:
+            with open(result_path, mode='wb') as fp:
+                fp.write(b'partial')
+            raise OSError('disk full')
+
+        monkeypatch.setattr('dzo.preprocess.write_entries', write_entries)
+        with open(changed, mode='w') as fp:
+            fp.write('吾輩は犬である。')
+        with pytest.raises(OSError):
+            Preprocessor(loader, NGramTokenizer(n=3)).update(index_path)
+        assert not os.path.exists(f'{index_path}.tmp')
+        with IndexReader(index_path) as reader:
+            assert reader.num_docs == len(contents)
+
+
+class _WritingLoader(DirectoryLoader):
+    """A loader which changes a file right after reading it.
+    """
+
+    def __init__(self, target_dir: str, changed: str, content: str) -> None:
+        super().__init__(target_dir)
+        self.changed = changed
+        self.content = content
+
+    def read(self, file_path: str) -> Optional[Document]:  # type: ignore
+        doc = DirectoryLoader.read(file_path)
+        if file_path == self.changed:
+            with open(file_path, mode='w') as fp:
+                fp.write(self.content)
+        return doc
+
+
+def test_Preprocessor_update_changes() -> None:
+    """Test for Preprocessor().update() method with files changed while it runs.
+    """
+    with tempfile.TemporaryDirectory() as tp:
+        target_dir = os.path.join(tp, 'target')
+        _make_corpus(target_dir)
+        index_path = os.path.join(tp, 'index.dzo')
+        Preprocessor(DirectoryLoader(target_dir), NGramTokenizer(n=3)).update(index_path)
+
+        # should read a file changed while it is read again by the next run.
+        changed = os.path.join(target_dir, 'a.txt')
+        with open(changed, mode='w') as fp:
+            fp.write('吾輩は犬である。')
+        loader = _WritingLoader(target_dir, changed, '吾輩は猫である。名前はもうある。')
+        Preprocessor(loader, NGramTokenizer(n=3)).update(index_path)
+        Preprocessor(DirectoryLoader(target_dir), NGramTokenizer(n=3)).update(index_path)
+        want_path = os.path.join(tp, 'want.dzo')
+        Preprocessor(DirectoryLoader(target_dir), NGramTokenizer(n=3)).build(want_path)
+        assert _read_postings(index_path) == _read_postings(want_path)
+
+        # should keep the index if the directory is empty.
+        for name in contents:
+            os.remove(os.path.join(target_dir, name))
+        with pytest.raises(FileNotFoundError):
+            Preprocessor(DirectoryLoader(target_dir), NGramTokenizer(n=3)).update(index_path)
+        assert not os.path.exists(f'{index_path}.tmp')
+        assert _read_postings(index_path) == _read_postings(want_path)
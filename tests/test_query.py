@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""Testing query module.
+"""
+import os
+import tempfile
+
+import pytest
+
+from dzo import indexer
+from dzo.query import (And, Evaluator, Near, Not, Or, QuerySyntaxError, Term, cover_ngrams,
+                       difference, gallop, intersect, parse, union)
+from dzo.storage import IndexReader, write_index
+from dzo.tokenizer import NGramTokenizer, WhitespaceTokenizer
+
+
+def test_parse() -> None:
+    """Test for query.parse() function.
+    """
+    # should bind NOT tighter than AND, and AND tighter than OR.
+    assert parse('a OR b c') == Or((Term('a'), And((Term('b'), Term('c')))))
+    assert parse('NOT a AND b') == And((Not(Term('a')), Term('b')))
+    assert parse('(a OR b) AND c') == And((Or((Term('a'), Term('b'))), Term('c')))
+
+    # should keep a quoted string as a term.
+    assert parse('"a OR b"') == Term('a OR b')
+
+    # should bind NEAR tighter than NOT.
+    assert parse('NOT a NEAR/2 "b c"') == Not(Near(Term('a'), Term('b c'), 2))
+
+    # should raise QuerySyntaxError.
+    for query in ['', 'a AND', '(a OR b', 'a)', '"a', 'NOT', 'a NEAR/1 (b OR c)']:
+        with pytest.raises(QuerySyntaxError):
+            parse(query)
+
+
+def test_gallop() -> None:
+    """Test for query.gallop() function and sorted list operations.
+    """
+    doc_ids = [1, 3, 5, 7, 9, 11, 13, 15, 17]
+
+    # should find the leftmost position of a target at or after lo.
+    for target in range(20):
+        for lo in range(len(doc_ids)):
+            want = max(sum(1 for d in doc_ids if d < target), lo)
+            assert gallop(doc_ids, target, lo) == want
+
+    assert list(intersect([0, 3, 4, 17, 18], doc_ids)) == [3, 17]
+    assert list(difference([0, 3, 4, 17, 18], doc_ids)) == [0, 4, 18]
+    assert list(union([[0, 3], doc_ids[:3], []])) == [0, 1, 3, 5]
+
+
+def test_Evaluator() -> None:
+    """Test for query.Evaluator class.
+    """
+    tokenizer = WhitespaceTokenizer()
+    idx = indexer.Indexer()
+    for i, content in enumerate(['apple banana', 'banana cherry', 'cherry apple', 'durian']):
+        idx.add(str(i), [t.normalized for t in tokenizer.tokenize(content)])
+    with tempfile.TemporaryDirectory() as tp:
+        p = os.path.join(tp, 'index.dzo')
+        write_index(p, 'WhitespaceTokenizer', '0.0.7', idx.corpus())
+
+        with IndexReader(p) as reader:
+            evaluator = Evaluator(reader, tokenizer)
+
+            def evaluate(query: str) -> list:
+                return list(evaluator.evaluate(parse(query)))
+
+            # should evaluate AND, OR, NOT and parentheses.
+            assert evaluate('apple banana') == [0]
+            assert evaluate('apple OR durian') == [0, 2, 3]
+            assert evaluate('cherry AND NOT apple') == [1]
+            assert evaluate('NOT (apple OR banana)') == [3]
+            assert evaluate('(apple OR durian) AND NOT cherry') == [0, 3]
+
+            # should match tokens of a quoted string at consecutive positions.
+            assert evaluate('"apple cherry"') == []
+            assert evaluate('"cherry apple"') == [2]
+            assert evaluate('"banana cherry" OR "apple banana"') == [0, 1]
+
+            # should match words within the distance in either order.
+            assert evaluate('apple NEAR/0 cherry') == [2]
+            assert evaluate('banana NEAR/0 durian') == []
+
+            # should return nothing for unknown terms.
+            assert evaluate('apple AND unknown') == []
+            assert evaluate('unknown OR durian') == [3]
+
+
+def test_Evaluator_matches() -> None:
+    """Test for query.Evaluator().matches() method with an n-gram index.
+    """
+    tokenizer = NGramTokenizer(n=2)
+    idx = indexer.Indexer()
+    for i, content in enumerate(['すもももももももものうち', 'ももとすもも', 'うちのすもも']):
+        idx.add(str(i), [t.normalized for t in tokenizer.tokenize(content)])
+    with tempfile.TemporaryDirectory() as tp:
+        p = os.path.join(tp, 'index.dzo')
+        write_index(p, 'NGramTokenizer', '0.0.7', idx.corpus())
+
+        with IndexReader(p) as reader:
+            evaluator = Evaluator(reader, tokenizer)
+
+            # should find substrings with their start positions.
+            matches = evaluator.matches('すもも')
+            assert {doc_id: list(starts) for doc_id, starts in matches.items()} == {0: [0], 1: [3], 2: [3]}
+            assert list(evaluator.matches('ももも')[0]) == [1, 2, 3, 4, 5, 6]
+
+            # should not match n-grams at other positions.
+            assert list(evaluator.evaluate(parse('ものうち'))) == [0]
+            assert list(evaluator.evaluate(parse('のすもも'))) == [2]
+            assert list(evaluator.evaluate(parse('ものすもも'))) == []
+
+            # should limit matches to the candidates.
+            assert list(evaluator.matches('もも', [1, 2])) == [1, 2]
+
+            # should match words within the distance.
+            assert list(evaluator.evaluate(parse('すもも NEAR/1 うち'))) == []
+            assert list(evaluator.evaluate(parse('すもも NEAR/2 うち'))) == [2]
+            assert list(evaluator.evaluate(parse('すもも NEAR/8 うち'))) == [0, 2]
+
+
+def test_cover_ngrams() -> None:
+    """Test for query.cover_ngrams() function.
+    """
+    for n in range(1, 5):
+        for dfs in [[3] * 20, [5, 1, 5, 5, 0, 5, 2, 5], [7], [2, 1]]:
+            offsets = cover_ngrams(dfs, n)
+
+            # should cover every character with the selected n-grams.
+            covered = {i for offset in offsets for i in range(offset, offset + n)}
+            assert covered == set(range(len(dfs) + n - 1))
+            assert offsets == sorted(set(offsets))
+
+    # should select far fewer n-grams than the whole string has.
+    assert len(cover_ngrams([3] * 30, 3)) == 11
+
+    # should prefer rare n-grams.
+    assert cover_ngrams([5, 1, 5, 5, 1, 5, 5], 3) == [0, 1, 4, 6]
+
+
+def test_Evaluator_plan() -> None:
+    """Test for query.Evaluator().plan() method against brute force search.
+    """
+    tokenizer = NGramTokenizer(n=3)
+    contents = ['あいうえおかきくけこあいうえお', 'かきくけこさしすせそ', 'あいうえおかきくけこさしすせそ']
+    idx = indexer.Indexer()
+    for i, content in enumerate(contents):
+        idx.add(str(i), [t.normalized for t in tokenizer.tokenize(content)])
+    with tempfile.TemporaryDirectory() as tp:
+        p = os.path.join(tp, 'index.dzo')
+        write_index(p, 'NGramTokenizer', '0.0.7', idx.corpus())
+
+        with IndexReader(p) as reader:
+            evaluator = Evaluator(reader, tokenizer)
+
+            # should look up fewer n-grams than the query has.
+            query = 'あいうえおかきくけこさしす'
+            assert len(evaluator.plan(query)) < len(tokenizer.tokenize(query))
+
+            # should look up only an unknown n-gram if any.
+            assert evaluator.plan('あいうえおんかきくけこ') == [(3, 'えおん')]
+
+            # should find the same occurrences as substring search.
+            for query in ['あいうえおかきくけこさしす', 'うえおかきくけこあい', 'けこさしすせ',
+                          'くけこあいうえお', 'えおかきくけこさ']:
+                want = {}
+                for doc_id, content in enumerate(contents):
+                    starts = [i for i in range(len(content)) if content.startswith(query, i)]
+                    if starts:
+                        want[doc_id] = starts
+                got = evaluator.matches(query)
+                assert {doc_id: list(starts) for doc_id, starts in got.items()} == want
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Testing ranking module.
+"""
+import os
+import random
+import tempfile
+
+import pytest
+
+from dzo import indexer
+from dzo.ranking import BM25, rank_bm25, top_k
+from dzo.storage import IndexReader, write_index
+
+
+def test_BM25() -> None:
+    """Test for ranking.BM25 class.
+    """
+    # should raise ValueError.
+    with pytest.raises(ValueError):
+        BM25(b=1.5)
+
+    bm25 = BM25(k1=1.2, b=0.75)
+
+    # should give a rare term a higher idf, which is always positive.
+    assert bm25.idf(10, 1) > bm25.idf(10, 5) > bm25.idf(10, 10) > 0
+
+    # should saturate term frequencies, and penalize long documents.
+    assert bm25.score(2, 10, 10.0, 1.0) > bm25.score(1, 10, 10.0, 1.0)
+    assert bm25.score(2, 10, 10.0, 1.0) < 2 * bm25.score(1, 10, 10.0, 1.0)
+    assert bm25.score(1, 20, 10.0, 1.0) < bm25.score(1, 5, 10.0, 1.0)
+
+
+def test_top_k() -> None:
+    """Test for ranking.top_k() function.
+    """
+    scores = {0: 1.0, 1: 3.0, 2: 2.0, 3: 3.0}
+
+    # should select the highest scores, breaking ties by document ID.
+    assert top_k(scores, 3) == [(1, 3.0), (3, 3.0), (2, 2.0)]
+    assert top_k(scores, 10) == [(1, 3.0), (3, 3.0), (2, 2.0), (0, 1.0)]
+    assert top_k(scores, 0) == []
+
+
+def test_rank_bm25() -> None:
+    """Test for ranking.rank_bm25() function.
+    """
+    idx = indexer.Indexer()
+    idx.add('first', ['すもも', 'も', 'もも', 'も', 'もも', 'の', 'うち'])
+    idx.add('second', ['もも', 'くり', 'さんねん', 'かき', 'はちねん'])
+    idx.add('third', ['くり', 'の', 'き'])
+    with tempfile.TemporaryDirectory() as tp:
+        p = os.path.join(tp, 'index.dzo')
+        write_index(p, 'NGramTokenizer', '0.0.7', idx.corpus())
+
+        with IndexReader(p) as reader:
+            # should rank a document with more occurrences higher.
+            ranked = rank_bm25(reader, ['もも'], k=10)
+            assert [doc_id for doc_id, _ in ranked] == [0, 1]
+
+            # should weight rare terms, and truncate results to k.
+            ranked = rank_bm25(reader, ['の', 'かき'], k=1)
+            assert [doc_id for doc_id, _ in ranked] == [1]
+
+            # should return nothing for unknown terms.
+            assert rank_bm25(reader, ['なし'], k=10) == []
+
+
+def test_rank_bm25_prune() -> None:
+    """Test for ranking.rank_bm25() function with dynamic pruning.
+    """
+    rng = random.Random(0)
+    vocabulary = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h']
+    weights = [50, 30, 20, 10, 5, 3, 2, 1]
+    idx = indexer.Indexer()
+    for i in range(300):
+        length = rng.randint(1, 40)
+        idx.add(str(i), rng.choices(vocabulary, weights, k=length))
+    with tempfile.TemporaryDirectory() as tp:
+        p = os.path.join(tp, 'index.dzo')
+        write_index(p, 'WhitespaceTokenizer', '0.0.7', idx.corpus())
+
+        with IndexReader(p) as reader:
+            # should bound the score of a term in any document.
+            stats = reader.term_stats('h')
+            assert stats is not None
+            assert stats.df == reader.df('h')
+
+            # should select the same documents as scoring all of them.
+            for terms in [['a', 'b'], ['a', 'h'], ['a', 'b', 'c', 'g'], ['h', 'h', 'a'], ['x']]:
+                for k in [1, 10, 500]:
+                    want = rank_bm25(reader, terms, k, prune=False)
+                    got = rank_bm25(reader, terms, k)
+                    assert [doc_id for doc_id, _ in got] == [doc_id for doc_id, _ in want]
+                    assert [s for _, s in got] == pytest.approx([s for _, s in want])
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Testing regexp module.
+"""
+import os
+import re
+import tempfile
+
+from dzo.annot import Document
+from dzo.engine import Engine
+from dzo.loader import DirectoryLoader
+from dzo.preprocess import Preprocessor
+from dzo.query import And, Or, Term
+from dzo.regexp import compile_regexp
+from dzo.segment import SegmentedIndex
+from dzo.tokenizer import NGramTokenizer
+
+
+def test_compile_regexp() -> None:
+    """Test for regexp.compile_regexp() function.
+    """
+    # should look up literal strings.
+    assert compile_regexp('abc', 3) == Term('abc')
+    assert compile_regexp('^abc$', 3) == Term('abc')
+
+    # should expand alternations and small character classes.
+    assert compile_regexp('(abc|de)fg', 3) == Or((Term('abcfg'), Term('defg')))
+    assert compile_regexp('[ab]cd', 3) == Or((Term('acd'), Term('bcd')))
+    assert compile_regexp('x{3}y', 3) == Term('xxxy')
+
+    # should split literals at unknown parts.
+    assert compile_regexp(r'foo\d+bar', 3) == And((Term('foo'), Term('bar')))
+    assert compile_regexp('foo.*ba', 3) == Term('foo')
+
+    # should match all documents when no n-gram is known.
+    assert compile_regexp('ab', 3) is None
+    assert compile_regexp('a.b', 3) is None
+    assert compile_regexp('(?i)abc', 3) is None
+    assert compile_regexp('(abc)*', 3) is None
+
+
+def test_Engine_regexp() -> None:
+    """Test for Engine().regexp() method.
+    """
+    contents = {
+        'a.txt': 'order 1234 shipped',
+        'b.txt': 'order abc shipped',
+        'c.txt': 'invoice 5678 paid',
+        'd.txt': 'order 99 cancelled',
+    }
+    patterns = [r'order \d+ shipped', r'(order|invoice) \d+', 'shipped|paid', r'\d{4}', 'ord.r']
+    with tempfile.TemporaryDirectory() as tp:
+        target_dir = os.path.join(tp, 'docs')
+        os.makedirs(target_dir)
+        for name, content in contents.items():
+            with open(os.path.join(target_dir, name), mode='w') as fp:
+                fp.write(content)
+        index_path = os.path.join(tp, 'index.dzo')
+        preprocessor = Preprocessor(DirectoryLoader(target_dir), NGramTokenizer(n=3))
+        preprocessor.build(index_path)
+
+        engine = Engine(index_path)
+        try:
+            # should find the same documents as matching all of them.
+            for pattern in patterns:
+                want = [os.path.join(target_dir, name) for name, content in contents.items()
+                        if re.search(pattern, content)]
+                assert engine.regexp(pattern) == want
+
+            # should skip documents which cannot be read anymore.
+            os.remove(os.path.join(target_dir, 'a.txt'))
+            os.makedirs(os.path.join(target_dir, 'a.txt'))
+            assert engine.regexp('order') == [os.path.join(target_dir, 'b.txt'),
+                                              os.path.join(target_dir, 'd.txt')]
+        finally:
+            engine.close()
+
+    # should skip documents which are not named by paths.
+    with tempfile.TemporaryDirectory() as tp:
+        index_dir = os.path.join(tp, 'index')
+        with SegmentedIndex(index_dir, NGramTokenizer(n=3)) as index:
+            index.add([Document('order\x00 1', 'order 1'), Document('order 2', 'order 2')])
+        engine = Engine(index_dir)
+        try:
+            assert engine.regexp(r'order \d') == []
+        finally:
+            engine.close()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Testing segment module.
+"""
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from dzo.annot import Document
+from dzo.engine import Engine
+from dzo.query import Evaluator, parse
+from dzo.segment import SegmentedIndex, SegmentedReader
+from dzo.tokenizer import NGramTokenizer, WhitespaceTokenizer
+
+
+def _postings(reader: SegmentedReader, term: str) -> Dict[str, List[int]]:
+    plist = reader.get(term)
+    if plist is None:
+        return {}
+    return {reader.doc(doc_id).name: positions
+            for doc_id, positions in plist.to_dict().items()}
+
+
+def test_SegmentedIndex() -> None:
+    """Test for SegmentedIndex class and SegmentedReader class.
+    """
+    tokenizer = NGramTokenizer(n=2)
+    with tempfile.TemporaryDirectory() as tp:
+        index_dir = os.path.join(tp, 'index')
+        with SegmentedIndex(index_dir, tokenizer, merge_factor=3) as index:
+            index.add([Document('a', 'すもも'), Document('b', 'もものうち')])
+            index.add([Document('c', 'ももくり')])
+            reader = SegmentedReader(index_dir)
+
+            # should search all of the segments.
+            assert reader.num_docs == 3
+            assert _postings(reader, 'もも') == {'a': [1], 'b': [0], 'c': [0]}
+
+            # should hide deleted and replaced documents after refresh.
+            assert index.delete(['a', 'x']) == 1
+            index.add([Document('b', 'くりのうち')])
+            assert _postings(reader, 'もも') == {'a': [1], 'b': [0], 'c': [0]}
+            assert reader.refresh()
+            assert reader.generation == index.generation
+            assert reader.num_docs == 2
+            assert _postings(reader, 'もも') == {'c': [0]}
+            assert _postings(reader, 'くり') == {'b': [0], 'c': [2]}
+            assert 'すも' not in reader
+
+            # should count only live documents in statistics of terms.
+            stats = reader.term_stats('もも')
+            assert stats is not None and stats.df == 1
+            assert reader.term_stats('すも') is None
+            # should count deleted documents too in df, which is an upper bound.
+            assert reader.df('もも') == 3
+            assert reader.df('すも') == 1
+
+            # should merge segments into one, dropping deleted documents.
+            assert index.merge()
+            assert len(index.segments) == 1
+            assert not index.merge()
+            assert reader.refresh()
+            assert reader.num_docs == 2
+            assert _postings(reader, 'くり') == {'b': [0], 'c': [2]}
+            assert list(reader.terms()) == sorted(reader.terms(), key=lambda t: t.encode('utf-8'))
+            assert len(os.listdir(index_dir)) == 2
+            reader.close()
+
+        # should restore live documents when opened again.
+        with SegmentedIndex(index_dir, tokenizer) as index:
+            assert len(index) == 2
+            index.delete(['c'])
+            assert index.merge(force=True)
+
+
+def test_SegmentedReader_refresh() -> None:
+    """Test for SegmentedReader().refresh() method.
+    """
+    with tempfile.TemporaryDirectory() as tp:
+        index_dir = os.path.join(tp, 'index')
+        with SegmentedIndex(index_dir, WhitespaceTokenizer()) as index:
+            index.add([Document('empty', '')])  # a segment without terms
+            with SegmentedReader(index_dir) as reader:
+                readers = dict(reader._readers)  # pylint: disable=protected-access
+                index.add([Document('a', 'もも')])
+                assert reader.refresh()
+
+                # should keep the readers of unchanged segments open.
+                for name, old in readers.items():
+                    assert reader._readers[name] is old  # pylint: disable=protected-access
+                assert reader.num_docs == 2
+
+
+def test_SegmentedReader_deleted() -> None:
+    """Test for ranking by SegmentedReader class with deleted documents.
+    """
+    tokenizer = NGramTokenizer(n=2)
+    with tempfile.TemporaryDirectory() as tp:
+        index_dir = os.path.join(tp, 'index')
+        with SegmentedIndex(index_dir, tokenizer) as index:
+            index.add([Document(f'x{i}', 'ab') for i in range(10)])
+            index.add([Document('y', 'ab cd'), Document('z', 'cd ef')])
+            index.delete([f'x{i}' for i in range(10)])
+
+        # should not count deleted documents, which would make idf negative.
+        with SegmentedReader(index_dir) as reader:
+            assert reader.num_docs == 2
+            stats = reader.term_stats('ab')
+            assert stats is not None and stats.df == 1
+        engine = Engine(index_dir)
+        results = engine.rank('ab')
+        assert [r.name for r in results] == ['y']
+        assert results[0].score > 0
+        engine.close()
+
+
+def test_SegmentedReader_term_stats() -> None:
+    """Test for SegmentedReader().term_stats() method with deleted documents.
+    """
+    tokenizer = NGramTokenizer(n=2)
+    with tempfile.TemporaryDirectory() as tp:
+        index_dir = os.path.join(tp, 'index')
+        with SegmentedIndex(index_dir, tokenizer) as index:
+            index.add([Document('a', 'すもももももももものうち'), Document('b', 'もものうち')])
+            index.delete(['b'])
+
+        with SegmentedReader(index_dir) as reader:
+            gets: List[str] = []
+            seg_reader = next(iter(reader._readers.values()))  # pylint: disable=protected-access
+            get = seg_reader.get
+            seg_reader.get = lambda term: gets.append(term) or get(term)  # type: ignore
+
+            # should not look up postings for df.
+            assert reader.df('もも') == 2
+            assert not gets
+
+            # should look up postings of a term only once for term_stats.
+            for _ in range(3):
+                stats = reader.term_stats('もも')
+                assert stats is not None and stats.df == 1
+            assert gets == ['もも']
+
+            # should plan a phrase without looking up postings.
+            evaluator = Evaluator(reader, tokenizer)
+            gets.clear()
+            assert evaluator.plan('すもものうち')
+            assert evaluator.estimate(parse('すもものうち')) == 1
+            assert not gets
+
+
+def test_SegmentedIndex_start_merging() -> None:
+    """Test for SegmentedIndex().start_merging() method.
+    """
+    tokenizer = NGramTokenizer(n=2)
+    with tempfile.TemporaryDirectory() as tp:
+        index_dir = os.path.join(tp, 'index')
+        with SegmentedIndex(index_dir, tokenizer, merge_factor=2) as index:
+            index.start_merging(interval=0.01)
+            for i in range(10):
+                index.add([Document(str(i), f'もも{i}')])
+
+            # should merge segments until fewer than the merge factor are left.
+            deadline = time.monotonic() + 10
+            while len(index.segments) >= 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            index.stop_merging()
+            assert len(index.segments) < 2
+
+        # should be searchable by Engine.
+        engine = Engine(index_dir)
+        assert sorted(engine.search('もも')) == [str(i) for i in range(10)]
+        assert engine.query('もも1') == ['1']
+        assert len(engine.search('もも', top_k=3)) == 3
+
+        # should cache results until the index is changed.
+        results = engine.query('もも')
+        assert engine.query(' (もも) ') == results
+        assert engine.cache_stats().hits == 1
+        with SegmentedIndex(index_dir, tokenizer) as index:
+            index.delete(['0'])
+        assert engine.query('もも') == results[1:]
+        assert engine.cache_stats().hits == 1
+        engine.close()
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Testing server module.
+"""
+import json
+import os
+import socket
+import tempfile
+import threading
+from typing import Any, Iterator, Optional, Tuple, Union
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+import pytest
+
+from dzo.engine import Engine
+from dzo.loader import DirectoryLoader
+from dzo.preprocess import Preprocessor
+from dzo.server import SearchServer, UnixSearchServer, make_server
+from dzo.tokenizer import NGramTokenizer
+
+
+@pytest.fixture(name='index_path')
+def fixture_index_path() -> Iterator[Tuple[str, str]]:
+    """Build an n-gram index of a few documents.
+    """
+    contents = {
+        'a.txt': 'order 1234 shipped',
+        'b.txt': 'order abc shipped',
+        'c.txt': 'invoice 5678 paid',
+    }
+    with tempfile.TemporaryDirectory() as tp:
+        target_dir = os.path.join(tp, 'docs')
+        os.makedirs(target_dir)
+        for name, content in contents.items():
+            with open(os.path.join(target_dir, name), mode='w') as fp:
+                fp.write(content)
+        index_path = os.path.join(tp, 'index.dzo')
+        preprocessor = Preprocessor(DirectoryLoader(target_dir), NGramTokenizer(n=3))
+        preprocessor.build(index_path)
+        yield index_path, target_dir
+
+
+def _request(port: int, path: str, body: Optional[Any] = None) -> Tuple[int, Any]:
+    """Send a request to a server on localhost.
+    """
+    data = None if body is None else json.dumps(body).encode('utf-8')
+    request = Request(f'http://127.0.0.1:{port}{path}', data=data)
+    try:
+        with urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except HTTPError as err:
+        return err.code, json.loads(err.read())
+
+
+def _start(server: Union[SearchServer, UnixSearchServer]) -> threading.Thread:
+    """Run a server in a thread.
+    """
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_SearchServer(index_path: Tuple[str, str]) -> None:
+    """Test for server.SearchServer class.
+    """
+    path, target_dir = index_path
+    engine = Engine(path)
+    server = make_server(engine, port=0)
+    assert isinstance(server, SearchServer)
+    port = server.server_address[1]
+    thread = _start(server)
+    try:
+        # should report the number of documents.
+        assert _request(port, '/health') == (200, {'status': 'ok', 'num_docs': 3})
+
+        # should answer a query in each mode.
+        status, body = _request(port, f'/search?q={quote("shipped")}&k=10')
+        assert status == 200
+        assert sorted(r['name'] for r in body['results']) == \
+            [os.path.join(target_dir, 'a.txt'), os.path.join(target_dir, 'b.txt')]
+        status, body = _request(port, f'/search?q={quote("order AND NOT abc")}&mode=query')
+        assert (status, body) == (200, {'results': [os.path.join(target_dir, 'a.txt')]})
+
+        # should answer a batch of queries in order.
+        queries = [
+            {'q': 'paid', 'mode': 'query'},
+            {'q': r'\d{4}', 'mode': 'regexp'},
+            {'q': 'shipped', 'k': 1},
+        ]
+        status, body = _request(port, '/search', {'queries': queries})
+        assert status == 200
+        assert body['results'][0] == engine.query('paid')
+        assert body['results'][1] == engine.regexp(r'\d{4}')
+        assert len(body['results'][2]) == 1
+
+        # should reject invalid requests.
+        assert _request(port, f'/search?q={quote("(order")}&mode=query')[0] == 400
+        assert _request(port, '/search?q=order&mode=unknown')[0] == 400
+        assert _request(port, '/search?q=order&k=x')[0] == 400
+        assert _request(port, '/search', {'queries': 'order'})[0] == 400
+        assert _request(port, '/search', {'queries': [{'q': '(', 'mode': 'regexp'}]})[0] == 400
+        assert _request(port, '/unknown')[0] == 404
+
+        # should answer a failed query with status 500, and keep serving.
+        def regexp(pattern: str) -> Any:
+            raise OSError(f'cannot read documents for {pattern}')
+
+        engine.regexp = regexp  # type: ignore
+        status, body = _request(port, '/search?q=order&mode=regexp')
+        assert (status, body) == (500, {'error': 'OSError: cannot read documents for order'})
+        status, body = _request(port, '/search', {'queries': [{'q': 'x', 'mode': 'regexp'}]})
+        assert status == 500
+
+        # should answer ValueError of the engine with status 500, not 400.
+        def query(text: str) -> Any:
+            raise ValueError(f'broken postings for {text}')
+
+        engine.query = query  # type: ignore
+        status, body = _request(port, '/search', {'queries': [{'q': 'x', 'mode': 'query'}]})
+        assert (status, body) == (500, {'error': 'ValueError: broken postings for x'})
+
+        # should reject a negative Content-Length without waiting for the body.
+        with socket.create_connection(('127.0.0.1', port), timeout=10) as sock:
+            sock.sendall(b'POST /search HTTP/1.1\r\nHost: localhost\r\n'
+                         b'Content-Length: -1\r\nConnection: close\r\n\r\n')
+            assert sock.recv(1024).startswith(b'HTTP/1.0 400')
+        assert _request(port, '/health')[0] == 200
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+        engine.close()
+
+
+def test_UnixSearchServer(index_path: Tuple[str, str]) -> None:
+    """Test for server.UnixSearchServer class.
+    """
+    path, _ = index_path
+    engine = Engine(path)
+    socket_path = os.path.join(os.path.dirname(path), 'dzo.sock')
+    server = make_server(engine, unix_socket=socket_path)
+    assert isinstance(server, UnixSearchServer)
+    thread = _start(server)
+    try:
+        # should answer over a Unix domain socket.
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(10)
+            sock.connect(socket_path)
+            sock.sendall(b'GET /health HTTP/1.0\r\n\r\n')
+            chunks = []
+            while True:
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        head, _, body = b''.join(chunks).partition(b'\r\n\r\n')
+        assert head.startswith(b'HTTP/1.0 200')
+        assert json.loads(body) == {'status': 'ok', 'num_docs': 3}
+
+        # should not steal the socket of a running server.
+        with pytest.raises(OSError):
+            make_server(engine, unix_socket=socket_path)
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+        engine.close()
+
+    # should remove the socket file.
+    assert not os.path.exists(socket_path)
+
+    # should replace a socket file left by a crashed server.
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(socket_path)
+    engine = Engine(path)
+    server = make_server(engine, unix_socket=socket_path)
+    server.server_close()
+    engine.close()
+
+    # should not remove a file which is not a socket.
+    with open(socket_path, mode='w') as fp:
+        fp.write('not a socket')
+    with pytest.raises(FileExistsError):
+        make_server(engine, unix_socket=socket_path)
+    assert os.path.exists(socket_path)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Testing shard module.
+"""
+import os
+import tempfile
+from typing import Dict
+
+import pytest
+
+from dzo.engine import Engine
+from dzo.loader import DirectoryLoader
+from dzo.preprocess import Preprocessor
+from dzo.shard import ShardedEngine, is_sharded, open_engine, read_shards, shard_of
+from dzo.storage import IndexReader
+from dzo.tokenizer import NGramTokenizer
+
+
+contents: Dict[str, str] = {
+    f'{i}.txt': ' '.join(['order'] * (i % 3 + 1) + ['shipped'] * (i % 5) + [f'item{i}'])
+    for i in range(40)
+}
+
+
+def test_Preprocessor_build_shards() -> None:
+    """Test for Preprocessor().build_shards() method.
+    """
+    with tempfile.TemporaryDirectory() as tp:
+        target_dir = os.path.join(tp, 'docs')
+        os.makedirs(target_dir)
+        for name, content in contents.items():
+            with open(os.path.join(target_dir, name), mode='w') as fp:
+                fp.write(content)
+
+        for workers in (1, 2):
+            index_dir = os.path.join(tp, f'index{workers}')
+            preprocessor = Preprocessor(DirectoryLoader(target_dir), NGramTokenizer(n=3),
+                                        workers=workers)
+            preprocessor.build_shards(index_dir, num_shards=3)
+            assert is_sharded(index_dir)
+            shards = read_shards(index_dir)
+            assert len(shards.shards) == 3
+
+            # should partition the documents by the hashes of their names.
+            names = []
+            for i, shard in enumerate(shards.shards):
+                with IndexReader(os.path.join(index_dir, shard)) as reader:
+                    for doc_id in range(reader.num_docs):
+                        name = reader.doc(doc_id).name
+                        assert shard_of(name, 3) == i
+                        names.append(name)
+            assert sorted(names) == sorted(os.path.join(target_dir, n) for n in contents)
+
+        # should raise errors.
+        with pytest.raises(FileExistsError):
+            preprocessor.build_shards(os.path.join(tp, 'index1'), num_shards=3)
+        with pytest.raises(ValueError):
+            preprocessor.build_shards(os.path.join(tp, 'index0'), num_shards=0)
+
+
+def test_ShardedEngine() -> None:
+    """Test for ShardedEngine class.
+    """
+    with tempfile.TemporaryDirectory() as tp:
+        target_dir = os.path.join(tp, 'docs')
+        os.makedirs(target_dir)
+        for name, content in contents.items():
+            with open(os.path.join(target_dir, name), mode='w') as fp:
+                fp.write(content)
+        preprocessor = Preprocessor(DirectoryLoader(target_dir), NGramTokenizer(n=3))
+        index_path = os.path.join(tp, 'index.dzo')
+        preprocessor.build(index_path)
+        index_dir = os.path.join(tp, 'shards')
+        preprocessor.build_shards(index_dir, num_shards=4)
+
+        engine = Engine(index_path)
+        sharded = open_engine(index_dir)
+        assert isinstance(sharded, ShardedEngine)
+        try:
+            assert sharded.num_docs == engine.num_docs
+
+            # should score documents as a single index does.
+            for query in ('shipped', 'order shipped', 'item7 order'):
+                want = {r.name: r.score for r in engine.rank(query, k=len(contents))}
+                got = sharded.rank(query, k=len(contents))
+                assert {r.name: r.score for r in got} == pytest.approx(want)
+                assert [r.score for r in got] == pytest.approx(sorted(want.values(), reverse=True))
+                assert [r.score for r in sharded.search(query, top_k=5)] == \
+                    pytest.approx([r.score for r in got[:5]])
+
+            # should find the same documents as a single index does.
+            assert sorted(sharded.search('item1')) == sorted(engine.search('item1'))
+            assert sorted(sharded.query('shipped AND NOT item2')) == \
+                sorted(engine.query('shipped AND NOT item2'))
+            assert sorted(sharded.regexp(r'item\d5')) == sorted(engine.regexp(r'item\d5'))
+
+            # should raise syntax errors in the coordinator.
+            with pytest.raises(ValueError):
+                sharded.query('(order')
+        finally:
+            sharded.close()
+            engine.close()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Testing spill module.
+"""
+import os
+import tracemalloc
+
+import pytest
+
+from dzo.indexer import Indexer
+from dzo.spill import SpillingIndexer, merge_entries
+from dzo.storage import iter_entries
+
+
+documents = [
+    ('first', ['すもも', 'も', 'もも', 'も', 'もも', 'の', 'うち']),
+    ('second', ['もも', 'くり', 'さんねん', 'かき', 'はちねん']),
+    ('third', ['かき', 'は', 'もも', 'より', 'あまい']),
+]
+
+
+def test_merge_entries() -> None:
+    """Test for spill.merge_entries() function.
+    """
+    idx = Indexer()
+    for name, tokens in documents:
+        idx.add(name, tokens)
+    want = list(iter_entries(idx.corpus().inv_index))
+
+    # should be the same as the entries of a single inverted index.
+    runs = []
+    for doc_id, (_, tokens) in enumerate(documents):
+        inv_index = {t: {doc_id: ps} for t, ps in Indexer.make_index(tokens).items()}
+        runs.append(list(iter_entries(inv_index)))
+    got = list(merge_entries(runs))
+    assert got == want
+
+
+def test_SpillingIndexer() -> None:
+    """Test for spill.SpillingIndexer class.
+    """
+    idx = Indexer()
+    for name, tokens in documents:
+        idx.add(name, tokens)
+    want = list(iter_entries(idx.corpus().inv_index))
+
+    # should raise ValueError.
+    with pytest.raises(ValueError):
+        SpillingIndexer(memory_budget=0)
+
+    # should flush every document, and merge them.
+    with SpillingIndexer(memory_budget=1) as spilling:
+        for name, tokens in documents:
+            spilling.add(name, tokens)
+        assert spilling.num_runs == len(documents)
+        assert spilling.doc_table == idx.doc_table
+        run_dir = os.path.dirname(spilling._run_paths[0])  # pylint: disable=protected-access
+        assert list(spilling.entries()) == want
+    # should remove temporary files.
+    assert not os.path.exists(run_dir)
+
+    # should not flush within the budget.
+    with SpillingIndexer(memory_budget=1024 ** 3) as spilling:
+        for name, tokens in documents:
+            spilling.add(name, tokens)
+        assert spilling.num_runs == 0
+        assert list(spilling.entries()) == want
+
+
+def test_SpillingIndexer_memory() -> None:
+    """Test for memory usage of spill.SpillingIndexer class.
+    """
+    memory_budget = 256 * 1024
+    with SpillingIndexer(memory_budget=memory_budget) as spilling:
+        for i in range(1000):
+            spilling.add(f'doc-{i}', ['hot'] * 200 + [f'cold-{i}'])
+        assert spilling.num_runs > 10
+
+        # should merge postings of a term in many runs within a few times the budget.
+        tracemalloc.start()
+        try:
+            for _ in spilling.entries():
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert peak < 4 * memory_budget
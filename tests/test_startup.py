@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Testing startup of the command line tool.
+
+The command line tool is called from scripts many times, so that it should not
+import heavy modules which the subcommand does not need.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from typing import List, Set
+
+from dzo.loader import DirectoryLoader
+from dzo.preprocess import Preprocessor
+from dzo.tokenizer import NGramTokenizer
+
+
+HEAVY_MODULES: Set[str] = {
+    'MeCab',
+    'multiprocessing',
+    'concurrent.futures.process',
+    'http.server',
+    'numpy',
+}
+
+
+def _imported(argv: List[str]) -> Set[str]:
+    """Run the command line tool in a new interpreter, and returns the heavy
+    modules imported by it.
+    """
+    code = ('import sys\n'
+            'from dzo._cmd.__main__ import main\n'
+            f'sys.argv = {["dzo"] + argv!r}\n'
+            'try:\n'
+            '    main()\n'
+            'except SystemExit:\n'
+            '    pass\n'
+            f'print("imported:" + ",".join(m for m in {sorted(HEAVY_MODULES)!r} '
+            'if m in sys.modules))\n')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, os.environ.get('PYTHONPATH', '')]))
+    result = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, env=env,
+                            check=True, universal_newlines=True)
+    last_line = result.stdout.splitlines()[-1]
+    assert last_line.startswith('imported:')
+    return set(last_line[len('imported:'):].split(',')) - {''}
+
+
+def test_help() -> None:
+    """Test for imports of `dzo --help`.
+    """
+    # should not import any heavy module.
+    assert _imported(['--help']) == set()
+
+
+def test_search() -> None:
+    """Test for imports of `dzo search` against an n-gram index.
+    """
+    with tempfile.TemporaryDirectory() as tp:
+        target_dir = os.path.join(tp, 'docs')
+        os.makedirs(target_dir)
+        with open(os.path.join(target_dir, 'a.txt'), mode='w') as fp:
+            fp.write('order 1234 shipped')
+        index_path = os.path.join(tp, 'index.dzo')
+        Preprocessor(DirectoryLoader(target_dir), NGramTokenizer(n=3)).build(index_path)
+
+        # should import neither MeCab nor modules of the other subcommands.
+        assert _imported(['search', 'shipped', '-i', index_path]) == set()
+        assert _imported(['search', 'shipped', '-i', index_path, '--top-k', '1']) == set()
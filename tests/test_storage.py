@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Testing storage module.
+"""
+import os
+import tempfile
+
+import pytest
+
+from dzo import indexer
+from dzo.storage import FORMAT_VERSION, IndexReader, read_header, write_index
+
+
+inv_index: indexer.InvIndex = {
+    'すもも': {0: [0]},
+    'も': {0: [1, 3]},
+    'もも': {0: [2, 4], 1: [0]},
+    'の': {0: [5]},
+    'うち': {0: [6]},
+    'くり': {1: [1]},
+    'さんねん': {1: [2]},
+    'かき': {1: [3]},
+    'はちねん': {1: [4]},
+}
+doc_table: indexer.DocTable = [
+    indexer.DocInfo('first', 7),
+    indexer.DocInfo('second', 5),
+]
+corpus = indexer.IndexedCorpus(inv_index, doc_table)
+
+
+def test_write_index() -> None:
+    """Test for storage.write_index() function and IndexReader class.
+    """
+    with tempfile.TemporaryDirectory() as tp:
+        p = os.path.join(tp, 'index.dzo')
+        write_index(p, 'NGramTokenizer', '0.0.7', corpus)
+
+        with IndexReader(p) as reader:
+            # should restore metadata.
+            assert reader.tokenizer_name == 'NGramTokenizer'
+            assert reader.tokenizer_version == '0.0.7'
+
+            # should restore the document table.
+            assert reader.num_docs == len(doc_table)
+            for doc_id, doc in enumerate(doc_table):
+                assert reader.doc(doc_id) == doc
+            with pytest.raises(IndexError):
+                reader.doc(len(doc_table))
+
+            # should restore statistics for ranking.
+            assert reader.total_length == 12
+            assert [reader.doc_length(i) for i in range(reader.num_docs)] == [7, 5]
+            assert reader.df('もも') == 2
+            assert reader.df('くり') == 1
+            assert reader.df('なし') == 0
+
+            # should restore all of the terms in sorted order.
+            assert len(reader) == len(inv_index)
+            got = list(reader.terms())
+            want = sorted(inv_index.keys(), key=lambda t: t.encode('utf-8'))
+            assert got == want
+
+            # should restore postings.
+            for term, postings in inv_index.items():
+                assert term in reader
+                got_postings = reader.get(term)
+                assert got_postings is not None
+                assert got_postings.to_dict() == postings
+
+            # should return None for unknown terms.
+            assert 'りんご' not in reader
+            assert reader.get('りんご') is None
+
+        # should read the same postings when preloaded.
+        with IndexReader(p, preload=True) as reader:
+            for term, postings in inv_index.items():
+                got_postings = reader.get(term)
+                assert got_postings is not None
+                assert got_postings.to_dict() == postings
+
+
+def test_IndexReader_invalid() -> None:
+    """Test for IndexReader class with invalid files.
+    """
+    with tempfile.TemporaryDirectory() as tp:
+        # should raise FileNotFoundError.
+        with pytest.raises(FileNotFoundError):
+            IndexReader(os.path.join(tp, 'missing.dzo'))
+
+        # should raise ValueError.
+        p = os.path.join(tp, 'invalid.dzo')
+        with open(p, mode='wb') as fp:
+            fp.write(b'\x80\x03' * 64)
+        with pytest.raises(ValueError):
+            IndexReader(p)
+
+        # should be able to read an empty index.
+        p = os.path.join(tp, 'empty.dzo')
+        write_index(p, 'NGramTokenizer', '0.0.7', indexer.IndexedCorpus({}, []))
+        with IndexReader(p) as reader:
+            assert len(reader) == 0
+            assert reader.num_docs == 0
+            assert reader.get('もも') is None
+
+
+def test_read_header() -> None:
+    """Test for storage.read_header() function and IndexReader.verify() method.
+    """
+    with tempfile.TemporaryDirectory() as tp:
+        p = os.path.join(tp, 'index.dzo')
+        write_index(p, 'NGramTokenizer', '0.0.7', corpus, tokenizer_params={'n': 2})
+
+        # should read the metadata without the other sections.
+        header = read_header(p)
+        assert header.format_version == FORMAT_VERSION
+        assert header.tokenizer_name == 'NGramTokenizer'
+        assert header.tokenizer_version == '0.0.7'
+        assert header.tokenizer_params == {'n': 2}
+        assert header.num_docs == len(doc_table)
+        assert header.num_terms == len(inv_index)
+
+        # should be the same as the header read by IndexReader.
+        with IndexReader(p) as reader:
+            assert reader.header == header
+            assert reader.tokenizer_params == {'n': 2}
+            reader.verify()
+
+        # should detect a corrupted section.
+        offset, length = header.sections[-1]  # postings
+        with open(p, mode='r+b') as fp:
+            fp.seek(offset + length // 2)
+            b = fp.read(1)
+            fp.seek(offset + length // 2)
+            fp.write(bytes([b[0] ^ 0xff]))
+        with IndexReader(p) as reader:
+            with pytest.raises(ValueError, match='postings'):
+                reader.verify()
+
+        # should default to no parameters.
+        p = os.path.join(tp, 'default.dzo')
+        write_index(p, 'NGramTokenizer', '0.0.7', corpus)
+        assert read_header(p).tokenizer_params == {}
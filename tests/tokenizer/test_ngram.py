@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """Testing ngram module.
 """
+from dzo.indexer import Indexer
 from dzo.tokenizer import NGramTokenizer
 from dzo.tokenizer.ngram import NGramToken
 
@@ -35,3 +36,18 @@ def test_NGramTokenizer_tokenize() -> None:
     got = [tok.normalized for tok in res]
     want = ['はい']
     assert got == want
+
+
+def test_NGramTokenizer_index() -> None:
+    """Test for tokenizer.NGramTokenizer().index method.
+    """
+    sentences = ['', 'はい', '吾輩は猫である', 'すもももももももものうち', 'abcabcabc 🍙🍙🍙🍙']
+    for n in [1, 2, 3, 4, 5]:
+        tokenizer = NGramTokenizer(n=n)
+        for sentence in sentences:
+            tokens = [tok.normalized for tok in tokenizer.tokenize(sentence)]
+
+            # should group the same positions as the tokens.
+            index, length = tokenizer.index(sentence)
+            assert index == Indexer.make_index(tokens)
+            assert length == len(tokens)